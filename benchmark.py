@@ -0,0 +1,324 @@
+"""Synthetic datasets and a repeatable benchmark for the tracker's hot paths.
+
+Generate datasets with the real roster and map list (1k, 100k and 1M
+matches by default)::
+
+    python benchmark.py generate --out bench_data
+    python benchmark.py generate --out bench_data --matches 5000
+
+then time them; each run is saved as JSON::
+
+    python benchmark.py run bench_data/100000 --out results.json
+    python benchmark.py compare baseline.json results.json
+
+Each case is run ``--repeat`` times for timing and once more under
+``tracemalloc`` for its peak memory.  Cases that need Tk (building the
+tables, decoding icons) are reported as skipped without a display.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from match_journal import MatchJournal
+from persistence import write_text_atomic
+from trends import as_datetimes, downsample
+from tracker_core import (
+    AGGREGATES_FILE,
+    HEROES_FILE,
+    MAPS_FILE,
+    MATCH_JOURNAL_FILE,
+    MATCH_LOG_FILE,
+    SAVE_FILE,
+    TrackerEngine,
+    load_json,
+    pick_rate_table,
+)
+
+DATASET_SIZES = (1_000, 100_000, 1_000_000)
+COMPOSITION = ("Tank", "Damage", "Damage", "Support", "Support")
+# Share of wins, losses and draws in generated matches.
+OUTCOME_WEIGHTS = {"win": 0.49, "loss": 0.49, "draw": 0.02}
+# A regression is reported when a case gets this much slower.
+REGRESSION_RATIO = 1.2
+
+
+# ----------------------------------------------------------------------
+# Dataset generation
+
+def _popularity(heroes, rng):
+    """Zipf-like pick weights, so a few heroes dominate as in real play."""
+    order = list(heroes)
+    rng.shuffle(order)
+    return order, [1 / (rank + 1) ** 0.8 for rank in range(len(order))]
+
+
+def _team(roles, rng):
+    """Five distinct heroes in the usual 1/2/2 composition."""
+    team = []
+    for role in COMPOSITION:
+        heroes, weights = roles[role]
+        hero = rng.choices(heroes, weights)[0]
+        while hero in team:
+            hero = rng.choices(heroes, weights)[0]
+        team.append(hero)
+    return team
+
+
+def generate(out_dir, matches, heroes_by_role, maps, seed=0):
+    """Write a dataset of ``matches`` matches into ``out_dir``."""
+    rng = random.Random(seed)
+    roles = {role: _popularity(heroes, rng) for role, heroes in heroes_by_role.items()}
+    map_weights = [rng.uniform(0.5, 1.5) for _ in maps]
+    outcomes, outcome_weights = zip(*OUTCOME_WEIGHTS.items())
+
+    os.makedirs(out_dir, exist_ok=True)
+    engine = TrackerEngine(
+        {role: list(heroes) for role, heroes in heroes_by_role.items()}, list(maps)
+    )
+    # About eight matches a day, ending now.
+    when = datetime.now() - timedelta(hours=3 * matches)
+    for _ in range(matches):
+        when += timedelta(minutes=rng.uniform(20, 340))
+        teammates = _team(roles, rng)
+        # Mirror picks across the two teams are allowed, as in the game.
+        enemies = _team(roles, rng)
+        engine.record_match(
+            teammates, enemies, rng.choices(maps, map_weights)[0],
+            timestamp=when.isoformat(timespec="seconds"),
+            outcome=rng.choices(outcomes, outcome_weights)[0],
+        )
+
+    journal = MatchJournal(os.path.join(out_dir, MATCH_JOURNAL_FILE))
+    journal.rewrite(engine.match_log)
+    write_text_atomic(os.path.join(out_dir, SAVE_FILE), json.dumps(engine.stats_snapshot()))
+    write_text_atomic(os.path.join(out_dir, HEROES_FILE), json.dumps(engine.heroes_by_role))
+    write_text_atomic(os.path.join(out_dir, MAPS_FILE), json.dumps(engine.maps))
+    return engine
+
+
+# ----------------------------------------------------------------------
+# Measuring
+
+def measure(fn, repeat, setup=None):
+    """Time ``fn`` ``repeat`` times, then once more for its peak memory.
+
+    ``setup`` runs before each call, untimed, and its result is passed to
+    ``fn``.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        began = time.perf_counter()
+        fn(arg)
+        times.append((time.perf_counter() - began) * 1000)
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.mean(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def _tk_root():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:   # no display, or Tk not installed
+        return None, str(e).splitlines()[0] if str(e) else type(e).__name__
+    root.withdraw()
+    return root, None
+
+
+def run(data_dir, repeat=5):
+    """Run every case against the dataset in ``data_dir``; returns the report."""
+    work = tempfile.mkdtemp(prefix="ow2-bench-")
+    try:
+        for name in (MATCH_JOURNAL_FILE, SAVE_FILE, HEROES_FILE, MAPS_FILE):
+            shutil.copy(os.path.join(data_dir, name), work)
+        return _run_cases(work, repeat, data_dir)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _run_cases(work, repeat, data_dir):
+    paths = {name: os.path.join(work, name) for name in (
+        MATCH_JOURNAL_FILE, MATCH_LOG_FILE, SAVE_FILE, HEROES_FILE, MAPS_FILE, AGGREGATES_FILE)}
+    journal = MatchJournal(paths[MATCH_JOURNAL_FILE], paths[MATCH_LOG_FILE])
+
+    def load(_=None):
+        return TrackerEngine.load(journal, paths[HEROES_FILE], paths[MAPS_FILE], paths[SAVE_FILE],
+                                  paths[AGGREGATES_FILE])
+
+    results = {}
+    results["startup_load"] = measure(load, repeat)
+    engine = load()
+    matches = len(engine.match_log)
+    heroes = engine.hero_names()
+    rng = random.Random(1)
+
+    def submit(_):
+        # What one Submit costs the persistence thread: the journal append
+        # and the stats document rewrite.
+        t, e = rng.sample(heroes, 5), rng.sample(heroes, 5)
+        entry = engine.record_match(t, e, rng.choice(engine.maps), outcome="win")
+        journal.append(entry)
+        write_text_atomic(paths[SAVE_FILE], json.dumps(engine.stats_snapshot()))
+    results["submit_save"] = measure(submit, repeat)
+
+    def stats_rows(_):
+        # The data side of display_stats: pick rates plus win rates, sorted
+        # the way the tables sort them.
+        for side in ("teammates", "enemies"):
+            rows = [
+                row + (str(engine.win_stats.hero(h, side)),)
+                for h, row in pick_rate_table(engine, side).items()
+            ]
+            rows.sort(key=lambda row: -row[2])
+    results["display_stats_rows"] = measure(stats_rows, repeat)
+
+    def map_stats(_):
+        for m in engine.maps:
+            engine.map_record(m)
+            for side in ("teammates", "enemies"):
+                for h, _count in engine.map_pick_counts(m, side):
+                    str(engine.win_stats.hero_on_map(h, m, side))
+    results["update_map_stats_all_maps"] = measure(map_stats, repeat)
+
+    def trends(_):
+        for hero in heroes:
+            xs, _ys = downsample(*engine.trends.series(hero))
+            as_datetimes(xs)
+    results["trend_series_all_heroes"] = measure(trends, repeat)
+
+    import ow2_tracker_final_hover_fixed as gui
+
+    results["icon_index"] = measure(lambda _: gui.HeroIcons(gui.ICON_DIR), repeat)
+
+    root, reason = _tk_root()
+    if root is None:
+        for name in ("display_stats_tk", "icon_decode"):
+            results[name] = {"skipped": reason}
+    else:
+        try:
+            gui.engine = engine
+            from tkinter import ttk
+
+            def fresh_trees():
+                columns = ("Hero", "Pick Rate", "Games", "Win Rate")
+                return [ttk.Treeview(root, columns=columns, show="headings") for _ in range(2)]
+
+            results["display_stats_tk"] = measure(
+                lambda trees: gui.display_stats(*trees), repeat, setup=fresh_trees)
+
+            def fresh_icons():
+                gui.ICON_CACHE.clear()
+                return gui.HeroIcons(gui.ICON_DIR)
+
+            def decode_all(icons):
+                for hero in heroes:
+                    icons.get(hero, gui.HeroIcons.MENU)
+            results["icon_decode"] = measure(decode_all, repeat, setup=fresh_icons)
+        finally:
+            root.destroy()
+
+    return {
+        "meta": {
+            "dataset": os.path.abspath(data_dir),
+            "matches": matches,
+            "heroes": len(heroes),
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, ratio=REGRESSION_RATIO):
+    """``[(case, old ms, new ms, regressed)]`` for cases timed in both runs."""
+    rows = []
+    for case, new in current["results"].items():
+        old = baseline["results"].get(case)
+        if not old or "median_ms" not in old or "median_ms" not in new:
+            continue
+        regressed = new["median_ms"] > old["median_ms"] * ratio
+        rows.append((case, old["median_ms"], new["median_ms"], regressed))
+    return rows
+
+
+# ----------------------------------------------------------------------
+# Command line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OW2 tracker benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("generate", help="write synthetic datasets")
+    p.add_argument("--out", default="bench_data")
+    p.add_argument("--matches", type=int, nargs="+", default=list(DATASET_SIZES))
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--heroes", default=HEROES_FILE, help="roster to draw from")
+    p.add_argument("--maps", default=MAPS_FILE)
+
+    p = sub.add_parser("run", help="time the hot paths on one dataset")
+    p.add_argument("data")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--out", help="write the results here as JSON")
+
+    p = sub.add_parser("compare", help="compare two result files")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--ratio", type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        engine = TrackerEngine(load_json(args.heroes, None), load_json(args.maps, None))
+        for n in args.matches:
+            began = time.perf_counter()
+            out_dir = os.path.join(args.out, str(n))
+            generate(out_dir, n, engine.heroes_by_role, engine.maps, args.seed)
+            print(f"Wrote {n} matches to {out_dir} in {time.perf_counter() - began:.1f}s")
+        return 0
+
+    if args.command == "run":
+        report = run(args.data, args.repeat)
+        for case, result in report["results"].items():
+            if "skipped" in result:
+                print(f"{case:28} skipped ({result['skipped']})")
+            else:
+                print(f"{case:28} {result['median_ms']:10.2f}ms  peak {result['peak_kb']:10.1f}KB")
+        if args.out:
+            write_text_atomic(args.out, json.dumps(report, indent=2))
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = 0
+    for case, old, new, regressed in compare(baseline, current, args.ratio):
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:28} {old:10.2f}ms -> {new:10.2f}ms{flag}")
+        regressions += regressed
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
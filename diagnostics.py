@@ -0,0 +1,209 @@
+"""Opt-in instrumentation for tracking down UI stalls.
+
+Enable with ``OW2_DIAGNOSTICS=1`` or ``--diagnostics``.  While installed,
+``Diagnostics``:
+
+* times every Tk callback (commands, bindings, variable traces and
+  ``after`` jobs) by wrapping ``tkinter.CallWrapper``, plus anything passed
+  to ``record`` such as page builders;
+* runs an ``after()`` heartbeat and records how late each beat fires, which
+  is how long the main loop was blocked;
+* counts live widgets and Tk images once a second.
+
+Everything is kept in memory, shown on the Diagnostics page and written to
+``ow2_diagnostics.json`` (or ``OW2_DIAGNOSTICS_FILE``) on exit.
+"""
+import json
+import os
+import time
+import tkinter as tk
+from collections import deque
+
+from persistence import write_text_atomic
+
+ENABLED = os.environ.get("OW2_DIAGNOSTICS", "0") not in ("", "0")
+DIAGNOSTICS_FILE = os.environ.get("OW2_DIAGNOSTICS_FILE", "ow2_diagnostics.json")
+
+HEARTBEAT_MS = 50
+# Heartbeats between widget/image counts (about once a second).
+SAMPLE_EVERY = 20
+# Callbacks slower than this are reported as they happen.
+SLOW_MS = 100
+# Upper bounds (ms) of the main-loop lag histogram; the last bucket is open.
+LAG_BUCKETS = (5, 16, 50, 100, 250, 1000)
+LAG_LABELS = [f"<={bound}ms" for bound in LAG_BUCKETS] + [f">{LAG_BUCKETS[-1]}ms"]
+# Lag samples kept for the Diagnostics page: about the last minute.
+LAG_HISTORY = 60_000 // HEARTBEAT_MS
+
+
+def callback_name(func):
+    """Readable name of a Tk callback."""
+    qualname = getattr(func, "__qualname__", None) or type(func).__name__
+    if qualname.endswith(".callit"):
+        # tkinter's ``after`` wrapper; it carries the scheduled function's name.
+        return f"after:{func.__name__}"
+    module = getattr(func, "__module__", None)
+    if module and module not in ("__main__", "ow2_tracker_final_hover_fixed"):
+        return f"{module}.{qualname}"
+    return qualname
+
+
+class Timing:
+    """Call count and durations (ms) of one named callback."""
+
+    __slots__ = ("count", "total", "max", "last", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total = self.max = self.last = 0.0
+        self.slow = 0
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.last = ms
+        if ms > self.max:
+            self.max = ms
+        if ms >= SLOW_MS:
+            self.slow += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.mean, 3),
+            "max_ms": round(self.max, 3),
+            "last_ms": round(self.last, 3),
+            "slow": self.slow,
+        }
+
+
+class Diagnostics:
+    """Callback timings, main-loop lag and widget counts for one session."""
+
+    def __init__(self, heartbeat_ms=HEARTBEAT_MS):
+        self.heartbeat_ms = heartbeat_ms
+        self.timings = {}
+        self.lag = deque(maxlen=LAG_HISTORY)
+        self.lag_histogram = [0] * (len(LAG_BUCKETS) + 1)
+        self.lag_max = 0.0
+        self.beats = 0
+        self.widgets = self.images = 0
+        self.peak_widgets = self.peak_images = 0
+        self.started = time.time()
+        self.root = None
+        self._original_call = None
+        self._expected = None
+        self._after_id = None
+
+    # ------------------------------------------------------------------
+    # Timing
+
+    def record(self, name, ms):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Timing()
+        timing.add(ms)
+        if ms >= SLOW_MS:
+            print(f"⚠️ slow callback {name}: {ms:.0f}ms")
+
+    def install(self, root):
+        """Start timing callbacks and the heartbeat for ``root``."""
+        if self._original_call is not None:
+            return
+        self.root = root
+        original = self._original_call = tk.CallWrapper.__call__
+        record = self.record
+
+        def timed_call(wrapper, *args):
+            began = time.perf_counter()
+            try:
+                return original(wrapper, *args)
+            finally:
+                record(callback_name(wrapper.func), (time.perf_counter() - began) * 1000)
+
+        tk.CallWrapper.__call__ = timed_call
+        self._expected = time.perf_counter() + self.heartbeat_ms / 1000
+        self._after_id = root.after(self.heartbeat_ms, self._beat)
+
+    def uninstall(self):
+        if self._original_call is None:
+            return
+        tk.CallWrapper.__call__ = self._original_call
+        self._original_call = None
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+    # ------------------------------------------------------------------
+    # Heartbeat
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._expected) * 1000)
+        self.lag.append(lag)
+        self.lag_max = max(self.lag_max, lag)
+        bucket = 0
+        while bucket < len(LAG_BUCKETS) and lag > LAG_BUCKETS[bucket]:
+            bucket += 1
+        self.lag_histogram[bucket] += 1
+        self.beats += 1
+        if self.beats % SAMPLE_EVERY == 1:
+            self.sample()
+        self._expected = time.perf_counter() + self.heartbeat_ms / 1000
+        self._after_id = self.root.after(self.heartbeat_ms, self._beat)
+
+    def sample(self):
+        """Count live widgets and Tk images."""
+        widgets, stack = 0, [self.root]
+        while stack:
+            widget = stack.pop()
+            widgets += 1
+            stack.extend(widget.children.values())
+        self.widgets = widgets
+        self.images = len(self.root.image_names())
+        self.peak_widgets = max(self.peak_widgets, self.widgets)
+        self.peak_images = max(self.peak_images, self.images)
+
+    def lag_summary(self):
+        recent = sorted(self.lag)
+        if not recent:
+            return {"beats": 0}
+        return {
+            "beats": self.beats,
+            "last_ms": round(self.lag[-1], 1),
+            "mean_ms": round(sum(recent) / len(recent), 1),
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1),
+            "max_ms": round(self.lag_max, 1),
+            "histogram": dict(zip(LAG_LABELS, self.lag_histogram)),
+        }
+
+    # ------------------------------------------------------------------
+    # Reporting
+
+    def snapshot(self, extra=None):
+        """Everything collected so far as a JSON-able dict."""
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(time.time() - self.started, 1),
+            "heartbeat_ms": self.heartbeat_ms,
+            "main_loop_lag": self.lag_summary(),
+            "widgets": {"live": self.widgets, "peak": self.peak_widgets},
+            "images": {"live": self.images, "peak": self.peak_images},
+            "callbacks": {
+                name: timing.to_dict()
+                for name, timing in sorted(self.timings.items(), key=lambda x: -x[1].total)
+            },
+            **(extra or {}),
+        }
+
+    def dump(self, path=DIAGNOSTICS_FILE, extra=None):
+        write_text_atomic(path, json.dumps(self.snapshot(extra), indent=2))
+        print(f"Diagnostics written to {path}")
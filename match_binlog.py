@@ -0,0 +1,563 @@
+"""Memory-mapped binary match log.
+
+An alternative to the JSONL journal for long histories.  Enable it with
+``OW2_MATCH_LOG=binary``; the first start converts the journal, which is
+left in place.  The file is::
+
+    preamble   magic "OW2M", schema version, record size, header size
+    header     JSON: hero and map dictionaries plus per-record extras,
+               space-padded to the header size (a multiple of the page size)
+    records    RECORD_SIZE bytes each: 10 hero ids (teammates, then
+               enemies), map id, outcome, flags, epoch microseconds
+
+Names and extras added after the file was written go to a sidecar named in
+the header (``match_log.bin.<generation>.names``), one JSON line per append,
+so an append writes only its own records and names.  A rewrite starts a new
+generation with everything in the header again.
+
+Opening a log only reads the header.  ``load_store`` maps the records with
+``mmap`` and copies them into the ``MatchStore`` columns in bulk (one
+NumPy pass per column when it is installed), so loading a long history
+costs a sequential read instead of parsing JSON.  Dictionaries are exact spellings,
+and anything a record cannot hold (odd timestamp formats, short or long
+teams, extra keys) is kept in the header's extras.  ``export`` therefore
+writes back exactly the journal that was imported::
+
+    python match_binlog.py import
+    python match_binlog.py export --out match_log.jsonl
+    python match_binlog.py info
+"""
+import argparse
+import errno
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from match_journal import JOURNAL_FILE, LEGACY_FILE, MatchJournal, _fsync_dir, write_lines_atomic
+from array import array
+
+from match_store import (
+    ENTRY_KEYS,
+    NO_HERO,
+    NO_TIME,
+    SLOTS,
+    TEAM_SIZE,
+    MatchStore,
+    from_micros,
+    to_micros,
+    valid_id,
+)
+from winrates import OUTCOMES
+
+BINLOG_FILE = "match_log.bin"
+MAGIC = b"OW2M"
+# Version 2 added the sidecar; version 1 files are upgraded on the first
+# append that adds a name.
+SCHEMA_VERSION = 2
+PREAMBLE = struct.Struct("<4sHHI")   # magic, version, record size, header size
+RECORD = struct.Struct("<10HHbBq")   # heroes, map, outcome, flags, microseconds
+RECORD_SIZE = RECORD.size
+HEADER_SIZE = 16384
+# ``flags`` bits: the header's extras hold part of this record; the entry
+# has an ``id`` (the next free id unless the extras say otherwise).
+FLAG_EXTRA = 1
+FLAG_ID = 2
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("heroes", "<u2", (SLOTS,)),
+        ("map", "<u2"),
+        ("outcome", "i1"),
+        ("flags", "u1"),
+        ("time", "<i8"),
+    ])
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+# Stand-in for "key absent" when comparing a packed entry with the original.
+_ABSENT = object()
+
+
+class BinaryMatchLog:
+    """Fixed-width match records behind a dictionary header.
+
+    Offers the ``MatchJournal`` interface (``load``, ``append``,
+    ``append_many``, ``rewrite``) plus ``load_store``.
+    """
+
+    def __init__(self, path=BINLOG_FILE, import_from=None, create=True):
+        self.path = path
+        # Journal converted on first load when the binary log does not exist.
+        self.import_from = import_from
+        # Without ``create`` a missing file is a FileNotFoundError, for
+        # read-only tools that must not leave an empty log behind.
+        self.create = create
+        self.lock = threading.Lock()
+        self.heroes, self.maps = [], []   # id -> name, exact spelling
+        self._hero_ids, self._map_ids = {}, {}
+        self.extras = {}                  # position -> fields the record can't hold
+        self.header_size = HEADER_SIZE
+        # The file's generation and its sidecar (a name next to ``path``);
+        # version 1 files have none.
+        self.generation = 0
+        self.sidecar = None
+        # Whether the file holds extras for records that were never written;
+        # the next append must override them.
+        self._stale_extras = False
+        self.count = 0
+        self.next_id = 1   # implicit id of the next record, as MatchStore assigns it
+        self.damaged = 0
+        self._opened = False
+        self._mmap = None
+
+    def __len__(self):
+        self._open()
+        return self.count
+
+    # ------------------------------------------------------------------
+    # Header
+
+    def _header_json(self):
+        return json.dumps({
+            "heroes": self.heroes,
+            "maps": self.maps,
+            "extras": {str(p): extra for p, extra in self.extras.items()},
+            "generation": self.generation,
+            "sidecar": self.sidecar,
+        }, ensure_ascii=False).encode("utf-8")
+
+    def _header_bytes(self, header_size):
+        body = self._header_json()
+        if PREAMBLE.size + len(body) > header_size:
+            return None
+        return (PREAMBLE.pack(MAGIC, SCHEMA_VERSION, RECORD_SIZE, header_size)
+                + body.ljust(header_size - PREAMBLE.size))
+
+    def _open(self):
+        """Read the header, creating or importing the file if needed."""
+        if self._opened:
+            return
+        if not self.create and not os.path.exists(self.path):
+            raise FileNotFoundError(errno.ENOENT, "no such match log", self.path)
+        self._opened = True
+        if not os.path.exists(self.path):
+            if self.import_from is not None:
+                entries = self.import_from.load()
+                self._write_all(entries)
+                print(f"Converted {len(entries)} matches to {self.path}")
+            else:
+                self._write_all([])
+            return
+        with open(self.path, "rb") as f:
+            magic, version, record_size, header_size = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC or record_size != RECORD_SIZE:
+                raise ValueError(f"{self.path} is not an OW2 match log")
+            if version > SCHEMA_VERSION:
+                raise ValueError(f"{self.path} has schema version {version}; "
+                                 f"this version reads up to {SCHEMA_VERSION}")
+            header = json.loads(f.read(header_size - PREAMBLE.size).decode("utf-8"))
+            size = os.fstat(f.fileno()).st_size
+        self.header_size = header_size
+        self.heroes, self.maps = header["heroes"], header["maps"]
+        self._hero_ids = {name: i for i, name in enumerate(self.heroes)}
+        self._map_ids = {name: i for i, name in enumerate(self.maps)}
+        self.extras = {int(p): extra for p, extra in header.get("extras", {}).items()}
+        self.generation, self.sidecar = header.get("generation", 0), header.get("sidecar")
+        self._read_sidecar()
+        self.count, torn = divmod(size - header_size, RECORD_SIZE)
+        if torn:
+            # The last write never completed; cut it off like the journal does.
+            print(f"⚠️ Dropping incomplete record at end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(header_size + self.count * RECORD_SIZE)
+                f.flush()
+                os.fsync(f.fileno())
+            self.damaged = 1
+        self._stale_extras = any(p >= self.count for p in self.extras)
+        self.extras = {p: extra for p, extra in self.extras.items() if p < self.count}
+        self.next_id = self._record_ids(build=False)[1]
+
+    def _sidecar_path(self, name=None):
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), name or self.sidecar)
+
+    def _read_sidecar(self):
+        """Apply the names and extras appended since the header was written."""
+        if self.sidecar is None or not os.path.exists(self._sidecar_path()):
+            return
+        with open(self._sidecar_path(), "rb") as f:
+            raw = f.read()
+        offset = 0
+        while offset < len(raw):
+            end = raw.find(b"\n", offset)
+            try:
+                line = json.loads(raw[offset:end]) if end != -1 else None
+            except ValueError:
+                line = None
+            if line is None:
+                # A torn last line; its records were never written either.
+                print(f"⚠️ Dropping incomplete record at end of {self._sidecar_path()}")
+                with open(self._sidecar_path(), "r+b") as f:
+                    f.truncate(offset)
+                    f.flush()
+                    os.fsync(f.fileno())
+                break
+            offset = end + 1
+            for name in line.get("heroes", ()):
+                self._hero_ids[name] = len(self.heroes)
+                self.heroes.append(name)
+            for name in line.get("maps", ()):
+                self._map_ids[name] = len(self.maps)
+                self.maps.append(name)
+            # Extras noted by an earlier append whose records never made it
+            # to the file don't belong to the records written after it.
+            count = line["count"]
+            self.extras = {p: extra for p, extra in self.extras.items() if p < count}
+            self.extras.update((int(p), extra) for p, extra in line.get("extras", {}).items())
+
+    def _append_sidecar(self, line):
+        path = self._sidecar_path()
+        created = not os.path.exists(path)
+        with open(path, "ab") as f:
+            f.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_dir(path)
+
+    def _record_ids(self, build=True):
+        """``(ids, next id)``: every record's match id, as MatchStore assigns them.
+
+        Ids are implicit (one past the highest so far) except where the
+        extras hold an explicit one, so only gaps cost header space.
+        """
+        ids = array("q")
+        next_id, position = 1, 0
+        explicit = sorted(p for p, extra in self.extras.items() if valid_id(extra.get("id")))
+        for p in explicit:
+            if build:
+                ids.extend(range(next_id, next_id + p - position))
+            next_id += p - position
+            match_id = self.extras[p]["id"]
+            if build:
+                ids.append(match_id)
+            next_id = max(next_id, match_id + 1)
+            position = p + 1
+        if build:
+            ids.extend(range(next_id, next_id + self.count - position))
+        return ids, next_id + self.count - position
+
+    # ------------------------------------------------------------------
+    # Packing
+
+    def _intern(self, ids, names, name):
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            if index >= NO_HERO:
+                raise OverflowError("too many distinct names")
+            names.append(name)
+        return index
+
+    def _pack(self, entry, position):
+        slots = []
+        for side in ("teammates", "enemies"):
+            team = [self._intern(self._hero_ids, self.heroes, h) for h in (entry.get(side) or [])[:TEAM_SIZE]]
+            slots.extend(team + [NO_HERO] * (TEAM_SIZE - len(team)))
+        outcome = entry.get("outcome")
+        record = (
+            *slots,
+            self._intern(self._map_ids, self.maps, entry.get("map") or ""),
+            OUTCOMES.index(outcome) if outcome in OUTCOMES else -1,
+            FLAG_ID if "id" in entry else 0,
+            to_micros(entry.get("timestamp")),
+        )
+        match_id = entry.get("id")
+        implicit = self.next_id
+        self.next_id = max(implicit, match_id + 1) if valid_id(match_id) else implicit + 1
+        # Whatever does not survive the round trip goes into the extras.
+        rebuilt = self._entry(record, None, implicit)
+        extra = {key: value for key, value in entry.items() if rebuilt.get(key, _ABSENT) != value}
+        missing = [key for key in rebuilt if key not in entry]
+        if missing:
+            extra["_missing"] = missing
+        if extra:
+            self.extras[position] = extra
+            record = record[:-2] + (record[-2] | FLAG_EXTRA, record[-1])
+        return RECORD.pack(*record)
+
+    def _entry(self, record, extra, match_id):
+        heroes = self.heroes
+        entry = {
+            "teammates": [heroes[h] for h in record[:TEAM_SIZE] if h != NO_HERO],
+            "enemies": [heroes[h] for h in record[TEAM_SIZE:SLOTS] if h != NO_HERO],
+            "map": self.maps[record[SLOTS]],
+            "timestamp": None if record[-1] == NO_TIME else from_micros(record[-1]).isoformat(),
+        }
+        if record[SLOTS + 1] >= 0:
+            entry["outcome"] = OUTCOMES[record[SLOTS + 1]]
+        if record[SLOTS + 2] & FLAG_ID:
+            entry["id"] = match_id
+        if extra:
+            for key in extra.get("_missing", ()):
+                entry.pop(key, None)
+            entry.update((k, v) for k, v in extra.items() if k != "_missing")
+        return entry
+
+    # ------------------------------------------------------------------
+    # Writing
+
+    def _write_all(self, entries, header_size=HEADER_SIZE):
+        """Write a fresh file containing ``entries`` via temp file + rename."""
+        self._close_map()
+        self.heroes, self.maps, self._hero_ids, self._map_ids = [], [], {}, {}
+        self.extras = {}
+        self.next_id = 1
+        records = b"".join(self._pack(entry, i) for i, entry in enumerate(entries))
+        self._replace_file(records, header_size)
+        self.count = len(entries)
+
+    def _replace_file(self, records, header_size=HEADER_SIZE):
+        """Write the header (with every name and extra) and ``records`` as a new generation."""
+        old_sidecar = self.sidecar
+        self.generation += 1
+        self.sidecar = f"{os.path.basename(self.path)}.{self.generation}.names"
+        if os.path.exists(self._sidecar_path()):
+            # Left by an older file of the same name (a rewrite that never
+            # read this one's header starts counting from 1 again).
+            os.remove(self._sidecar_path())
+        header = self._header_bytes(header_size)
+        while header is None:
+            header_size *= 2
+            header = self._header_bytes(header_size)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path)
+        self.header_size = header_size
+        self._stale_extras = False
+        if old_sidecar is not None:
+            try:
+                os.remove(self._sidecar_path(old_sidecar))
+            except FileNotFoundError:
+                pass
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Durably append records.
+
+        Names and extras the batch adds are appended to the sidecar first,
+        so a crash leaves at worst names no record uses.  A version 1 file
+        has no sidecar; it is rewritten once, via temp file + rename.
+        """
+        if not entries:
+            return
+        with self.lock:
+            self._open()
+            try:
+                self._append(entries)
+            except BaseException:
+                self._forget()
+                raise
+
+    def _append(self, entries):
+        heroes, maps = len(self.heroes), len(self.maps)
+        data = b"".join(self._pack(entry, self.count + i) for i, entry in enumerate(entries))
+        line = {"count": self.count}
+        if len(self.heroes) > heroes:
+            line["heroes"] = self.heroes[heroes:]
+        if len(self.maps) > maps:
+            line["maps"] = self.maps[maps:]
+        extras = {str(p): extra for p, extra in self.extras.items() if p >= self.count}
+        if extras:
+            line["extras"] = extras
+        changed = len(line) > 1 or self._stale_extras
+        if changed and self.sidecar is None:
+            with open(self.path, "rb") as f:
+                f.seek(self.header_size)
+                records = f.read(self.count * RECORD_SIZE)
+            self._close_map()
+            self._replace_file(records + data, self.header_size)
+        else:
+            if changed:
+                self._append_sidecar(line)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._stale_extras = False
+        self.count += len(entries)
+
+    def _forget(self):
+        """Drop the in-memory header after a failed write.
+
+        ``_pack`` interns names, notes extras and advances ``next_id`` as it
+        goes; the next access re-reads all of it from the file instead, so
+        nothing of the records that were never written survives (a torn
+        tail is cut off then, too).
+        """
+        self._close_map()
+        self._opened = False
+
+    def rewrite(self, entries):
+        """Atomically replace the log with ``entries``."""
+        with self.lock:
+            self._opened = True
+            try:
+                self._write_all(list(entries))
+            except BaseException:
+                self._forget()
+                raise
+
+    # ------------------------------------------------------------------
+    # Reading
+
+    def _close_map(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A NumPy view is still alive; the mapping closes with it.
+                pass
+            self._mmap = None
+
+    def _map(self):
+        """An mmap covering every complete record, remapped as the file grows."""
+        needed = self.header_size + self.count * RECORD_SIZE
+        if self._mmap is None or len(self._mmap) < needed:
+            self._close_map()
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _records(self):
+        """NumPy structured array (RECORD_DTYPE) over the mapped records, for copying out."""
+        with self.lock:
+            self._open()
+            if not self.count:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            return np.frombuffer(self._map(), dtype=RECORD_DTYPE, count=self.count, offset=self.header_size)
+
+    def _iter_records(self):
+        """Record tuples, without NumPy."""
+        with self.lock:
+            self._open()
+            if not self.count:
+                return iter(())
+            view = memoryview(self._map())[self.header_size:self.header_size + self.count * RECORD_SIZE]
+            return RECORD.iter_unpack(view)
+
+    def load(self):
+        """Every match as a journal dict, oldest first."""
+        records = self._iter_records()
+        ids = self._record_ids()[0]
+        return [self._entry(record, self.extras.get(i), ids[i]) for i, record in enumerate(records)]
+
+    def load_store(self, heroes=None, maps=None):
+        """The history as a ``MatchStore``, copied column by column.
+
+        ``heroes``/``maps`` are the engine's interners; the file's ids are
+        translated to theirs.
+        """
+        store = MatchStore(heroes, maps)
+        self._open()
+        hero_map = [store.heroes.intern(name) for name in self.heroes]
+        map_map = [store.maps.intern(name) for name in self.maps]
+        if np is not None:
+            records = self._records()
+            lut = np.full(NO_HERO + 1, NO_HERO, dtype=np.uint16)
+            lut[:len(hero_map)] = hero_map
+            store.slots.frombytes(lut[records["heroes"]].tobytes())
+            store.map_ids.frombytes(np.array(map_map, dtype=np.uint16)[records["map"]].tobytes()
+                                    if len(records) else b"")
+            store.times.frombytes(records["time"].astype(np.int64).tobytes())
+            store.outcomes.frombytes(records["outcome"].tobytes())
+            del records
+        else:
+            for record in self._iter_records():
+                store.slots.extend(NO_HERO if h == NO_HERO else hero_map[h] for h in record[:SLOTS])
+                store.map_ids.append(map_map[record[SLOTS]])
+                store.outcomes.append(record[SLOTS + 1])
+                store.times.append(record[-1])
+        store.set_ids(self._record_ids()[0])
+        for position, extra in self.extras.items():
+            for side in ("teammates", "enemies"):
+                names = extra.get(side)
+                if names and len(names) > TEAM_SIZE:
+                    store.overflow.setdefault(position, {})[side] = names[TEAM_SIZE:]
+            if extra.get("timestamp") is not None:
+                # Offsets and odd spellings the record's microseconds lose.
+                store.raw_times[position] = extra["timestamp"]
+            fields = {k: v for k, v in extra.items() if k not in ENTRY_KEYS}
+            if "outcome" in extra:
+                fields["outcome"] = extra["outcome"]
+            if fields:
+                store.extra_fields[position] = fields
+        return store
+
+    def export(self, path=JOURNAL_FILE):
+        """Write the log back out as a JSONL journal; returns the match count."""
+        entries = self.load()
+        write_lines_atomic(path, entries)
+        return len(entries)
+
+
+def open_match_log(path=JOURNAL_FILE, legacy_path=LEGACY_FILE, journal_path=JOURNAL_FILE, create=True):
+    """The match log at ``path``: binary for ``.bin`` files, else the journal.
+
+    A binary log that does not exist yet is converted from ``journal_path``,
+    unless ``create`` is false; then reading it raises FileNotFoundError.
+    """
+    if path.endswith(".bin"):
+        return BinaryMatchLog(path, import_from=MatchJournal(journal_path, legacy_path), create=create)
+    return MatchJournal(path, legacy_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between the JSONL journal and the binary match log.")
+    parser.add_argument("command", choices=["import", "export", "info"])
+    parser.add_argument("--bin", default=BINLOG_FILE)
+    parser.add_argument("--journal", default=JOURNAL_FILE, help="source for import")
+    parser.add_argument("--legacy", default=LEGACY_FILE)
+    parser.add_argument("--out", default="match_log.export.jsonl", help="destination for export")
+    args = parser.parse_args(argv)
+
+    log = BinaryMatchLog(args.bin, create=args.command == "import")
+    if args.command != "import" and not os.path.exists(args.bin):
+        print(f"{args.bin} does not exist.")
+        return 1
+    if args.command == "import":
+        if os.path.exists(args.bin):
+            print(f"{args.bin} already exists; refusing to overwrite it.")
+            return 1
+        entries = MatchJournal(args.journal, args.legacy).load()
+        log.rewrite(entries)
+        print(f"Imported {len(entries)} matches into {args.bin}")
+    elif args.command == "export":
+        count = log.export(args.out)
+        print(f"Exported {count} matches to {args.out}")
+    else:
+        size = os.path.getsize(args.bin)
+        print(f"{args.bin}: schema {SCHEMA_VERSION}, {len(log)} matches, {len(log.heroes)} heroes, "
+              f"{len(log.maps)} maps, {len(log.extras)} records with extras, {size} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Append-only match journal for the OW2 tracker.
+
+Matches are stored one JSON object per line.  Submitting a match appends a
+single line and fsyncs it, so the cost of a submit no longer grows with the
+size of the history and a crash can at worst lose the record that was being
+written.  A torn final line left behind by such a crash is detected and cut
+off the next time the journal is loaded.
+
+The old ``match_log.json`` (one big JSON list) is migrated automatically the
+first time the journal is opened.  Run ``python match_journal.py compact`` to
+rewrite the journal without damaged lines; the previous file is rotated to a
+timestamped backup unless ``--no-backup`` is given.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+JOURNAL_FILE = "match_log.jsonl"
+LEGACY_FILE = "match_log.json"
+
+
+def _fsync_dir(path):
+    # Make the rename/creation of ``path`` itself durable.  Not supported on
+    # Windows, where opening a directory fails; the data is fsynced anyway.
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _encode(entry):
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def write_lines_atomic(path, entries):
+    """Write ``entries`` as a fresh journal at ``path`` via temp file + rename."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        for entry in entries:
+            f.write(_encode(entry))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+class MatchJournal:
+    """Line-delimited, append-only store for submitted matches."""
+
+    def __init__(self, path=JOURNAL_FILE, legacy_path=LEGACY_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        # Number of lines skipped during the last load because they could not
+        # be parsed.  ``compact`` drops them for good.
+        self.damaged = 0
+
+    def migrate(self):
+        """Convert the legacy ``match_log.json`` list into a journal.
+
+        Only runs when no journal exists yet.  The legacy file is renamed to
+        ``<name>.migrated`` afterwards so it is not mistaken for live data.
+        """
+        if os.path.exists(self.path) or not self.legacy_path:
+            return False
+        if not os.path.exists(self.legacy_path):
+            return False
+        with open(self.legacy_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        write_lines_atomic(self.path, entries)
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        print(f"Migrated {len(entries)} matches from {self.legacy_path} to {self.path}")
+        return True
+
+    def load(self):
+        """Return every match in the journal, oldest first."""
+        self.migrate()
+        self.damaged = 0
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            raw = f.read()
+
+        entries = []
+        offset = 0
+        while offset < len(raw):
+            end = raw.find(b"\n", offset)
+            if end == -1:
+                # The last write never completed (no trailing newline).  Cut
+                # it off so the next append starts on a clean line.
+                print(f"⚠️ Dropping incomplete record at end of {self.path}")
+                with open(self.path, "r+b") as f:
+                    f.truncate(offset)
+                    f.flush()
+                    os.fsync(f.fileno())
+                break
+            line = raw[offset:end].strip()
+            offset = end + 1
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                self.damaged += 1
+        if self.damaged:
+            print(f"⚠️ Skipped {self.damaged} damaged records in {self.path}")
+        return entries
+
+    def append(self, entry):
+        """Durably append a single match record."""
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Durably append several records with a single write and fsync."""
+        data = b"".join(_encode(entry) for entry in entries)
+        if not data:
+            return
+        created = not os.path.exists(self.path)
+        # O_APPEND plus a single write keeps the records contiguous at the
+        # end of the file; fsync makes them durable before we return.
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if created:
+            _fsync_dir(self.path)
+
+    def rewrite(self, entries):
+        """Atomically replace the journal contents with ``entries``."""
+        write_lines_atomic(self.path, entries)
+
+    def compact(self, backup=True):
+        """Rewrite the journal without damaged records.
+
+        With ``backup`` the current file is first rotated to
+        ``<path>.<timestamp>`` so nothing is lost if the result is not what
+        was expected.  Returns the number of records kept.
+        """
+        entries = self.load()
+        if backup and os.path.exists(self.path):
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            os.replace(self.path, f"{self.path}.{stamp}")
+        self.rewrite(entries)
+        return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the OW2 tracker match journal.")
+    parser.add_argument("command", choices=["compact", "migrate"])
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--legacy", default=LEGACY_FILE)
+    parser.add_argument("--no-backup", action="store_true", help="don't keep the pre-compaction file")
+    args = parser.parse_args(argv)
+
+    journal = MatchJournal(args.journal, args.legacy)
+    if args.command == "migrate":
+        if not journal.migrate():
+            print("Nothing to migrate.")
+        return 0
+    kept = journal.compact(backup=not args.no_backup)
+    print(f"Compacted {args.journal}: {kept} matches kept, {journal.damaged} damaged records dropped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""Compact, column-wise match history.
+
+Heroes and maps are interned to small integer ids.  ``MatchStore`` keeps
+each column in a typed array:
+
+* ``slots``: ``array('H')`` with ``SLOTS`` hero ids per match, teammates
+  first, then enemies
+* ``map_ids``: ``array('H')``
+* ``times``: ``array('q')``, microseconds since the epoch
+* ``outcomes``: ``array('b')``, an index into ``OUTCOMES`` or -1
+* ``ids``: ``array('q')``, the match id saved as the entry's ``id``
+
+That is 39 bytes per match instead of a dict, two lists and a timestamp
+string.  The counters and indexes work on the ids.  As a sequence the store
+holds the matches that are not deleted: ``len(store)``, ``store[i]`` and
+iteration give their familiar journal dicts, so code at the UI and storage
+boundaries that indexes or iterates ``match_log`` keeps working unchanged.
+
+Keys the columns don't cover (a hand-added "note", an outcome spelled
+some other way) are kept per row in ``extra_fields`` and given back by
+``entry()``, so rewriting the log after an edit or delete loses nothing.
+
+Match ids are stable: entries saved before ids existed get the next free id
+in log order, which is what they keep once the log is rewritten.
+``position(match_id)`` finds a match in constant time through an id ->
+position table.  Edits overwrite a row in place and deletes leave a
+tombstone, so positions (and every index keyed by them) never shift during a
+session; iteration skips deleted rows and the next rewrite drops them.
+"""
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from winrates import OUTCOMES
+
+TEAM_SIZE = 5
+SLOTS = 2 * TEAM_SIZE
+# Slot value for a missing hero in hand-edited entries with short teams.
+NO_HERO = 0xFFFF
+# ``times`` value for a timestamp that could not be parsed.  The original
+# string of any timestamp that ``timestamp()`` would not give back exactly
+# (this one, one with a UTC offset, other ISO spellings) is kept in
+# ``MatchStore.raw_times``.
+NO_TIME = -(1 << 63)
+# The journal keys the columns hold; anything else is an extra field.
+ENTRY_KEYS = ("teammates", "enemies", "map", "timestamp", "outcome", "id")
+
+# Ids this far past the end of the id table go into a dict instead of
+# growing the table; only hand-edited logs have such gaps.
+ID_SLACK = 1 << 16
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value):
+    """ISO timestamp string -> microseconds since the epoch, or NO_TIME.
+
+    A UTC offset is applied, so the result is naive UTC.
+    """
+    try:
+        when = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return NO_TIME
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return (when - EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def valid_id(value):
+    """Whether ``value`` can be a match id; anything else gets a fresh one."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+class Interner:
+    """Case-insensitive name <-> small integer id."""
+
+    def __init__(self, names=()):
+        self.ids = {}        # lowercased name -> id
+        self.exact = {}      # name as spelled -> id, skips the lower() call
+        self.keys = []       # id -> lowercased name
+        self.names = []      # id -> first spelling seen
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def intern(self, name):
+        """Id of ``name``, assigning the next one to a new name."""
+        name_id = self.exact.get(name)
+        if name_id is not None:
+            return name_id
+        key = name.lower()
+        name_id = self.ids.get(key)
+        if name_id is None:
+            name_id = self.ids[key] = len(self.keys)
+            if name_id >= NO_HERO:
+                raise OverflowError("too many distinct names")
+            self.keys.append(key)
+            self.names.append(name)
+        self.exact[name] = name_id
+        return name_id
+
+    def get(self, name):
+        """Id of ``name`` or None; never assigns."""
+        name_id = self.exact.get(name)
+        return name_id if name_id is not None else self.ids.get(name.lower())
+
+
+def copy_interner(interner):
+    copy = Interner()
+    copy.ids, copy.exact = dict(interner.ids), dict(interner.exact)
+    copy.keys, copy.names = list(interner.keys), list(interner.names)
+    return copy
+
+
+class MatchStore:
+    """The match history as typed columns; indexable like a list of entries."""
+
+    def __init__(self, heroes=None, maps=None, entries=()):
+        self.heroes = heroes if heroes is not None else Interner()
+        self.maps = maps if maps is not None else Interner()
+        self.slots = array("H")
+        self.map_ids = array("H")
+        self.times = array("q")
+        self.outcomes = array("b")
+        self.ids = array("q")
+        self.next_id = 1
+        self.index = array("q")   # match id -> position, -1 when unused
+        self.sparse_index = {}    # ids beyond the table's reach -> position
+        self.deleted = set()      # positions of deleted matches
+        self.raw_times = {}   # position -> timestamp string that does not round-trip
+        # Each side of a hand-edited entry may hold more than TEAM_SIZE
+        # heroes; the extras are kept here so nothing is lost.
+        self.overflow = {}
+        # position -> keys outside ENTRY_KEYS (or an outcome the column
+        # can't hold), plus "_missing": keys ``entry()`` would add.
+        self.extra_fields = {}
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self):
+        """Number of matches that are not deleted."""
+        return self.live_count()
+
+    def __iter__(self):
+        for position in self.live_positions():
+            yield self.entry(position)
+
+    def __getitem__(self, index):
+        """The ``index``-th match that is not deleted, as a journal dict."""
+        if isinstance(index, slice):
+            return [self.entry(self.live_position(i)) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("match index out of range")
+        return self.entry(self.live_position(index))
+
+    def row_count(self):
+        """Number of rows, deleted ones included; positions run up to this."""
+        return len(self.map_ids)
+
+    def live_count(self):
+        return self.row_count() - len(self.deleted)
+
+    def live_position(self, index):
+        """Position of the ``index``-th match that is not deleted."""
+        for position in sorted(self.deleted):
+            if position > index:
+                break
+            index += 1
+        return index
+
+    def live_positions(self, reverse=False, skip=0):
+        """Positions of the matches that are not deleted.
+
+        ``skip`` leaves out the first ``skip`` of them (oldest first).
+        """
+        deleted = self.deleted
+        if reverse:
+            positions = range(self.row_count() - 1, -1, -1)
+        else:
+            positions = range(self.live_position(skip), self.row_count())
+        return (p for p in positions if p not in deleted)
+
+    def checksum(self, count=None, tail=None):
+        """CRC-32 of every column over the first ``count`` live matches (default: all).
+
+        With ``tail`` only the last ``tail`` of those are covered, so the
+        cost doesn't grow with the history.  Deleted rows are skipped, so the
+        value matches that of the same history reloaded from its rewritten log.
+        """
+        count = self.live_count() if count is None else count
+        first = 0 if tail is None else max(count - tail, 0)
+        remaining = count - first
+        runs, start = [], self.live_position(first)
+        for end in sorted(d for d in self.deleted if d > start) + [self.row_count()]:
+            take = min(end - start, remaining)
+            if take > 0:
+                runs.append((start, start + take))
+                remaining -= take
+            start = end + 1
+            if not remaining:
+                break
+        crc = 0
+        for column, width in ((self.slots, SLOTS), (self.map_ids, 1), (self.times, 1),
+                              (self.outcomes, 1), (self.ids, 1)):
+            view = memoryview(column)
+            for a, b in runs:
+                crc = zlib.crc32(view[a * width:b * width], crc)
+        return crc
+
+    # ------------------------------------------------------------------
+    # Writing
+
+    def _columns(self, entry, position):
+        """``(slots, map id, micros, outcome)`` for ``entry`` stored at ``position``."""
+        hero = self.heroes.intern
+        slots = []
+        self.overflow.pop(position, None)
+        for side in ("teammates", "enemies"):
+            names = list(entry.get(side) or [])
+            slots.extend(hero(h) for h in names[:TEAM_SIZE])
+            slots.extend([NO_HERO] * (TEAM_SIZE - min(len(names), TEAM_SIZE)))
+            if len(names) > TEAM_SIZE:
+                self.overflow.setdefault(position, {})[side] = names[TEAM_SIZE:]
+        timestamp = entry.get("timestamp")
+        micros = to_micros(timestamp)
+        self.raw_times.pop(position, None)
+        if timestamp is not None and (micros == NO_TIME or from_micros(micros).isoformat() != timestamp):
+            self.raw_times[position] = timestamp
+        outcome = entry.get("outcome")
+        extra = {k: v for k, v in entry.items() if k not in ENTRY_KEYS}
+        if outcome is not None and outcome not in OUTCOMES:
+            extra["outcome"] = outcome
+        missing = [k for k in ("teammates", "enemies", "map", "timestamp") if k not in entry]
+        if missing:
+            extra["_missing"] = missing
+        self.extra_fields.pop(position, None)
+        if extra:
+            self.extra_fields[position] = extra
+        return (slots, self.maps.intern(entry.get("map") or ""), micros,
+                OUTCOMES.index(outcome) if outcome in OUTCOMES else -1)
+
+    def append(self, entry):
+        """Add a journal-style dict; returns its position.
+
+        The entry's ``id`` is kept; without one it gets the next free id.
+        """
+        slots, map_id, micros, outcome = self._columns(entry, self.row_count())
+        return self.append_ids(slots[:TEAM_SIZE], slots[TEAM_SIZE:], map_id, micros, outcome,
+                               entry.get("id"))
+
+    def append_ids(self, teammates, enemies, map_id, micros, outcome=-1, match_id=None):
+        """Add a match given as ids; returns its position."""
+        for team in (teammates, enemies):
+            self.slots.extend(team)
+            if len(team) < TEAM_SIZE:
+                self.slots.extend([NO_HERO] * (TEAM_SIZE - len(team)))
+        self.map_ids.append(map_id)
+        self.times.append(micros)
+        self.outcomes.append(outcome)
+        if not valid_id(match_id):
+            match_id = self.next_id
+        self.ids.append(match_id)
+        self.next_id = max(self.next_id, match_id + 1)
+        position = len(self.map_ids) - 1
+        self._link(match_id, position)
+        return position
+
+    def replace(self, position, entry):
+        """Overwrite match ``position`` with ``entry``, keeping its id."""
+        slots, map_id, micros, outcome = self._columns(entry, position)
+        self.slots[position * SLOTS:(position + 1) * SLOTS] = array("H", slots)
+        self.map_ids[position] = map_id
+        self.times[position] = micros
+        self.outcomes[position] = outcome
+
+    def delete(self, position):
+        """Mark match ``position`` deleted; its row stays until the log is rewritten."""
+        self.deleted.add(position)
+        self._link(self.ids[position], -1)
+
+    def snapshot(self):
+        """An independent copy, e.g. to hand to another process."""
+        copy = MatchStore(copy_interner(self.heroes), copy_interner(self.maps))
+        for name in ("slots", "map_ids", "times", "outcomes", "ids", "index"):
+            setattr(copy, name, array(getattr(self, name).typecode, getattr(self, name)))
+        copy.next_id = self.next_id
+        copy.sparse_index = dict(self.sparse_index)
+        copy.deleted = set(self.deleted)
+        copy.raw_times = dict(self.raw_times)
+        copy.overflow = {p: dict(sides) for p, sides in self.overflow.items()}
+        copy.extra_fields = {p: dict(extra) for p, extra in self.extra_fields.items()}
+        return copy
+
+    def set_ids(self, ids):
+        """Replace the id column (bulk loads) and rebuild the index."""
+        self.ids = array("q", ids)
+        self.index, self.sparse_index = array("q"), {}
+        for position, match_id in enumerate(self.ids):
+            self._link(match_id, position)
+        self.next_id = max(self.ids) + 1 if self.ids else 1
+
+    def _link(self, match_id, position):
+        index = self.index
+        if match_id < len(index):
+            index[match_id] = position
+        elif match_id < len(index) + ID_SLACK:
+            index.extend([-1] * (match_id - len(index)))
+            index.append(position)
+        elif position < 0:
+            self.sparse_index.pop(match_id, None)
+        else:
+            self.sparse_index[match_id] = position
+
+    # ------------------------------------------------------------------
+    # Reading
+
+    def position(self, match_id):
+        """Position of the match with id ``match_id``; KeyError if there is none."""
+        if 0 <= match_id < len(self.index):
+            position = self.index[match_id]
+        else:
+            position = self.sparse_index.get(match_id, -1)
+        if position < 0:
+            raise KeyError(match_id)
+        return position
+
+    def team_ids(self, position, side):
+        start = position * SLOTS + (0 if side == "teammates" else TEAM_SIZE)
+        return [h for h in self.slots[start:start + TEAM_SIZE] if h != NO_HERO]
+
+    def hero_ids(self, position):
+        """Every hero id in the match, both sides."""
+        start = position * SLOTS
+        return [h for h in self.slots[start:start + SLOTS] if h != NO_HERO]
+
+    def outcome(self, position):
+        code = self.outcomes[position]
+        return OUTCOMES[code] if code >= 0 else None
+
+    def timestamp(self, position):
+        """The timestamp as an ISO string, as it was recorded."""
+        raw = self.raw_times.get(position)
+        if raw is not None:
+            return raw
+        micros = self.times[position]
+        return None if micros == NO_TIME else from_micros(micros).isoformat()
+
+    def time(self, position):
+        """The timestamp as a datetime, or None."""
+        micros = self.times[position]
+        return None if micros == NO_TIME else from_micros(micros)
+
+    def entry(self, position):
+        """Materialize match ``position`` as a journal dict."""
+        names = self.heroes.names
+        extra = self.overflow.get(position, {})
+        entry = {
+            side: [names[h] for h in self.team_ids(position, side)] + extra.get(side, [])
+            for side in ("teammates", "enemies")
+        }
+        entry["map"] = self.maps.names[self.map_ids[position]]
+        entry["timestamp"] = self.timestamp(position)
+        outcome = self.outcome(position)
+        if outcome:
+            entry["outcome"] = outcome
+        entry["id"] = self.ids[position]
+        fields = self.extra_fields.get(position)
+        if fields:
+            for key in fields.get("_missing", ()):
+                entry.pop(key, None)
+            entry.update((k, v) for k, v in fields.items() if k != "_missing")
+        return entry
+
+    def nbytes(self):
+        """Bytes held by the column arrays."""
+        return sum(a.itemsize * len(a) for a in (self.slots, self.map_ids, self.times, self.outcomes, self.ids))
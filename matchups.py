@@ -0,0 +1,211 @@
+"""Hero synergy and counter matrices.
+
+``MatchupMatrices`` keeps two square count matrices indexed by hero id:
+
+* ``synergy[layer, a, b]``: matches where ``a`` and ``b`` were teammates
+* ``counters[layer, a, e]``: matches where teammate ``a`` faced enemy ``e``
+
+Each has a GAMES layer plus WINS, LOSSES and DRAWS layers for matches with a
+recorded outcome.  A new match updates both matrices in place; a whole match
+log is counted in one vectorized pass with ``np.bincount``, straight from the
+``MatchStore`` id columns.  Hero ids follow the roster order and new heroes
+get the next id; the arrays grow by doubling so adding heroes stays cheap.
+
+NumPy is optional: without it ``AVAILABLE`` is False and the engine simply
+has no matchup data.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from match_store import NO_HERO, SLOTS, TEAM_SIZE
+from winrates import OUTCOMES, Record
+
+AVAILABLE = np is not None
+
+GAMES, WINS, LOSSES, DRAWS = range(4)
+LAYERS = 4
+INITIAL_CAPACITY = 64
+# Matches counted per bincount call by ``rebuild_store``; bounds the temporary
+# index arrays for very long logs.
+CHUNK = 1 << 16
+# Fewest decided matches before a pair is ranked by win rate.
+MIN_GAMES = 3
+
+
+class MatchupMatrices:
+    """Ally-ally and ally-enemy match counts for every pair of heroes."""
+
+    def __init__(self, heroes=(), capacity=INITIAL_CAPACITY):
+        self.ids = {}       # hero key -> row/column
+        self.names = []     # row/column -> hero key
+        self.capacity = max(capacity, len(heroes), 1)
+        self.synergy = np.zeros((LAYERS, self.capacity, self.capacity), dtype=np.int32)
+        self.counters = np.zeros_like(self.synergy)
+        for hero in heroes:
+            self.hero_id(hero)
+
+    @classmethod
+    def from_store(cls, store):
+        """Count a ``MatchStore`` straight from its id columns."""
+        matrices = cls(store.heroes.keys)
+        matrices.rebuild_store(store)
+        return matrices
+
+    def hero_id(self, hero):
+        """Row/column of ``hero``, assigning the next id to a new hero."""
+        key = hero.lower()
+        hero_id = self.ids.get(key)
+        if hero_id is None:
+            hero_id = self.ids[key] = len(self.names)
+            self.names.append(key)
+            if hero_id >= self.capacity:
+                self._grow(max(self.capacity * 2, hero_id + 1))
+        return hero_id
+
+    def _grow(self, capacity):
+        n = self.capacity
+        for attr in ("synergy", "counters"):
+            grown = np.zeros((LAYERS, capacity, capacity), dtype=np.int32)
+            grown[:, :n, :n] = getattr(self, attr)
+            setattr(self, attr, grown)
+        self.capacity = capacity
+
+    # ------------------------------------------------------------------
+    # Counting
+
+    def add(self, entry, delta=1):
+        """Count one match log entry; ``delta=-1`` takes it back out."""
+        allies = np.array([self.hero_id(h) for h in entry.get("teammates", [])], dtype=np.intp)
+        enemies = np.array([self.hero_id(h) for h in entry.get("enemies", [])], dtype=np.intp)
+        layers = [GAMES]
+        outcome = entry.get("outcome")
+        if outcome in OUTCOMES:
+            layers.append(WINS + OUTCOMES.index(outcome))
+        # Every ordered pair of distinct ally slots and every ally/enemy slot
+        # pair, as ``_count_ids`` counts them.  ``np.add.at`` accumulates a
+        # pair that occurs twice (a hand-edited team listing a hero twice);
+        # ``+=`` on fancy indexes would count it once.
+        ally_a, ally_b = np.nonzero(~np.eye(len(allies), dtype=bool))
+        vs_a, vs_e = np.indices((len(allies), len(enemies))).reshape(2, -1)
+        for layer in layers:
+            np.add.at(self.synergy[layer], (allies[ally_a], allies[ally_b]), delta)
+            np.add.at(self.counters[layer], (allies[vs_a], enemies[vs_e]), delta)
+
+    def rebuild_store(self, store):
+        """Recount everything from a ``MatchStore`` without building entries."""
+        self.synergy[:] = 0
+        self.counters[:] = 0
+        n = store.row_count()
+        if not n:
+            return
+        # Store ids -> matrix ids (the same unless heroes were added here first).
+        lut = np.array([self.hero_id(key) for key in store.heroes.keys], dtype=np.intp)
+        # Zero-copy views; they must be gone before the store is appended to
+        # again, which they are once this method returns.
+        slots = np.frombuffer(store.slots, dtype=np.uint16).reshape(n, SLOTS)
+        outcomes = np.frombuffer(store.outcomes, dtype=np.int8)
+        live = np.ones(n, dtype=bool)
+        live[list(store.deleted)] = False
+        complete = (slots != NO_HERO).all(axis=1)
+        full = complete & live
+        for start in range(0, n, CHUNK):
+            keep = full[start:start + CHUNK]
+            ids = lut[slots[start:start + CHUNK][keep]]
+            self._count_ids(ids[:, :TEAM_SIZE], ids[:, TEAM_SIZE:], outcomes[start:start + CHUNK][keep])
+        for position in np.flatnonzero(~complete & live):
+            self.add(store.entry(int(position)))
+
+    def _count_ids(self, allies, enemies, outcomes):
+        """Count matches given as ``(n, TEAM_SIZE)`` id arrays."""
+        # Every ordered pair of distinct ally slots, and every ally/enemy slot pair.
+        ally_a, ally_b = np.nonzero(~np.eye(TEAM_SIZE, dtype=bool))
+        vs_a, vs_e = np.indices((TEAM_SIZE, TEAM_SIZE)).reshape(2, -1)
+        self._accumulate(self.synergy, allies[:, ally_a], allies[:, ally_b], outcomes)
+        self._accumulate(self.counters, allies[:, vs_a], enemies[:, vs_e], outcomes)
+
+    def _accumulate(self, matrix, rows, cols, outcomes):
+        cap = self.capacity
+        flat = (rows * cap + cols).ravel()
+        per_pair = np.repeat(outcomes, rows.shape[1])
+        size = cap * cap
+        matrix[GAMES] += np.bincount(flat, minlength=size).reshape(cap, cap).astype(np.int32)
+        for i in range(len(OUTCOMES)):
+            hits = flat[per_pair == i]
+            matrix[WINS + i] += np.bincount(hits, minlength=size).reshape(cap, cap).astype(np.int32)
+
+    def to_dict(self):
+        """The non-zero cells as ``[layer, row, column, count]``, with the heroes' names."""
+        n = len(self.names)
+        data = {"heroes": list(self.names)}
+        for attr in ("synergy", "counters"):
+            data[attr] = _cells(getattr(self, attr)[:, :n, :n]).tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        matrices = cls(data["heroes"])
+        # A name saved twice (a hand-edited file) shares one row.
+        ids = np.array([matrices.hero_id(h) for h in data["heroes"]], dtype=np.intp)
+        for attr in ("synergy", "counters"):
+            cells = np.array(data[attr], dtype=np.int64).reshape(-1, 4)
+            np.add.at(getattr(matrices, attr), (cells[:, 0], ids[cells[:, 1]], ids[cells[:, 2]]),
+                      cells[:, 3].astype(np.int32))
+        return matrices
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def pair(self, matrix, a, b):
+        """``(games, Record)`` for heroes ``a`` and ``b`` in ``matrix``."""
+        i, j = self.ids.get(a.lower()), self.ids.get(b.lower())
+        if i is None or j is None:
+            return 0, Record()
+        cell = matrix[:, i, j]
+        return int(cell[GAMES]), Record(*(int(v) for v in cell[WINS:]))
+
+    def top(self, matrix, hero, k=10, by="games", min_games=MIN_GAMES):
+        """The ``k`` best partners of ``hero`` in ``matrix``.
+
+        ``by="games"`` ranks by matches together, ``"winrate"`` by win rate
+        (best first) and ``"lossrate"`` by win rate worst first, among pairs
+        with at least ``min_games`` decided matches.  Returns
+        ``[(hero_key, games, Record), ...]``.
+        """
+        i = self.ids.get(hero.lower())
+        if i is None:
+            return []
+        n = len(self.names)
+        row = matrix[:, i, :n]
+        games = row[GAMES]
+        if by == "games":
+            score = games.astype(np.float64)
+            candidates = np.flatnonzero(games)
+        else:
+            decided = row[WINS:].sum(axis=0)
+            candidates = np.flatnonzero(decided >= max(min_games, 1))
+            rate = row[WINS, candidates] / decided[candidates]
+            score = np.zeros(n)
+            score[candidates] = rate if by == "winrate" else 1.0 - rate
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-score[candidates], k - 1)[:k]]
+        # Highest score first, then most games, then by name.
+        ranked = sorted(candidates, key=lambda j: (-score[j], -games[j], self.names[j]))
+        return [
+            (self.names[j], int(games[j]), Record(*(int(v) for v in row[WINS:, j])))
+            for j in ranked
+        ]
+
+    def top_synergies(self, hero, k=10, by="games"):
+        """Teammates ``hero`` played with most (or won most with)."""
+        return self.top(self.synergy, hero, k, by)
+
+    def top_counters(self, hero, k=10, by="games"):
+        """Enemies ``hero`` faced most (or, with ``"lossrate"``, lost to most)."""
+        return self.top(self.counters, hero, k, by)
+
+
+def _cells(matrix):
+    layer, row, col = np.nonzero(matrix)
+    return np.stack([layer, row, col, matrix[layer, row, col]], axis=1)
@@ -1,16 +1,67 @@
-
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import json
+import argparse
 import os
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import islice
+from diagnostics import DIAGNOSTICS_FILE, ENABLED as DIAGNOSTICS_ENABLED, Diagnostics
+from match_binlog import BINLOG_FILE, open_match_log
+from match_store import to_micros
+from matchups import MatchupMatrices
+from report import REPORT_DIR, collect as collect_report, write_report
+from persistence import PersistenceManager
+from rollups import RANGE_PRESETS
+from sqlite_store import SqliteStatsStore
+from stats_api import API_ENABLED, API_ORIGINS, API_PORT, StatsApi
+from tracker_core import (
+    AGGREGATES_FILE,
+    HEROES_FILE,
+    MAPS_FILE,
+    MATCH_JOURNAL_FILE,
+    MATCH_LOG_FILE,
+    SAVE_FILE,
+    STATS_DB_FILE,
+    HAVE_NUMPY,
+    TEAM_SIZE,
+    TrackerEngine,
+    pick_rate_table,
+)
+from trends import as_datetimes, cumulative, downsample
+from winrates import NO_RESULT, ROLLING_WINDOW
+from workers import AnalyticsPool, Spinner, locked
+
+# Startup timing: (label, seconds since launch) for each phase, printed once
+# the first frame has been drawn.
+STARTUP_T0 = time.perf_counter()
+startup_marks = [("imports", STARTUP_T0)]
+
+def mark_startup(label):
+    startup_marks.append((label, time.perf_counter()))
+
+def report_startup():
+    mark_startup("first frame")
+    steps = [
+        f"{label} {(t - prev) * 1000:.0f}ms"
+        for (_, prev), (label, t) in zip(startup_marks, startup_marks[1:])
+    ]
+    total = (startup_marks[-1][1] - STARTUP_T0) * 1000
+    print(f"Startup: {', '.join(steps)} (first frame after {total:.0f}ms)")
 
 # Constants
-SAVE_FILE = "ow2_stats.json"
-HEROES_FILE = "heroes.json"
-MATCH_LOG_FILE = "match_log.json"
+# "json" keeps the counters in SAVE_FILE; "sqlite" stores matches in
+# STATS_DB_FILE and answers the stats pages with indexed queries.
+STORAGE_BACKEND = os.environ.get("OW2_STORAGE", "json").lower()
+# "binary" keeps the match history in BINLOG_FILE (memory-mapped, fixed-width
+# records) instead of the JSONL journal, which it is converted from once.
+MATCH_LOG_FORMAT = os.environ.get("OW2_MATCH_LOG", "jsonl").lower()
+# With the SQLite backend SAVE_FILE is only a startup checkpoint, rewritten
+# after this many new matches; AGGREGATES_FILE is, with either backend.
+CHECKPOINT_INTERVAL = 50
 DARK_BG = "#06141B"
 MID_BG = "#11212D"
 LIGHT_BG = "#253745"
@@ -20,84 +71,474 @@ MODERN_FONT = ("Segoe UI", 10)
 # project inside the ``hero_icons`` folder, so build the path relative to this
 # file to ensure it works regardless of where the script is run from.
 ICON_DIR = os.path.join(os.path.dirname(__file__), "hero_icons")
-
-# Globals
-match_log = []
-if os.path.exists(MATCH_LOG_FILE):
-    with open(MATCH_LOG_FILE, "r", encoding="utf-8") as f:
-        match_log = json.load(f)
-
-if os.path.exists(HEROES_FILE):
-    with open(HEROES_FILE, "r") as f:
-        HEROES_BY_ROLE = json.load(f)
-else:
-    HEROES_BY_ROLE = {
-        "Tank": ["D.Va", "Doomfist", "Orisa"],
-        "Damage": ["Cassidy", "Sojourn", "Reaper"],
-        "Support": ["Ana", "Moira", "Kiriko"]
+# matplotlib is only needed by the Trend Stats page.  It is imported when
+# that page is first opened, or in the background once the window is up.
+PRELOAD_MATPLOTLIB = os.environ.get("OW2_PRELOAD_MPL", "1") != "0"
+
+# Globals, filled in by load_state() / main()
+engine = None
+stats_store = None
+persistence = None
+# Background pool for page refreshes; None runs them inline (e.g. benchmarks).
+analytics = None
+# Localhost stats API for overlays, when enabled.
+api = None
+root = None
+main_frame = None
+sidebar = None
+# Set by main() when instrumentation is on (OW2_DIAGNOSTICS=1 or --diagnostics).
+diagnostics = None
+diagnostics_file = DIAGNOSTICS_FILE
+
+class AnimationScheduler:
+    """Drive every highlight tween from one shared ``after()`` frame clock.
+
+    Tweens are keyed by (canvas, rectangle).  Animating a rectangle that is
+    already moving retargets it from wherever it currently is, so a quick
+    enter/leave never leaves a highlight stuck half way.  When no tween is
+    active the clock stops until the next hover.
+    """
+
+    FRAME_MS = 10
+
+    def __init__(self):
+        self.tweens = {}
+        self.after_id = None
+        self.clock = None
+        self.ticks = 0
+        self.last_tick_ms = 0.0
+        self.total_tick_ms = 0.0
+
+    @property
+    def active_count(self):
+        return len(self.tweens)
+
+    @property
+    def avg_tick_ms(self):
+        return self.total_tick_ms / self.ticks if self.ticks else 0.0
+
+    def animate(self, canvas, rect, end, duration=100):
+        """Move the right edge of ``rect`` to ``end`` over ``duration`` ms."""
+        x0, y0, x1, y1 = canvas.coords(rect)
+        self.tweens[(canvas, rect)] = {
+            "start": x1,
+            "end": end,
+            "x0": x0,
+            "y0": y0,
+            "y1": y1,
+            "t0": time.perf_counter(),
+            "duration": duration / 1000,
+        }
+        if self.after_id is None:
+            self.clock = canvas.nametowidget(".")
+            self.after_id = self.clock.after(self.FRAME_MS, self._tick)
+
+    def cancel(self, canvas, rect):
+        self.tweens.pop((canvas, rect), None)
+
+    def _tick(self):
+        began = time.perf_counter()
+        for key, tween in list(self.tweens.items()):
+            canvas, rect = key
+            frac = min(1.0, (began - tween["t0"]) / tween["duration"])
+            x = tween["start"] + (tween["end"] - tween["start"]) * frac
+            try:
+                canvas.coords(rect, tween["x0"], tween["y0"], x, tween["y1"])
+            except tk.TclError:
+                # The canvas was destroyed mid-animation.
+                frac = 1.0
+            if frac >= 1.0:
+                del self.tweens[key]
+
+        self.last_tick_ms = (time.perf_counter() - began) * 1000
+        self.total_tick_ms += self.last_tick_ms
+        self.ticks += 1
+        if self.tweens:
+            self.after_id = self.clock.after(self.FRAME_MS, self._tick)
+        else:
+            self.after_id = None
+
+
+animator = AnimationScheduler()
+
+
+def animate_highlight(canvas, rect, end, duration=100):
+    animator.animate(canvas, rect, end, duration)
+
+def load_state():
+    """Load the tracker data and set up the storage backends."""
+    global engine, stats_store, persistence
+    match_journal = open_match_log(
+        BINLOG_FILE if MATCH_LOG_FORMAT == "binary" else MATCH_JOURNAL_FILE,
+        legacy_path=MATCH_LOG_FILE,
+    )
+    engine = TrackerEngine.load(match_journal)
+    if engine.replayed:
+        print(f"Counted {engine.replayed} matches logged after the saved stats")
+
+    if STORAGE_BACKEND == "sqlite":
+        first_run = not os.path.exists(STATS_DB_FILE)
+        stats_store = SqliteStatsStore(STATS_DB_FILE)
+        if first_run:
+            imported = stats_store.import_json(engine.match_log, engine.heroes_by_role)
+            if engine.counted_after:
+                stats_store.reset(engine.counted_after)
+            print(f"Imported {imported} matches into {STATS_DB_FILE}")
+
+    # All writes go through the persistence manager so UI callbacks never
+    # wait on the disk.  Mutations of the engine must hold ``persistence.lock``.
+    persistence = PersistenceManager()
+    persistence.register_journal("match_log", match_journal)
+    persistence.register("stats", SAVE_FILE, engine.stats_snapshot)
+    persistence.register("aggregates", AGGREGATES_FILE, engine.aggregates_snapshot)
+    persistence.register("heroes", HEROES_FILE, lambda: engine.heroes_by_role)
+    persistence.register("maps", MAPS_FILE, lambda: engine.maps)
+
+def stats_source():
+    """Where the stats pages read from: the database or the engine."""
+    return stats_store if stats_store is not None else engine
+
+_db_writer = None
+
+def db_write(method, *args):
+    """Queue a write to the SQLite backend.
+
+    The writer thread uses its own connection; WAL mode lets the UI
+    connection keep reading while it commits.
+    """
+    def job():
+        global _db_writer
+        if _db_writer is None:
+            _db_writer = SqliteStatsStore(STATS_DB_FILE)
+        getattr(_db_writer, method)(*args)
+    persistence.submit(job)
+
+def run_analytics(view, fn, *args, callback, uses_db=False, delay_ms=0, needs=()):
+    """Run ``fn(*args)`` on the analytics pool and pass the result to ``callback``.
+
+    ``fn`` reads the engine while holding ``persistence.lock``.  Without a
+    pool, or when ``fn`` reads the SQLite store (whose connection belongs to
+    the Tk thread), it runs inline.  ``needs`` names the engine indexes
+    ``fn`` reads; any not built yet are built on the pool first, without
+    holding the lock, so recording a match never waits for them.
+    """
+    missing = [name for name in needs if not engine.index_built(name)]
+    if missing and analytics is not None:
+        def build():
+            for name in missing:
+                engine.ensure_index(name, persistence.lock)
+        analytics.submit(view, build, delay_ms=delay_ms, callback=lambda _: run_analytics(
+            view, fn, *args, callback=callback, uses_db=uses_db))
+        return
+    if analytics is None or (uses_db and stats_store is not None):
+        callback(fn(*args))
+        return
+    analytics.submit(view, locked(persistence.lock, fn), *args, callback=callback, delay_ms=delay_ms)
+
+def page_spinner(frame, view):
+    """A spinner on ``frame`` shown while ``view`` is being computed."""
+    spinner = Spinner(frame, bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT)
+    spinner.pack()
+    if analytics is not None:
+        analytics.attach_spinner(view, spinner)
+    return spinner
+
+def save_data(checkpoint=False):
+    """Tell the API about a change and save the stats.
+
+    ``checkpoint`` forces the save in SQLite mode too, for changes a replay
+    of the log tail can't reproduce (a reset, an edited past match).
+    """
+    if api is not None:
+        api.notify()
+    if checkpoint or engine.match_log.live_count() - engine.aggregated >= CHECKPOINT_INTERVAL:
+        persistence.mark_dirty("aggregates")
+    if (stats_store is not None and not checkpoint
+            and engine.match_log.live_count() - engine.checkpointed < CHECKPOINT_INTERVAL):
+        # Matches are committed to the database as they are submitted; the
+        # stats file is only rewritten now and then, as a startup checkpoint.
+        return
+    persistence.mark_dirty("stats")
+
+class _Descending:
+    """Sort key wrapper that inverts the comparison of ``value``."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _column_value(value):
+    if isinstance(value, str):
+        percent = re.match(r"(\d+(?:\.\d+)?)%", value)
+        if percent:
+            return float(percent.group(1))
+        if value == NO_RESULT:
+            # Sorts below every real percentage.
+            return -1.0
+        return value.casefold()
+    return value
+
+
+class KeyedTable:
+    """Keep a Treeview in sync with ``{key: row values}`` by diffing.
+
+    Each row's item id is its key.  ``update`` only inserts, deletes, edits or
+    moves the rows that actually changed, and the sort order is maintained
+    with bisection instead of re-sorting, so a refresh costs time in
+    proportion to what changed.  Clicking a column heading sorts by it
+    (clicking again flips the direction); ``set_limit`` and ``set_page``
+    restrict the view to a top-N slice or a page of ``limit`` rows.
+    """
+
+    def __init__(self, tree, sort_column, descending=True, limit=None):
+        self.tree = tree
+        self.columns = list(tree["columns"])
+        self.sort_index = self.columns.index(sort_column)
+        self.descending = descending
+        self.limit = limit
+        self.page = 0
+        self.rows = {}      # key -> values
+        self.order = []     # sorted [(sort key, key)]
+        self.shown = {}     # key -> values currently in the tree
+        self.visible = []   # keys in tree order
+        for col in self.columns:
+            tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+
+    def _sort_key(self, key):
+        value = _column_value(self.rows[key][self.sort_index])
+        return (_Descending(value) if self.descending else value, key)
+
+    def update(self, rows):
+        """Make the table show ``rows``; returns the number of rows changed."""
+        changed = 0
+        for key in [k for k in self.rows if k not in rows]:
+            del self.order[bisect_left(self.order, self._sort_key(key))]
+            del self.rows[key]
+            changed += 1
+        for key, values in rows.items():
+            values = tuple(values)
+            old = self.rows.get(key)
+            if old == values:
+                continue
+            if old is not None:
+                del self.order[bisect_left(self.order, self._sort_key(key))]
+            self.rows[key] = values
+            insort(self.order, self._sort_key(key))
+            changed += 1
+        if changed:
+            self._render()
+        return changed
+
+    def sort_by(self, column, descending=None):
+        index = self.columns.index(column)
+        if descending is not None:
+            self.sort_index = index
+            self.descending = descending
+        elif index == self.sort_index:
+            self.descending = not self.descending
+        else:
+            self.sort_index = index
+            # Numbers read best largest first, names alphabetically.
+            sample = next(iter(self.rows.values()), None)
+            self.descending = sample is None or not isinstance(_column_value(sample[index]), str)
+        self.order = sorted(self._sort_key(key) for key in self.rows)
+        self._render()
+
+    def set_limit(self, limit):
+        self.limit = limit
+        self.page = 0
+        self._render()
+
+    def set_page(self, page):
+        pages = max(1, -(-len(self.order) // self.limit)) if self.limit else 1
+        self.page = min(max(0, page), pages - 1)
+        self._render()
+
+    def _render(self):
+        start = self.page * self.limit if self.limit else 0
+        end = start + self.limit if self.limit else None
+        desired = [key for _, key in self.order[start:end]]
+        desired_set = set(desired)
+        tree = self.tree
+
+        gone = [key for key in self.visible if key not in desired_set]
+        if gone:
+            tree.delete(*gone)
+            for key in gone:
+                del self.shown[key]
+        kept = [key for key in self.visible if key in desired_set]
+
+        # Rows that keep their relative order stay put.  Everything else
+        # (new rows and rows that moved) is detached and re-placed at its
+        # final index in ascending order, which leaves the tree in ``desired``
+        # order without touching the rest.
+        rank = {key: i for i, key in enumerate(desired)}
+        stay = set()
+        last = -1
+        for key in kept:
+            if rank[key] > last:
+                stay.add(key)
+                last = rank[key]
+        movers = [key for key in kept if key not in stay]
+        if movers:
+            tree.detach(*movers)
+        for i, key in enumerate(desired):
+            values = self.rows[key]
+            if key not in self.shown:
+                tree.insert("", i, iid=key, values=values)
+            else:
+                if key not in stay:
+                    tree.move(key, "", i)
+                if self.shown[key] != values:
+                    tree.item(key, values=values)
+            self.shown[key] = values
+        self.visible = desired
+
+
+# Choices for the "show" selector above the Match Entry tables.
+TOP_N_CHOICES = {"All": None, "Top 5": 5, "Top 10": 10, "Top 20": 20}
+
+def table_for(tree, sort_column):
+    """The KeyedTable managing ``tree``, created on first use."""
+    table = getattr(tree, "table", None)
+    if table is None:
+        table = tree.table = KeyedTable(tree, sort_column)
+    return table
+
+def range_needs(label):
+    """The engine indexes ``stats_for_range(label)`` reads."""
+    return ("rollups",) if label and RANGE_PRESETS[label] is not None else ()
+
+def stats_for_range(label):
+    """``(pick counts, win records)`` for a RANGE_PRESETS label."""
+    if not range_needs(label):
+        return stats_source(), engine.win_stats
+    rollup = engine.rollups.preset(label)
+    return rollup, rollup
+
+def stats_rows(label):
+    """``{side: {hero: row}}`` for the Match Entry tables."""
+    source, win_stats = stats_for_range(label)
+    return {
+        side: {h: row + (str(win_stats.hero(h, side)),) for h, row in pick_rate_table(source, side).items()}
+        for side in ("teammates", "enemies")
     }
 
-def animate_highlight(canvas, rect, start, end, steps=10, delay=10, anim_flag=None):
-    if anim_flag is not None and anim_flag["running"]:
-        return
-    if anim_flag is not None:
-        anim_flag["running"] = True
-
-    delta = (end - start) / steps
-    def step(i=0):
-        if i > steps:
-            if anim_flag is not None:
-                anim_flag["running"] = False
+def show_stats_rows(rows, teammate_tree, enemy_tree, recent_label=None):
+    for tree, side in ((teammate_tree, "teammates"), (enemy_tree, "enemies")):
+        table_for(tree, "Games").update(rows[side])
+    if recent_label is not None:
+        recent_label.config(text=f"Last {ROLLING_WINDOW} matches: {engine.win_stats.recent}")
+
+def display_stats(teammate_tree, enemy_tree, recent_label=None, range_var=None):
+    """Refresh the Match Entry tables right away."""
+    show_stats_rows(stats_rows(range_var.get() if range_var else None), teammate_tree, enemy_tree, recent_label)
+
+def request_stats(teammate_tree, enemy_tree, recent_label=None, range_var=None):
+    """``display_stats`` with the rows built in the background."""
+    label = range_var.get() if range_var else None
+    run_analytics(
+        "stats", stats_rows, label, uses_db=True, needs=range_needs(label),
+        callback=lambda rows: show_stats_rows(rows, teammate_tree, enemy_tree, recent_label),
+    )
+
+# (icon path, subsample factor) -> PhotoImage.  Every icon is decoded once and
+# both sizes the UI uses are kept, so opening menus never touches the disk.
+ICON_CACHE = {}
+# Env switch for decoding every icon in the background right after startup.
+ICON_WARMUP = os.environ.get("OW2_ICON_WARMUP", "1") != "0"
+
+
+def icon_key(name):
+    """Normalize a hero name for matching against icon file names."""
+    name = unicodedata.normalize("NFKD", name).encode("ASCII", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class HeroIcons:
+    """Name-to-icon index plus the decoded, pre-scaled icons in ICON_CACHE.
+
+    The icon folder is listed once and file names are matched on
+    ``icon_key`` so "Icon-kiriko.png", "Torbjörn" (NFC or NFD), "Soldier 76"
+    or "Soldier_76" all resolve to the same file.
+    """
+
+    MENU = 8   # 32px, used in the dropdown lists
+    LABEL = 4  # 64px, used under each dropdown
+    SCALES = (MENU, LABEL)
+
+    def __init__(self, icon_dir):
+        self.index = {}
+        self.failed = set()
+        try:
+            files = os.listdir(icon_dir)
+        except OSError as e:
+            print(f"⚠️ Cannot read hero icons: {e}")
+            files = []
+        for filename in files:
+            base, ext = os.path.splitext(filename)
+            if ext.lower() == ".png" and base.startswith("Icon-"):
+                self.index[icon_key(base[len("Icon-"):])] = os.path.join(icon_dir, filename)
+
+    def path_for(self, hero):
+        return self.index.get(icon_key(hero)) if hero else None
+
+    def _decode(self, path):
+        try:
+            original = tk.PhotoImage(file=path)
+        except tk.TclError as e:
+            print(f"⚠️ Error loading image {os.path.basename(path)}: {e}")
+            self.failed.add(path)
             return
-        canvas.coords(rect, 0, 0, start + delta * i, 30)
-        canvas.after(delay, step, i + 1)
-    step()
-
-    with open(HEROES_FILE, "w") as f:
-        json.dump(HEROES_BY_ROLE, f)
-
-ALL_HEROES = {h.lower(): role for role, heroes in HEROES_BY_ROLE.items() for h in heroes}
-MAPS = ['New Queen Street', 'Colosseo', 'Esperança', 'New Junk City', 'Circuit Royal', 'Dorado', 'Havana', 'Junkertown', 'Route 66', 'Shambali Monastery', 'Blizzard World', 'Eichenwalde', 'King’s Row', 'Midtown', 'Numbani', 'Paraíso', 'Ilios', 'Lijiang Tower', 'Nepal', 'Oasis', 'Antarctic Peninsula', 'Samoa', 'Suravasa']
-
-if os.path.exists(SAVE_FILE):
-    with open(SAVE_FILE, "r") as f:
-        data = json.load(f)
-        teammate_matches = data.get("teammates", {})
-        enemy_matches = data.get("enemies", {})
-        total_matches = data.get("matches", 0)
-        map_stats = data.get("map_stats", {})
-else:
-    teammate_matches, enemy_matches, total_matches, map_stats = {}, {}, 0, {}
-
-def save_data():
-    with open(SAVE_FILE, "w") as f:
-        json.dump({
-            "teammates": teammate_matches,
-            "enemies": enemy_matches,
-            "matches": total_matches,
-            "map_stats": map_stats
-        }, f)
-
-def display_stats(teammate_tree, enemy_tree):
-    def fill_tree(tree, data):
-        tree.delete(*tree.get_children())
-        if total_matches:
-            sorted_data = sorted(
-                [(h.title(), f"{(c / total_matches) * 100:.2f}%", c) for h, c in data.items()],
-                key=lambda x: -x[2],
-            )
-        else:
-            sorted_data = []
-        for row in sorted_data:
-            tree.insert("", "end", values=row)
+        for factor in self.SCALES:
+            ICON_CACHE[(path, factor)] = original.subsample(factor, factor)
+
+    def get(self, hero, factor):
+        """Return the cached icon for ``hero`` at 1/``factor`` size, or None."""
+        path = self.path_for(hero)
+        if path is None:
+            return None
+        img = ICON_CACHE.get((path, factor))
+        if img is None and path not in self.failed:
+            self._decode(path)
+            img = ICON_CACHE.get((path, factor))
+        return img
 
-    fill_tree(teammate_tree, teammate_matches)
-    fill_tree(enemy_tree, enemy_matches)
+    def warm_up(self, widget, batch=4):
+        """Decode all icons a few at a time from the Tk event loop."""
+        pending = [p for p in self.index.values() if (p, self.MENU) not in ICON_CACHE]
 
-ICON_CACHE = {}  # add this near top of your file, after constants
+        def step():
+            for path in pending[:batch]:
+                if (path, self.MENU) not in ICON_CACHE and path not in self.failed:
+                    self._decode(path)
+            del pending[:batch]
+            if pending:
+                widget.after(1, step)
+
+        widget.after_idle(step)
+
+
+hero_icons = HeroIcons(ICON_DIR)
 
 class ScrollableIconMenu(tk.Frame):
-    """A custom dropdown widget that displays hero icons with a scrollable list."""
+    """A custom dropdown widget that displays hero icons with a scrollable list.
+
+    The list is virtualized: each menu owns one popup that is hidden rather
+    than destroyed, and only the rows inside the 150px viewport exist as
+    widgets.  Scrolling re-labels a small pool of row canvases, so opening a
+    menu costs the same no matter how many heroes the role has.
+    """
+
+    ROW_HEIGHT = 42      # 40px item plus 1px padding above and below
+    VIEW_HEIGHT = 150
 
     def __init__(self, parent, values, variable):
         super().__init__(parent, bg=DARK_BG)
@@ -118,107 +559,174 @@ class ScrollableIconMenu(tk.Frame):
             font=MODERN_FONT,
             command=self._toggle_menu,
         )
-        # Calculate an appropriate width for each dropdown item based on the
-        # longest hero name so the menu is only as wide as needed.
-        font_obj = tk.font.Font(font=MODERN_FONT)
-        text_width = max((font_obj.measure(h) for h in values), default=0)
-        # Leave room for the icon (about 40px) and a small padding buffer.
-        self.item_width = text_width + 50
+        self.item_width = self._measure_items(values)
         # Don't force the button to expand to the full frame width so the menu
         # remains form fitting to the hero name.
         self.button.pack()
 
         self.dropdown = None
+        self.viewport = None
+        self.scrollbar = None
+        self.rows = []
+        self.offset = 0
+        self.is_open = False
         self.outside_click = None
 
+    def _measure_items(self, values):
+        # Calculate an appropriate width for each dropdown item based on the
+        # longest hero name so the menu is only as wide as needed.
+        font_obj = tk.font.Font(font=MODERN_FONT)
+        text_width = max((font_obj.measure(h) for h in values), default=0)
+        # Leave room for the icon (about 40px) and a small padding buffer.
+        return text_width + 50
+
+    def set_values(self, values):
+        """Replace the hero list, e.g. after a hero was added."""
+        self.values = values
+        self.button.config(width=max((len(h) for h in values), default=0) + 2)
+        self.item_width = self._measure_items(values)
+        if self.dropdown is not None:
+            self.viewport.config(width=self.item_width)
+            for row in self.rows:
+                row["canvas"].config(width=self.item_width)
+                row["hero"] = None
+            if self.is_open:
+                self._render()
+
+    def _build_dropdown(self):
+        self.dropdown = tk.Toplevel(self)
+        self.dropdown.wm_overrideredirect(True)
+        self.dropdown.withdraw()
+
+        self.viewport = tk.Frame(
+            self.dropdown, bg=LIGHT_BG, width=self.item_width, height=self.VIEW_HEIGHT
+        )
+        self.scrollbar = tk.Scrollbar(self.dropdown, orient="vertical", command=self._on_scrollbar)
+        self.viewport.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Enough rows to cover the viewport when it is scrolled half way
+        # through a row.
+        for _ in range(self.VIEW_HEIGHT // self.ROW_HEIGHT + 2):
+            self.rows.append(self._make_row())
+
+        for widget in [self.viewport] + [row["canvas"] for row in self.rows]:
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda e: self._scroll_by(-self.ROW_HEIGHT))
+            widget.bind("<Button-5>", lambda e: self._scroll_by(self.ROW_HEIGHT))
+
+    def _make_row(self):
+        # Give each item a bit more breathing room so the icons and hero
+        # names aren't crowded together.
+        item_canvas = tk.Canvas(
+            self.viewport,
+            width=self.item_width,
+            height=40,
+            highlightthickness=0,
+            bg=LIGHT_BG,
+        )
+        row = {
+            "canvas": item_canvas,
+            "hero": None,
+            "rect": item_canvas.create_rectangle(0, 0, 0, 40, fill="#54b3d6", width=0),
+            # Center the icon vertically within the 40px tall item.
+            "image": item_canvas.create_image(20, 20),
+            "label": item_canvas.create_text(
+                40, 20, anchor="w", text="", fill=FONT_COLOR, font=MODERN_FONT
+            ),
+        }
+
+        def on_enter(e):
+            animate_highlight(item_canvas, row["rect"], self.item_width)
+
+        def on_leave(e):
+            animate_highlight(item_canvas, row["rect"], 0)
+
+        def on_click(e):
+            if row["hero"] is not None:
+                self._select(row["hero"])
+
+        # Canvas level bindings also fire over the icon and text items.
+        item_canvas.bind("<Enter>", on_enter)
+        item_canvas.bind("<Leave>", on_leave)
+        item_canvas.bind("<Button-1>", on_click)
+        return row
+
+    def _render(self):
+        """Place the pooled rows over the heroes visible at ``self.offset``."""
+        total = len(self.values) * self.ROW_HEIGHT
+        view = min(self.VIEW_HEIGHT, total)
+        self.offset = min(max(0, self.offset), max(0, total - view))
+        first = self.offset // self.ROW_HEIGHT
+
+        for i, row in enumerate(self.rows):
+            idx = first + i
+            item_canvas = row["canvas"]
+            if idx >= len(self.values):
+                row["hero"] = None
+                item_canvas.place_forget()
+                continue
+            hero = self.values[idx]
+            if row["hero"] != hero:
+                row["hero"] = hero
+                img = hero_icons.get(hero, HeroIcons.MENU)
+                item_canvas.itemconfig(row["image"], image=img or "")
+                item_canvas.coords(row["label"], 40 if img else 10, 20)
+                item_canvas.itemconfig(row["label"], text=hero)
+                # A recycled row must not keep the previous hero's highlight.
+                animator.cancel(item_canvas, row["rect"])
+                item_canvas.coords(row["rect"], 0, 0, 0, 40)
+            item_canvas.place(x=0, y=idx * self.ROW_HEIGHT + 1 - self.offset)
+
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + view) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _scroll_by(self, pixels):
+        self.offset += pixels
+        self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.values) * self.ROW_HEIGHT)
+            self._render()
+        elif unit == "pages":
+            self._scroll_by(int(amount) * (self.VIEW_HEIGHT - self.ROW_HEIGHT))
+        else:
+            self._scroll_by(int(amount) * self.ROW_HEIGHT)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas.
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._scroll_by(-notches * self.ROW_HEIGHT)
+
     def _toggle_menu(self):
-        if self.dropdown and self.dropdown.winfo_exists():
+        if self.is_open:
             self._close_menu()
             return
 
-        self.dropdown = tk.Toplevel(self)
-        self.dropdown.wm_overrideredirect(True)
+        if self.dropdown is None or not self.dropdown.winfo_exists():
+            self.rows = []
+            self._build_dropdown()
 
         x = self.winfo_rootx()
         y = self.winfo_rooty() + self.winfo_height()
         self.dropdown.geometry(f"+{x}+{y}")
 
-        canvas = tk.Canvas(self.dropdown, bg=LIGHT_BG, highlightthickness=0)
-        scrollbar = tk.Scrollbar(self.dropdown, orient="vertical", command=canvas.yview)
-        canvas.configure(yscrollcommand=scrollbar.set, height=150)
-
-        scroll_frame = tk.Frame(canvas, bg=LIGHT_BG)
-        canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
-
-        def on_configure(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
-
-        scroll_frame.bind("<Configure>", on_configure)
-
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        for hero in self.values:
-            icon_path = os.path.join(ICON_DIR, f"Icon-{hero}.png")
-            img = None
-            if os.path.exists(icon_path):
-                try:
-                    original = tk.PhotoImage(file=icon_path)
-                    # Scale down the 256x256 hero icons so they fit comfortably
-                    # in the dropdown menu without being cropped.
-                    img = original.subsample(8, 8)
-                except Exception as e:
-                    print(f"⚠️ Error loading image for {hero}: {e}")
-
-            # Give each item a bit more breathing room so the icons and
-            # hero names aren't crowded together.
-            item_canvas = tk.Canvas(
-                scroll_frame,
-                width=self.item_width,
-                height=40,
-                highlightthickness=0,
-                bg=LIGHT_BG,
-            )
-            rect = item_canvas.create_rectangle(
-                0, 0, 0, 40, fill="#54b3d6", width=0
-            )
-            if img:
-                # Center the icon vertically within the 40px tall item.
-                item_canvas.create_image(20, 20, image=img)
-                text_x = 40
-            else:
-                text_x = 10
-            label = item_canvas.create_text(
-                text_x,
-                20,
-                anchor="w",
-                text=hero,
-                fill=FONT_COLOR,
-                font=MODERN_FONT,
-            )
-            item_canvas.image = img
-            # Slight padding between items keeps the list from feeling cramped.
-            item_canvas.pack(pady=1)
-
-            anim_flag = {"running": False}
-            def on_enter(e, c=item_canvas, r=rect, f=anim_flag):
-                animate_highlight(c, r, 0, self.item_width, anim_flag=f)
-            def on_leave(e, c=item_canvas, r=rect, f=anim_flag):
-                animate_highlight(c, r, self.item_width, 0, anim_flag=f)
-            def on_click(e, h=hero):
-                self._select(h)
-
-            item_canvas.bind("<Enter>", on_enter)
-            item_canvas.bind("<Leave>", on_leave)
-            item_canvas.bind("<Button-1>", on_click)
-            item_canvas.tag_bind(label, "<Enter>", on_enter)
-            item_canvas.tag_bind(label, "<Leave>", on_leave)
-            item_canvas.tag_bind(label, "<Button-1>", on_click)
+        # Open with the current selection in view.
+        current = self.variable.get()
+        if current in self.values:
+            self.offset = self.values.index(current) * self.ROW_HEIGHT
+        self._render()
+        self.dropdown.deiconify()
+        self.dropdown.lift()
+        self.is_open = True
 
         root = self.button.winfo_toplevel()
 
         def outside(event):
-            if self.dropdown and not str(event.widget).startswith(str(self.dropdown)):
+            if self.is_open and not str(event.widget).startswith(str(self.dropdown)):
                 self._close_menu()
 
         self.outside_click = root.bind("<Button-1>", outside, add="+")
@@ -232,16 +740,15 @@ class ScrollableIconMenu(tk.Frame):
         super().destroy()
 
     def _close_menu(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        root = self.button.winfo_toplevel()
+        if self.outside_click:
+            root.unbind("<Button-1>", self.outside_click)
+            self.outside_click = None
         if self.dropdown and self.dropdown.winfo_exists():
-            root = self.button.winfo_toplevel()
-            if self.outside_click:
-                root.unbind("<Button-1>", self.outside_click)
-                self.outside_click = None
-            self.dropdown.destroy()
-            self.dropdown = None
-
-import unicodedata
-import re
+            self.dropdown.withdraw()
 
 def sanitize_filename(name):
     name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode()
@@ -276,88 +783,86 @@ def create_fixed_dropdowns(frame, role_dict, layout):
         def update_icon(*_):
             if not show_icon:
                 return
-            hero = hero_var.get()
-            icon_path = os.path.join(ICON_DIR, f"Icon-{hero}.png")
-            if os.path.exists(icon_path):
-                try:
-                    original = tk.PhotoImage(file=icon_path)
-                    icon = original.subsample(4, 4)
-                    icon_label.config(image=icon)
-                    icon_label.image = icon
-                except Exception as e:
-                    print(f"⚠️ Error loading image for {hero}: {e}")
-                    icon_label.config(image="")
-                    icon_label.image = None
-            else:
-                icon_label.config(image="")
-                icon_label.image = None
+            icon = hero_icons.get(hero_var.get(), HeroIcons.LABEL)
+            icon_label.config(image=icon or "")
+            icon_label.image = icon
 
         hero_var.trace_add("write", update_icon)
         dropdowns.append((hero_var, combo, role))
 
     return dropdowns
 
-def submit_match(teammates, enemies, map_var, teammate_tree, enemy_tree):
-    global total_matches, match_log
+def submit_match(teammates, enemies, map_var, outcome_var, teammate_tree, enemy_tree, recent_label=None, range_var=None):
     t = [d[0].get().strip() for d in teammates]
     e = [d[0].get().strip() for d in enemies]
     m = map_var.get()
-    if len(set(t)) != 5 or len(set(e)) != 5 or "" in t + e or not m:
-        messagebox.showerror("Error", "5 unique teammates, 5 enemies, and a map are required.")
+    outcome = outcome_var.get()
+    error = engine.validate(t, e, m, outcome=outcome, require_outcome=True)
+    if error:
+        messagebox.showerror("Error", error)
         return
-    for h in map(str.lower, t):
-        teammate_matches[h] = teammate_matches.get(h, 0) + 1
-        map_stats.setdefault(m, {}).setdefault("teammates", {})
-        map_stats[m]["teammates"][h] = map_stats[m]["teammates"].get(h, 0) + 1
-    for h in map(str.lower, e):
-        enemy_matches[h] = enemy_matches.get(h, 0) + 1
-        map_stats.setdefault(m, {}).setdefault("enemies", {})
-        map_stats[m]["enemies"][h] = map_stats[m]["enemies"].get(h, 0) + 1
-    total_matches += 1
-    match_log.append({
-        "teammates": t,
-        "enemies": e,
-        "map": m,
-        "timestamp": datetime.now().isoformat()
-    })
-    with open(MATCH_LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(match_log, f)
-    save_data()
-    display_stats(teammate_tree, enemy_tree)
+    with persistence.lock:
+        entry = engine.record_match(t, e, m, outcome=outcome)
+        # Only the new record is appended to the journal, in the background.
+        # Queued under the lock so a pending history rewrite can't miss it.
+        persistence.append("match_log", entry)
+    if stats_store is not None:
+        db_write("add_match", entry)
+        save_data()
+        # The tables are filled from the database, so wait for the write.
+        persistence.when_flushed(teammate_tree, lambda: display_stats(teammate_tree, enemy_tree, recent_label, range_var))
+    else:
+        save_data()
+        request_stats(teammate_tree, enemy_tree, recent_label, range_var)
 
     # clear selections to avoid accidental resubmission
     for var, _, _ in teammates + enemies:
         var.set("")
     map_var.set("")
+    outcome_var.set("")
 
     return None
 
-def reset_stats(teammate_tree, enemy_tree):
-    global teammate_matches, enemy_matches, total_matches, map_stats
+def reset_stats(teammate_tree, enemy_tree, recent_label=None, range_var=None):
     if messagebox.askyesno("Confirm", "Reset all stats?"):
-        teammate_matches, enemy_matches, total_matches, map_stats = {}, {}, 0, {}
-        save_data()
-        display_stats(teammate_tree, enemy_tree)
+        with persistence.lock:
+            engine.reset()
+        if stats_store is not None:
+            db_write("reset", engine.counted_after)
+            save_data(checkpoint=True)
+            persistence.when_flushed(teammate_tree, lambda: display_stats(teammate_tree, enemy_tree, recent_label, range_var))
+        else:
+            save_data(checkpoint=True)
+            request_stats(teammate_tree, enemy_tree, recent_label, range_var)
     return None
 
 def build_match_entry(parent):
     frame = tk.Frame(parent, bg=DARK_BG)
     tk.Label(frame, text="Select Map", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack()
     map_var = tk.StringVar()
-    map_menu = ttk.Combobox(frame, values=MAPS, textvariable=map_var, width=30)
+    map_menu = ttk.Combobox(frame, values=engine.maps, textvariable=map_var, width=30)
     map_menu.pack(pady=5)
 
     teammate_frame = tk.Frame(frame, bg=DARK_BG); teammate_frame.pack()
     enemy_frame = tk.Frame(frame, bg=DARK_BG); enemy_frame.pack()
     tk.Label(frame, text="Teammates", bg=DARK_BG, fg=FONT_COLOR).pack()
-    teammates = create_fixed_dropdowns(teammate_frame, HEROES_BY_ROLE, ["Tank", "Damage", "Damage", "Support", "Support"])
+    teammates = create_fixed_dropdowns(teammate_frame, engine.heroes_by_role, ["Tank", "Damage", "Damage", "Support", "Support"])
     tk.Label(frame, text="Enemies", bg=DARK_BG, fg=FONT_COLOR).pack()
-    enemies = create_fixed_dropdowns(enemy_frame, HEROES_BY_ROLE, ["Tank", "Damage", "Damage", "Support", "Support"])
+    enemies = create_fixed_dropdowns(enemy_frame, engine.heroes_by_role, ["Tank", "Damage", "Damage", "Support", "Support"])
+
+    outcome_var = tk.StringVar(value="")
+    oframe = tk.Frame(frame, bg=DARK_BG); oframe.pack(pady=5)
+    tk.Label(oframe, text="Result", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack(side=tk.LEFT, padx=5)
+    for text, value in (("Win", "win"), ("Loss", "loss"), ("Draw", "draw")):
+        tk.Radiobutton(
+            oframe, text=text, value=value, variable=outcome_var, font=MODERN_FONT,
+            bg=DARK_BG, fg=FONT_COLOR, selectcolor=LIGHT_BG,
+            activebackground=DARK_BG, activeforeground=FONT_COLOR,
+        ).pack(side=tk.LEFT, padx=4)
 
     bframe = tk.Frame(frame, bg=DARK_BG); bframe.pack(pady=10)
 
     def make_btn(text, cmd, col="#253745"):
-        anim_flag = {"running": False}
         container = tk.Frame(bframe, bg=DARK_BG)
         container.pack(side=tk.LEFT, padx=5)
         canvas = tk.Canvas(container, width=160, height=30, highlightthickness=0, bg=DARK_BG)
@@ -367,10 +872,10 @@ def build_match_entry(parent):
 
         def on_enter(e):
             canvas.itemconfig(label, fill="white")
-            animate_highlight(canvas, rect, 0, 160, anim_flag=anim_flag)
+            animate_highlight(canvas, rect, 160)
 
         def on_leave(e):
-            animate_highlight(canvas, rect, 160, 0, anim_flag=anim_flag)
+            animate_highlight(canvas, rect, 0)
             canvas.itemconfig(label, fill="white")
 
         def on_click(e):
@@ -387,6 +892,7 @@ def build_match_entry(parent):
 
     history_index = [-1]
     def fill_from_log(offset=1):
+        match_log = engine.match_log
         if not match_log:
             messagebox.showinfo("History", "No match history found.")
             return
@@ -397,143 +903,696 @@ def build_match_entry(parent):
             teammates[i][0].set(hero)
         for i, hero in enumerate(entry["enemies"]):
             enemies[i][0].set(hero)
+        outcome_var.set(entry.get("outcome", ""))
 
-    make_btn("Submit", lambda: submit_match(teammates, enemies, map_var, teammate_tree, enemy_tree), MID_BG)
-    make_btn("Reset Stats", lambda: reset_stats(teammate_tree, enemy_tree))
+    make_btn("Submit", lambda: submit_match(teammates, enemies, map_var, outcome_var, teammate_tree, enemy_tree, recent_label, range_var), MID_BG)
+    make_btn("Reset Stats", lambda: reset_stats(teammate_tree, enemy_tree, recent_label, range_var))
     make_btn("Same as Last Match", lambda: fill_from_log(1))
 
     def add_new_hero():
         name = simpledialog.askstring("Hero Name", "Enter new hero name:")
         role = simpledialog.askstring("Role", "Enter role (Tank, Damage, Support):")
-        if name and role in HEROES_BY_ROLE:
-            HEROES_BY_ROLE[role].append(name)
-            with open(HEROES_FILE, "w") as f:
-                json.dump(HEROES_BY_ROLE, f)
+        if name and role in engine.heroes_by_role:
+            with persistence.lock:
+                engine.add_hero(name, role)
+            persistence.mark_dirty("heroes")
             # update combobox values for the affected role
             for var, combo, r in teammates + enemies:
                 if r == role:
-                    combo["values"] = HEROES_BY_ROLE[role]
+                    combo.set_values(engine.heroes_by_role[role])
 
     def add_new_map():
         new_map = simpledialog.askstring("Map Name", "Enter new map name:")
-        if new_map and new_map not in MAPS:
-            MAPS.append(new_map)
-            map_menu["values"] = MAPS
+        if new_map and new_map not in engine.maps:
+            with persistence.lock:
+                engine.add_map(new_map)
+            persistence.mark_dirty("maps")
+            map_menu["values"] = engine.maps
 
     make_btn("Add Hero", add_new_hero)
     make_btn("Add Map", add_new_map)
 
+    recent_label = tk.Label(frame, text="", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT)
+    recent_label.pack()
+
+    view_var = tk.StringVar(value="All")
+    range_var = tk.StringVar(value="All Time")
+    filters = tk.Frame(frame, bg=DARK_BG); filters.pack()
+    view_menu = ttk.Combobox(filters, values=list(TOP_N_CHOICES), textvariable=view_var, width=8, state="readonly")
+    view_menu.pack(side=tk.LEFT, padx=5)
+    range_menu = ttk.Combobox(filters, values=list(RANGE_PRESETS), textvariable=range_var, width=14, state="readonly")
+    range_menu.pack(side=tk.LEFT, padx=5)
+
     tk.Label(frame, text="Teammate Stats", bg=DARK_BG, fg=FONT_COLOR).pack()
-    teammate_tree = ttk.Treeview(frame, columns=("Hero", "Pick Rate", "Games"), show="headings", height=6)
+    teammate_tree = ttk.Treeview(frame, columns=("Hero", "Pick Rate", "Games", "Win Rate"), show="headings", height=6)
     for col in teammate_tree["columns"]: teammate_tree.heading(col, text=col)
     teammate_tree.pack(pady=5)
 
     tk.Label(frame, text="Enemy Stats", bg=DARK_BG, fg=FONT_COLOR).pack()
-    enemy_tree = ttk.Treeview(frame, columns=("Hero", "Pick Rate", "Games"), show="headings", height=6)
+    enemy_tree = ttk.Treeview(frame, columns=("Hero", "Pick Rate", "Games", "Win Rate"), show="headings", height=6)
     for col in enemy_tree["columns"]: enemy_tree.heading(col, text=col)
     enemy_tree.pack(pady=5)
 
-    display_stats(teammate_tree, enemy_tree)
+    def change_view(*_):
+        for tree in (teammate_tree, enemy_tree):
+            table_for(tree, "Games").set_limit(TOP_N_CHOICES[view_var.get()])
+
+    view_var.trace_add("write", change_view)
+    page_spinner(frame, "stats")
+    range_var.trace_add("write", lambda *_: request_stats(teammate_tree, enemy_tree, recent_label, range_var))
+    request_stats(teammate_tree, enemy_tree, recent_label, range_var)
+    # Pick up matches edited or deleted on the History page.
+    frame.bind("<Map>", lambda _: request_stats(teammate_tree, enemy_tree, recent_label, range_var))
     return frame
 def build_map_stats_page(parent):
     frame = tk.Frame(parent, bg=DARK_BG)
     map_var = tk.StringVar()
     tk.Label(frame, text="Select Map", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack()
-    map_menu = ttk.Combobox(frame, values=MAPS, textvariable=map_var, width=30)
+    map_menu = ttk.Combobox(frame, values=engine.maps, textvariable=map_var, width=30)
     map_menu.pack(pady=5)
+    range_var = tk.StringVar(value="All Time")
+    range_menu = ttk.Combobox(frame, values=list(RANGE_PRESETS), textvariable=range_var, width=14, state="readonly")
+    range_menu.pack()
 
     tk.Label(frame, text="Teammate Picks", bg=DARK_BG, fg=FONT_COLOR).pack()
-    teammate_tree = ttk.Treeview(frame, columns=("Hero", "Pick Count"), show="headings", height=8)
+    teammate_tree = ttk.Treeview(frame, columns=("Hero", "Pick Count", "Win Rate"), show="headings", height=8)
     for col in teammate_tree["columns"]: teammate_tree.heading(col, text=col)
     teammate_tree.pack(pady=5)
 
     tk.Label(frame, text="Enemy Picks", bg=DARK_BG, fg=FONT_COLOR).pack()
-    enemy_tree = ttk.Treeview(frame, columns=("Hero", "Pick Count"), show="headings", height=8)
+    enemy_tree = ttk.Treeview(frame, columns=("Hero", "Pick Count", "Win Rate"), show="headings", height=8)
     for col in enemy_tree["columns"]: enemy_tree.heading(col, text=col)
     enemy_tree.pack(pady=5)
 
     win_rate_label = tk.Label(frame, text="", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT)
     win_rate_label.pack(pady=10)
 
-    def update_map_stats(*_):
-        selected = map_var.get()
-        teammate_tree.delete(*teammate_tree.get_children())
-        enemy_tree.delete(*enemy_tree.get_children())
-        if selected in map_stats:
-            wins = map_stats[selected].get("wins", 0)
-            total = map_stats[selected].get("total", 0)
+    teammate_table = KeyedTable(teammate_tree, "Pick Count")
+    enemy_table = KeyedTable(enemy_tree, "Pick Count")
+    page_spinner(frame, "map_stats")
+
+    def map_rows(selected, label):
+        """``(record, {side: rows})`` for one map, or None without matches."""
+        source, win_stats = stats_for_range(label)
+        record = source.map_record(selected)
+        if record is None:
+            return None
+        return record, {
+            side: {
+                h: (h.title(), c, str(win_stats.hero_on_map(h, selected, side)))
+                for h, c in source.map_pick_counts(selected, side)
+            }
+            for side in ("teammates", "enemies")
+        }
+
+    def show_map_stats(result):
+        if result is not None:
+            (wins, total), rows = result
             rate = (wins / total * 100) if total > 0 else 0
             win_rate_label.config(text=f"Win Rate: {rate:.2f}% ({wins}/{total})")
-            tstats = map_stats[selected].get("teammates", {})
-            estats = map_stats[selected].get("enemies", {})
-            for h, c in sorted(tstats.items(), key=lambda x: -x[1]):
-                teammate_tree.insert("", "end", values=(h.title(), c))
-            for h, c in sorted(estats.items(), key=lambda x: -x[1]):
-                enemy_tree.insert("", "end", values=(h.title(), c))
+            # Heroes picked on both maps keep their rows; only counts change.
+            teammate_table.update(rows["teammates"])
+            enemy_table.update(rows["enemies"])
         else:
+            teammate_table.update({})
+            enemy_table.update({})
             win_rate_label.config(text="No matches recorded.")
 
+    def update_map_stats(*_):
+        run_analytics("map_stats", map_rows, map_var.get(), range_var.get(), uses_db=True,
+                      needs=range_needs(range_var.get()), callback=show_map_stats,
+                      delay_ms=ANALYTICS_SETTLE_MS)
+
     map_var.trace_add("write", update_map_stats)
+    range_var.trace_add("write", update_map_stats)
     return frame
 
 def build_trend_stats_page(parent):
     frame = tk.Frame(parent, bg=DARK_BG)
     hero_var = tk.StringVar()
     tk.Label(frame, text="Select Hero to View Trends", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack()
-    hero_list = sorted(set(h for role in HEROES_BY_ROLE.values() for h in role))
+    hero_list = engine.hero_names()
     hero_menu = ttk.Combobox(frame, values=hero_list, textvariable=hero_var, width=30)
     hero_menu.pack(pady=5)
 
-    fig, ax = plt.subplots(figsize=(6, 4), dpi=100)
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+
+    fig = Figure(figsize=(6, 4), dpi=100)
+    ax = fig.add_subplot()
     fig.patch.set_facecolor(DARK_BG)
     ax.set_facecolor("#253745")
+    # Real datetime axis instead of one category per timestamp string.
+    ax.xaxis_date()
+    locator = AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    ax.tick_params(colors='white')
+    ax.set_xlabel("Timestamp")
+    ax.set_ylabel("Cumulative Picks")
+    ax.set_title("Trend of Picks Over Time", color="white")
+    line, = ax.plot([], [], marker="o", markersize=3, color="skyblue")
+    fig.tight_layout()
     canvas = FigureCanvasTkAgg(fig, master=frame)
     canvas.get_tk_widget().pack(pady=10)
+    page_spinner(frame, "trend")
+
+    # hero key -> (epoch microseconds, cumulative picks) at full resolution.  Only the
+    # appearances added since the last visit are fetched from the index or the database.
+    series_cache = {}
+    # (hero key, history edits) -> (appearance count, plotted points, axis
+    # limits, rendered pixels) for the last few heroes, so switching back to
+    # an unchanged hero is just a blit.
+    render_cache = OrderedDict()
+    RENDER_CACHE_SIZE = 8
+    # Edits to past matches change points the caches already hold.
+    seen_edits = [engine.history_edits]
+
+    def new_points(hero, start):
+        # The index scan, on the analytics pool; or in SQLite mode the
+        # database query, on the Tk thread that owns the connection.
+        if stats_store is not None:
+            times = [to_micros(ts) for ts in stats_store.hero_timestamps(hero, start)]
+            return engine.history_edits, start, cumulative(times, start)
+        return engine.history_edits, start, engine.trends.series(hero, start=start)
+
+    def appearances(hero):
+        # How many points the hero's series has; None until it can be known.
+        if stats_store is not None:
+            return stats_store.hero_match_count(hero)
+        return engine.trends.count(hero) if engine.index_built("trends") else None
 
     def update_trend_graph(*_):
         hero = hero_var.get()
         if not hero:
             return
-        timestamps, pick_counts = [], []
-        for entry in match_log:
-            if hero in entry.get("teammates", []) + entry.get("enemies", []):
-                timestamps.append(entry["timestamp"])
-                pick_counts.append(pick_counts[-1] + 1 if pick_counts else 1)
-        ax.clear()
-        if timestamps:
-            ax.plot(timestamps, pick_counts, marker="o", color="skyblue")
+        key = hero.lower()
+        if engine.history_edits != seen_edits[0]:
+            seen_edits[0] = engine.history_edits
+            series_cache.clear()
+            render_cache.clear()
+        # Until the index is built (on the pool) there is nothing to compare.
+        version = appearances(hero)
+        cached = render_cache.get((key, seen_edits[0]))
+        if cached and cached[0] == version:
+            render_cache.move_to_end((key, seen_edits[0]))
+            _, points, (xlim, ylim), pixels = cached
+            # The blit only restores pixels; the artists must match them too,
+            # or the next full draw (a resize) shows the previous hero.
+            show_points(hero, points)
+            ax.set_xlim(xlim)
+            ax.set_ylim(ylim)
+            canvas.restore_region(pixels)
+            canvas.blit()
+            return
+
+        start = len(series_cache.get(key, ((),))[0])
+        # Typing or scrolling through the list only draws where it stops.
+        run_analytics("trend", new_points, hero, start, delay_ms=ANALYTICS_SETTLE_MS,
+                      uses_db=True, needs=() if stats_store is not None else ("trends",),
+                      callback=lambda result: draw_trend(hero, result))
+
+    def show_points(hero, points):
+        if points:
+            line.set_data(*points)
+            line.set_visible(True)
             ax.set_title(f"Trend of {hero} Picks Over Time", color="white")
-            ax.set_xlabel("Timestamp")
-            ax.set_ylabel("Cumulative Picks")
-            ax.tick_params(colors='white')
         else:
+            line.set_visible(False)
             ax.set_title("No data available", color="white")
-        fig.tight_layout()
+
+    def draw_trend(hero, result):
+        # Matplotlib's Tk canvas is drawn on the Tk thread; only the data
+        # comes from the pool.
+        key = hero.lower()
+        edits, start, (new_xs, new_ys) = result
+        xs_cached = series_cache.get(key, ((),))[0]
+        if edits != engine.history_edits or len(xs_cached) != start:
+            # History changed while the job ran; ask again.
+            update_trend_graph()
+            return
+        timestamps, pick_counts = series_cache.setdefault(key, ([], []))
+        timestamps.extend(new_xs)
+        pick_counts.extend(new_ys)
+        version = len(timestamps)
+        points = None
+        if timestamps:
+            xs, ys = downsample(timestamps, pick_counts)
+            points = (as_datetimes(xs), ys)
+        show_points(hero, points)
+        if points:
+            ax.relim()
+            ax.autoscale_view()
         canvas.draw()
 
+        cache_key = (key, edits)
+        render_cache[cache_key] = (version, points, (ax.get_xlim(), ax.get_ylim()),
+                                   canvas.copy_from_bbox(fig.bbox))
+        render_cache.move_to_end(cache_key)
+        if len(render_cache) > RENDER_CACHE_SIZE:
+            render_cache.popitem(last=False)
+
     hero_var.trace_add("write", update_trend_graph)
+    # Pick up matches submitted while another page was showing.
+    frame.bind("<Map>", update_trend_graph)
+    return frame
+
+# How long a page waits for its inputs to settle before recomputing, so
+# scrolling through a combobox doesn't queue a job per intermediate value.
+ANALYTICS_SETTLE_MS = 60
+
+# Synergies page: how many partners each table shows, and the rankings.
+MATCHUP_TOP_K = 10
+MATCHUP_RANKINGS = {
+    # label: (ranking, sort column, descending) for the teammate and the
+    # enemy table.  By win rate, the enemies beaten least come first.
+    "Most Games": (("games", "Games", True), ("games", "Games", True)),
+    "Win Rate": (("winrate", "Win Rate", True), ("lossrate", "Win Rate", False)),
+}
+
+def build_synergy_page(parent):
+    frame = tk.Frame(parent, bg=DARK_BG)
+    if not HAVE_NUMPY:
+        tk.Label(frame, text="Install NumPy to see hero synergies and counters.",
+                 bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack(pady=20)
+        return frame
+
+    hero_var = tk.StringVar()
+    rank_var = tk.StringVar(value="Most Games")
+    tk.Label(frame, text="Select Hero", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack()
+    hero_menu = ttk.Combobox(frame, values=engine.hero_names(), textvariable=hero_var, width=30)
+    hero_menu.pack(pady=5)
+    ttk.Combobox(frame, values=list(MATCHUP_RANKINGS), textvariable=rank_var, width=12, state="readonly").pack()
+
+    tk.Label(frame, text="Best Teammates", bg=DARK_BG, fg=FONT_COLOR).pack()
+    synergy_tree = ttk.Treeview(frame, columns=("Hero", "Games", "Win Rate"), show="headings", height=MATCHUP_TOP_K)
+    synergy_tree.pack(pady=5)
+
+    tk.Label(frame, text="Toughest Enemies", bg=DARK_BG, fg=FONT_COLOR).pack()
+    counter_tree = ttk.Treeview(frame, columns=("Hero", "Games", "Win Rate"), show="headings", height=MATCHUP_TOP_K)
+    counter_tree.pack(pady=5)
+
+    synergy_table = KeyedTable(synergy_tree, "Games")
+    counter_table = KeyedTable(counter_tree, "Games")
+    spinner = page_spinner(frame, "matchups")
+    if analytics is not None:
+        analytics.attach_spinner("matchups_build", spinner)
+
+    def matchup_rows(hero, ranking):
+        matchups = engine.matchups
+        synergy_rank, counter_rank = MATCHUP_RANKINGS[ranking]
+        return [
+            (query(hero, MATCHUP_TOP_K, by) if hero else [], column, descending)
+            for query, (by, column, descending) in (
+                (matchups.top_synergies, synergy_rank),
+                (matchups.top_counters, counter_rank),
+            )
+        ]
+
+    def show_matchups(tables):
+        for table, (rows, column, descending) in zip((synergy_table, counter_table), tables):
+            table.sort_by(column, descending)
+            table.update({h: (h.title(), games, str(record)) for h, games, record in rows})
+
+    def adopt(token, matrices):
+        with persistence.lock:
+            adopted = engine.adopt_index("matchups", matrices, token)
+        if not adopted:
+            print("Match history changed while counting matchups; counting again.")
+        update_matchups()
+
+    def update_matchups(*_):
+        if not engine.index_built("matchups") and analytics is not None:
+            if not analytics.busy("matchups_build"):
+                # Counting a long history is NumPy work for the process pool;
+                # it gets a copy of the columns.
+                with persistence.lock:
+                    store, token = engine.history_snapshot()
+                analytics.submit("matchups_build", MatchupMatrices.from_store, store, process=True,
+                                 callback=lambda matrices: adopt(token, matrices))
+            return
+        run_analytics("matchups", matchup_rows, hero_var.get(), rank_var.get(),
+                      callback=show_matchups, delay_ms=ANALYTICS_SETTLE_MS)
+
+    hero_var.trace_add("write", update_matchups)
+    rank_var.trace_add("write", update_matchups)
+
+    def refresh(*_):
+        # Pick up matches and heroes added while another page was showing.
+        hero_menu["values"] = engine.hero_names()
+        update_matchups()
+
+    frame.bind("<Map>", refresh)
     return frame
 
-root = tk.Tk()
-root.title("OW2 Tracker")
-root.geometry("1000x700")
-root.configure(bg=DARK_BG)
+# History page: matches per page, and how many check problems are listed.
+HISTORY_PAGE_SIZE = 50
+CHECK_PROBLEMS_SHOWN = 15
+HISTORY_COLUMNS = ("ID", "Time", "Map", "Result", "Teammates", "Enemies")
+
+def history_row(entry):
+    timestamp = (entry["timestamp"] or "")[:16].replace("T", " ")
+    return (entry["id"], timestamp, entry["map"], (entry.get("outcome") or NO_RESULT).title(),
+            ", ".join(entry["teammates"]), ", ".join(entry["enemies"]))
+
+def save_history_change(method, *args):
+    """Persist an edit or delete of a past match (caller holds no lock)."""
+    # The journal is append-only, so the history is rewritten in the background.
+    persistence.rewrite_journal("match_log", lambda: engine.match_log)
+    if stats_store is not None:
+        db_write(method, *args)
+    save_data(checkpoint=True)
+
+def edit_match_dialog(parent, entry, on_saved):
+    """Modal editor for one past match."""
+    dialog = tk.Toplevel(parent, bg=DARK_BG)
+    dialog.title(f"Edit Match {entry['id']}")
+    dialog.transient(parent)
+    hero_names = engine.hero_names()
+
+    tk.Label(dialog, text="Map", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).grid(row=0, column=0, padx=5, pady=5)
+    map_var = tk.StringVar(value=entry["map"])
+    ttk.Combobox(dialog, values=engine.maps, textvariable=map_var, width=24).grid(row=0, column=1, columnspan=5, sticky=tk.W)
+    tk.Label(dialog, text="Time", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).grid(row=1, column=0, padx=5)
+    time_var = tk.StringVar(value=entry["timestamp"] or "")
+    tk.Entry(dialog, textvariable=time_var, width=26).grid(row=1, column=1, columnspan=5, sticky=tk.W)
+
+    sides = {}
+    for row, (side, label) in enumerate((("teammates", "Teammates"), ("enemies", "Enemies")), start=2):
+        tk.Label(dialog, text=label, bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).grid(row=row, column=0, padx=5, pady=5)
+        names = entry[side] + [""] * (TEAM_SIZE - len(entry[side]))
+        sides[side] = [tk.StringVar(value=name) for name in names[:TEAM_SIZE]]
+        for col, var in enumerate(sides[side], start=1):
+            ttk.Combobox(dialog, values=hero_names, textvariable=var, width=12).grid(row=row, column=col, padx=2)
+
+    outcome_var = tk.StringVar(value=entry.get("outcome", ""))
+    oframe = tk.Frame(dialog, bg=DARK_BG)
+    oframe.grid(row=4, column=0, columnspan=6, pady=5)
+    for text, value in (("Win", "win"), ("Loss", "loss"), ("Draw", "draw")):
+        tk.Radiobutton(
+            oframe, text=text, value=value, variable=outcome_var, font=MODERN_FONT,
+            bg=DARK_BG, fg=FONT_COLOR, selectcolor=LIGHT_BG,
+            activebackground=DARK_BG, activeforeground=FONT_COLOR,
+        ).pack(side=tk.LEFT, padx=4)
+
+    def save():
+        t = [var.get().strip() for var in sides["teammates"]]
+        e = [var.get().strip() for var in sides["enemies"]]
+        m, outcome = map_var.get(), outcome_var.get() or None
+        error = engine.validate(t, e, m, outcome=outcome)
+        if error:
+            messagebox.showerror("Error", error, parent=dialog)
+            return
+        with persistence.lock:
+            old, new = engine.edit_match(entry["id"], t, e, m, outcome, time_var.get().strip() or None)
+        save_history_change("update_match", old, new)
+        dialog.destroy()
+        on_saved()
+
+    bframe = tk.Frame(dialog, bg=DARK_BG)
+    bframe.grid(row=5, column=0, columnspan=6, pady=5)
+    tk.Button(bframe, text="Save", command=save, bg=LIGHT_BG, fg=FONT_COLOR, relief="flat", width=10).pack(side=tk.LEFT, padx=5)
+    tk.Button(bframe, text="Cancel", command=dialog.destroy, bg=LIGHT_BG, fg=FONT_COLOR, relief="flat", width=10).pack(side=tk.LEFT, padx=5)
+    dialog.grab_set()
+
+def build_history_page(parent):
+    frame = tk.Frame(parent, bg=DARK_BG)
+    tk.Label(frame, text="Match History", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT).pack(pady=5)
+
+    tree = ttk.Treeview(frame, columns=HISTORY_COLUMNS, show="headings", height=18, selectmode="browse")
+    for col, width in zip(HISTORY_COLUMNS, (50, 120, 130, 60, 260, 260)):
+        tree.column(col, width=width)
+    tree.pack(pady=5, padx=10, fill=tk.X)
+    # Only the current page is ever in the table; newest first.
+    table = KeyedTable(tree, "ID")
+    page = [0]
+    status = tk.Label(frame, text="", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT)
+
+    def refresh(*_):
+        store = engine.match_log
+        pages = max(1, -(-store.live_count() // HISTORY_PAGE_SIZE))
+        page[0] = min(page[0], pages - 1)
+        positions = islice(store.live_positions(reverse=True), page[0] * HISTORY_PAGE_SIZE,
+                           (page[0] + 1) * HISTORY_PAGE_SIZE)
+        rows = {}
+        for position in positions:
+            entry = store.entry(position)
+            rows[str(entry["id"])] = history_row(entry)
+        table.update(rows)
+        status.config(text=f"Page {page[0] + 1} of {pages} ({store.live_count()} matches)")
+
+    def turn(delta):
+        page[0] = max(0, page[0] + delta)
+        refresh()
+
+    def selected_id():
+        selection = tree.selection()
+        if not selection:
+            messagebox.showinfo("History", "Select a match first.")
+            return None
+        return int(selection[0])
+
+    def go_to():
+        match_id = simpledialog.askinteger("Go to Match", "Match ID:", parent=frame)
+        if match_id is None:
+            return
+        try:
+            entry = engine.match_entry(match_id)
+        except KeyError:
+            messagebox.showerror("History", f"No match with ID {match_id}.")
+            return
+        # Newer live matches come first; count them to find the page.
+        position = engine.match_log.position(match_id)
+        newer = sum(1 for p in range(position + 1, engine.match_log.row_count()) if p not in engine.match_log.deleted)
+        page[0] = newer // HISTORY_PAGE_SIZE
+        refresh()
+        tree.selection_set(str(entry["id"]))
+        tree.see(str(entry["id"]))
+
+    def edit():
+        match_id = selected_id()
+        if match_id is not None:
+            edit_match_dialog(frame, engine.match_entry(match_id), refresh)
+
+    def delete():
+        match_id = selected_id()
+        if match_id is None or not messagebox.askyesno("Confirm", f"Delete match {match_id}?"):
+            return
+        with persistence.lock:
+            old = engine.delete_match(match_id)
+        save_history_change("delete_match", old)
+        refresh()
+
+    def check():
+        # The recount reads a copy of the history on the pool; only the
+        # comparison holds the lock.
+        if analytics is None:
+            show_problems(engine.check(persistence.lock))
+        elif not analytics.busy("check"):
+            analytics.submit("check", engine.check, persistence.lock, callback=show_problems,
+                             on_error=lambda e: messagebox.showerror("Consistency Check", f"Check failed: {e}"))
+
+    def show_problems(problems):
+        if not problems:
+            messagebox.showinfo("Consistency Check", "The stats match the match history.")
+            return
+        listed = "\n".join(problems[:CHECK_PROBLEMS_SHOWN])
+        if len(problems) > CHECK_PROBLEMS_SHOWN:
+            listed += f"\n... and {len(problems) - CHECK_PROBLEMS_SHOWN} more"
+        if messagebox.askyesno("Consistency Check",
+                               f"{len(problems)} problems found:\n{listed}\n\nRebuild the stats from the match history?"):
+            with persistence.lock:
+                engine.rebuild_counts()
+                if stats_store is not None:
+                    # The database is rebuilt from the same history, on the
+                    # writer thread after any writes still queued.
+                    db_write("rebuild", list(engine.match_log),
+                             {role: list(heroes) for role, heroes in engine.heroes_by_role.items()},
+                             engine.counted_after)
+            save_data(checkpoint=True)
+
+    bframe = tk.Frame(frame, bg=DARK_BG)
+    bframe.pack(pady=5)
+    for text, command in (("< Newer", lambda: turn(-1)), ("Older >", lambda: turn(1)), ("Go to ID", go_to),
+                          ("Edit", edit), ("Delete", delete), ("Check Consistency", check)):
+        tk.Button(bframe, text=text, command=command, font=MODERN_FONT, bg=LIGHT_BG, fg=FONT_COLOR,
+                  relief="flat", width=14).pack(side=tk.LEFT, padx=4)
+    page_spinner(frame, "check")
+    status.pack()
+    tree.bind("<Double-1>", lambda _: edit())
+    # Pick up matches submitted while another page was showing.
+    frame.bind("<Map>", refresh)
+    refresh()
+    return frame
 
-sidebar = tk.Frame(root, bg=MID_BG, width=160)
-sidebar.pack(side=tk.LEFT, fill=tk.Y)
-main_frame = tk.Frame(root, bg=DARK_BG)
-main_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+def preload_matplotlib():
+    """Import matplotlib and load its font cache off the Tk thread."""
+    def load():
+        began = time.perf_counter()
+        try:
+            import matplotlib.figure  # noqa: F401
+            import matplotlib.font_manager  # noqa: F401
+            from matplotlib.backends import backend_agg  # noqa: F401
+        except ImportError as e:
+            print(f"⚠️ matplotlib unavailable: {e}")
+            return
+        print(f"matplotlib preloaded in {(time.perf_counter() - began) * 1000:.0f}ms")
+    threading.Thread(target=load, name="mpl-preload", daemon=True).start()
+
+# Diagnostics page: callbacks listed, and how often it refreshes.
+DIAGNOSTICS_TOP_N = 25
+DIAGNOSTICS_REFRESH_MS = 1000
+
+def diagnostics_extra():
+    """App-specific numbers included with the diagnostics."""
+    return {
+        "startup_ms": {label: round((t - STARTUP_T0) * 1000, 1) for label, t in startup_marks},
+        "animations": {
+            "active": animator.active_count,
+            "ticks": animator.ticks,
+            "last_tick_ms": round(animator.last_tick_ms, 3),
+            "avg_tick_ms": round(animator.avg_tick_ms, 3),
+        },
+        "persistence": {
+            "flushes": persistence.flushes,
+            "last_flush_ms": round(persistence.last_flush_ms, 3),
+        },
+        "icon_cache": len(ICON_CACHE),
+        "matches": engine.total_matches,
+        "analytics": None if analytics is None else {
+            "completed": analytics.completed,
+            "superseded": analytics.superseded,
+            "failed": analytics.failed,
+            "last_ms": {view: round(ms, 1) for view, ms in analytics.last_ms.items()},
+        },
+        "api": None if api is None else {
+            "version": api.version,
+            "requests": api.requests,
+            "cache_hits": api.cache_hits,
+            "not_modified": api.not_modified,
+        },
+    }
 
+def build_diagnostics_page(parent):
+    frame = tk.Frame(parent, bg=DARK_BG)
+    summary = tk.Label(frame, text="", bg=DARK_BG, fg=FONT_COLOR, font=MODERN_FONT, justify=tk.LEFT)
+    summary.pack(pady=10)
+
+    tk.Label(frame, text="Slowest Callbacks (total time)", bg=DARK_BG, fg=FONT_COLOR).pack()
+    tree = ttk.Treeview(frame, columns=("Callback", "Calls", "Total ms", "Mean ms", "Max ms", "Slow"),
+                        show="headings", height=15)
+    tree.column("Callback", width=360)
+    for col in tree["columns"][1:]:
+        tree.column(col, width=80, anchor=tk.E)
+    tree.pack(pady=5, fill=tk.X, padx=10)
+    table = KeyedTable(tree, "Total ms", limit=DIAGNOSTICS_TOP_N)
+
+    def refresh():
+        if not frame.winfo_exists():
+            return
+        if frame.winfo_ismapped():
+            diagnostics.sample()
+            lag = diagnostics.lag_summary()
+            extra = diagnostics_extra()
+            summary.config(text="\n".join([
+                f"Main loop lag: last {lag.get('last_ms', 0)}ms, mean {lag.get('mean_ms', 0)}ms, "
+                f"p95 {lag.get('p95_ms', 0)}ms, max {lag.get('max_ms', 0)}ms",
+                f"Widgets: {diagnostics.widgets} (peak {diagnostics.peak_widgets}), "
+                f"images: {diagnostics.images} (peak {diagnostics.peak_images}), "
+                f"icons cached: {extra['icon_cache']}",
+                f"Animations: {extra['animations']['active']} active, "
+                f"{extra['animations']['avg_tick_ms']}ms per frame; "
+                f"disk flushes: {extra['persistence']['flushes']}, "
+                f"last {extra['persistence']['last_flush_ms']}ms",
+            ]))
+            table.update({
+                name: (name, t.count, round(t.total, 1), round(t.mean, 2), round(t.max, 1), t.slow)
+                for name, t in diagnostics.timings.items()
+            })
+        frame.after(DIAGNOSTICS_REFRESH_MS, refresh)
+
+    refresh()
+    return frame
+
+def finish_diagnostics():
+    """Write the diagnostics file once, on the way out."""
+    global diagnostics
+    if diagnostics is None:
+        return
+    try:
+        diagnostics.dump(diagnostics_file, diagnostics_extra())
+    except OSError as e:
+        print(f"⚠️ Could not write {diagnostics_file}: {e}")
+    diagnostics.uninstall()
+    diagnostics = None
+
+def on_close():
+    if analytics is not None:
+        analytics.shutdown()
+    if api is not None:
+        api.stop()
+    # Write out anything still pending before the window goes away, and the
+    # aggregates as they are now, so the next start has nothing to recount.
+    if engine.aggregated != engine.match_log.live_count():
+        persistence.mark_dirty("aggregates")
+    persistence.close()
+    finish_diagnostics()
+    root.destroy()
+
+# Pages are built the first time they are shown.  A failed build is stored
+# as None so it is not retried on every click.
+PAGE_BUILDERS = {
+    "Match Entry": build_match_entry,
+    "Map Stats": build_map_stats_page,
+    "Trend Stats": build_trend_stats_page,
+    "Synergies": build_synergy_page,
+    "History": build_history_page,
+}
 pages = {}
 
+def build_page(name):
+    began = time.perf_counter()
+    try:
+        pages[name] = PAGE_BUILDERS[name](main_frame)
+        elapsed = (time.perf_counter() - began) * 1000
+        print(f"{name} built in {elapsed:.0f}ms")
+        if diagnostics is not None:
+            diagnostics.record(f"page:{name}", elapsed)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        pages[name] = None
+    return pages[name]
+
 def show_page(name):
     for f in pages.values():
         if f is not None:
             f.pack_forget()
-    if pages.get(name):
-        pages[name].pack(fill=tk.BOTH, expand=True)
-
-def add_sidebar_button(name):
+    page = pages[name] if name in pages else build_page(name)
+    if page:
+        page.pack(fill=tk.BOTH, expand=True)
+
+def generate_report():
+    """Write the HTML/PNG report in the background (charts in a process pool)."""
+    def build():
+        engine.ensure_index("trends", persistence.lock)
+        with persistence.lock:
+            data = collect_report(engine)
+        return write_report(data, REPORT_DIR)
+
+    def done(result):
+        drawn, kept = result
+        messagebox.showinfo("Report", f"Report written to {os.path.abspath(REPORT_DIR)}\n"
+                                      f"{drawn} charts drawn, {kept} unchanged.")
+
+    if analytics is None:
+        done(build())
+    elif not analytics.busy("report"):
+        analytics.submit("report", build, callback=done,
+                         on_error=lambda e: messagebox.showerror("Report", f"Could not write the report: {e}"))
+
+def add_sidebar_button(name, command=None):
     btn = tk.Button(sidebar, text=name, font=MODERN_FONT, bg=LIGHT_BG, fg=FONT_COLOR, width=18, relief="flat", activebackground="#314d5f")
 
     def on_enter(e):
@@ -544,32 +1603,65 @@ def add_sidebar_button(name):
 
     btn.bind("<Enter>", on_enter)
     btn.bind("<Leave>", on_leave)
-    btn.config(command=lambda: show_page(name))
+    btn.config(command=command or (lambda: show_page(name)))
     btn.pack(pady=5)
 
-add_sidebar_button("Match Entry")
-add_sidebar_button("Map Stats")
-add_sidebar_button("Trend Stats")
-
-try:
-    pages["Match Entry"] = build_match_entry(main_frame)
-    print("Match Entry built")
-except Exception as e:
-    import traceback
-    traceback.print_exc()
-    pages["Match Entry"] = None
-try:
-    pages["Map Stats"] = build_map_stats_page(main_frame)
-    print("Map Stats built")
-except Exception as e:
-    print("Map Stats failed:", e)
-    pages["Map Stats"] = None
-try:
-    pages["Trend Stats"] = build_trend_stats_page(main_frame)
-    print("Trend Stats built")
-except Exception as e:
-    print("Trend Stats failed:", e)
-    pages["Trend Stats"] = None
-
-show_page("Match Entry")
-root.mainloop()
\ No newline at end of file
+def after_first_frame():
+    report_startup()
+    if PRELOAD_MATPLOTLIB:
+        preload_matplotlib()
+    if ICON_WARMUP:
+        hero_icons.warm_up(root)
+
+def main(argv=None):
+    global root, main_frame, sidebar, diagnostics, diagnostics_file, analytics, api
+    parser = argparse.ArgumentParser(description="OW2 match tracker.")
+    parser.add_argument("--diagnostics", action="store_true", default=DIAGNOSTICS_ENABLED,
+                        help="time callbacks and main-loop lag (also OW2_DIAGNOSTICS=1)")
+    parser.add_argument("--diagnostics-file", default=DIAGNOSTICS_FILE)
+    parser.add_argument("--api", action="store_true", default=API_ENABLED,
+                        help="serve the stats on localhost for overlays (also OW2_API=1)")
+    parser.add_argument("--api-port", type=int, default=API_PORT)
+    parser.add_argument("--api-origin", action="append", default=list(API_ORIGINS),
+                        help="web origin allowed to read the API from a browser (repeatable)")
+    args = parser.parse_args(argv)
+
+    load_state()
+    mark_startup("data")
+    if args.api:
+        api = StatsApi(engine, persistence.lock, port=args.api_port, origins=args.api_origin).start()
+
+    root = tk.Tk()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.title("OW2 Tracker")
+    root.geometry("1000x700")
+    root.configure(bg=DARK_BG)
+    analytics = AnalyticsPool(root)
+
+    sidebar = tk.Frame(root, bg=MID_BG, width=160)
+    sidebar.pack(side=tk.LEFT, fill=tk.Y)
+    main_frame = tk.Frame(root, bg=DARK_BG)
+    main_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+    if args.diagnostics:
+        diagnostics = Diagnostics()
+        diagnostics_file = args.diagnostics_file
+        diagnostics.install(root)
+        # Only listed in sessions that are being instrumented.
+        PAGE_BUILDERS["Diagnostics"] = build_diagnostics_page
+
+    for page_name in PAGE_BUILDERS:
+        add_sidebar_button(page_name)
+    add_sidebar_button("Generate Report", generate_report)
+    mark_startup("window")
+
+    show_page("Match Entry")
+    mark_startup("first page")
+
+    root.after_idle(after_first_frame)
+    root.mainloop()
+    persistence.close()
+    finish_diagnostics()
+
+if __name__ == "__main__":
+    main()
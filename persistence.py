@@ -0,0 +1,255 @@
+"""Write-behind persistence for the OW2 tracker.
+
+The Tk callbacks only mark documents dirty (or queue journal records and
+database jobs); a background thread coalesces bursts of changes and writes
+them out.  Whole documents are replaced atomically with a temp file plus
+rename, so a crash leaves either the old or the new file on disk.
+
+Code that mutates data a registered snapshot reads must hold
+``PersistenceManager.lock`` while doing so.  The writer only holds it while
+serializing in memory, never while touching the disk.
+
+Writes that fail with an I/O error (disk full, a file or database that is
+locked) are retried with a growing delay.  Any other error is a bug that a
+retry won't fix: it is reported with its traceback and the write dropped,
+so the queue keeps moving and ``when_flushed`` callbacks still fire.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+# Failures worth retrying; everything else is reported and dropped.
+RETRIED_ERRORS = (OSError, sqlite3.OperationalError)
+
+
+def _report_dropped(what):
+    print(f"⚠️ {what} failed and was dropped:")
+    traceback.print_exc()
+
+
+def write_text_atomic(path, text):
+    """Replace ``path`` with ``text`` via temp file, fsync and rename."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class PersistenceManager:
+    """Track dirty documents and flush them from a background thread."""
+
+    MAX_BACKOFF = 5.0
+
+    def __init__(self, delay=0.25):
+        # ``delay`` is how long the writer waits after the first change so a
+        # burst of changes ends up as a single write.
+        self.delay = delay
+        self.lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._documents = {}   # name -> (path, snapshot callable)
+        self._journals = {}    # name -> MatchJournal
+        self._dirty = set()
+        self._appends = []     # [(journal name, record)], in submit order
+        self._jobs = []        # callables run on the writer thread
+        self._urgent = False
+        self._closed = False
+        self._busy = False
+        self._requested = 0    # bumped for every queued change
+        self._completed = 0    # highest ``_requested`` known to be on disk
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name="ow2-persistence", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Registration
+
+    def register(self, name, path, snapshot):
+        """Persist ``snapshot()`` as JSON at ``path`` whenever ``name`` is dirty."""
+        self._documents[name] = (path, snapshot)
+
+    def register_journal(self, name, journal):
+        """Route ``append(name, record)`` calls to ``journal``."""
+        self._journals[name] = journal
+
+    # ------------------------------------------------------------------
+    # Called from the UI thread; none of these touch the disk.
+
+    def _queue(self, change):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("persistence manager is closed")
+            change()
+            self._requested += 1
+            self._cond.notify_all()
+
+    def mark_dirty(self, name):
+        if name not in self._documents:
+            raise KeyError(name)
+        self._queue(lambda: self._dirty.add(name))
+
+    def append(self, name, record):
+        if name not in self._journals:
+            raise KeyError(name)
+        self._queue(lambda: self._appends.append((name, record)))
+
+    def submit(self, job):
+        """Run ``job()`` on the writer thread, after earlier queued work."""
+        self._queue(lambda: self._jobs.append(job))
+
+    def rewrite_journal(self, name, entries):
+        """Replace journal ``name`` with ``entries()`` (after an edit or delete).
+
+        ``entries`` is called on the writer thread while holding ``lock``, so
+        it sees every match recorded so far; appends still queued for the
+        journal are dropped because the rewrite already contains them.  Code
+        that records a match must therefore queue its ``append`` before
+        releasing ``lock``.
+        """
+        journal = self._journals[name]
+
+        def job():
+            with self.lock:
+                snapshot = list(entries())
+                with self._cond:
+                    self._appends = [(n, r) for n, r in self._appends if n != name]
+            journal.rewrite(snapshot)
+
+        # Lets ``_write`` drop appends of the same batch that failed: the
+        # rewrite holds them already.
+        job.rewrites = name
+        self.submit(job)
+
+    def is_flushed(self, target=None):
+        return self._completed >= (self._requested if target is None else target)
+
+    def when_flushed(self, widget, callback, poll_ms=30):
+        """Call ``callback`` on the Tk thread once everything queued so far is written."""
+        target = self._requested
+
+        def check():
+            if self.is_flushed(target):
+                callback()
+            else:
+                widget.after(poll_ms, check)
+
+        check()
+
+    # ------------------------------------------------------------------
+    # Flushing
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written."""
+        with self._cond:
+            target = self._requested
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._completed >= target, timeout)
+
+    def close(self, timeout=None):
+        """Flush outstanding writes and stop the writer thread.  Idempotent."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _pending(self):
+        return bool(self._dirty or self._appends or self._jobs)
+
+    def _run(self):
+        backoff = self.delay
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending() or self._closed)
+                if not self._pending():
+                    return
+                # Let a burst of changes settle before writing.
+                if not (self._closed or self._urgent):
+                    self._cond.wait_for(lambda: self._closed or self._urgent, backoff)
+                self._urgent = False
+                dirty, self._dirty = self._dirty, set()
+                appends, self._appends = self._appends, []
+                jobs, self._jobs = self._jobs, []
+                target = self._requested
+
+            began = time.perf_counter()
+            failed = self._write(dirty, appends, jobs)
+            with self._cond:
+                if failed:
+                    # Put the failed work back in front of anything newer and
+                    # retry with a growing delay.
+                    f_dirty, f_appends, f_jobs = failed
+                    self._dirty |= f_dirty
+                    self._appends[:0] = f_appends
+                    self._jobs[:0] = f_jobs
+                    backoff = min(backoff * 2, self.MAX_BACKOFF)
+                    if self._closed:
+                        # Don't spin forever on shutdown.
+                        return
+                else:
+                    backoff = self.delay
+                    self._completed = target
+                    self.flushes += 1
+                    self.last_flush_ms = (time.perf_counter() - began) * 1000
+                self._cond.notify_all()
+
+    def _write(self, dirty, appends, jobs):
+        """Write one batch; return the parts that failed, or None."""
+        # Journal records first: the documents written below may describe
+        # the matches they contain.
+        by_journal = {}
+        for name, record in appends:
+            by_journal.setdefault(name, []).append(record)
+        for name, records in list(by_journal.items()):
+            try:
+                self._journals[name].append_many(records)
+                del by_journal[name]
+            except RETRIED_ERRORS as e:
+                print(f"⚠️ Failed to save {name}: {e}")
+            except Exception:
+                _report_dropped(f"Saving {len(records)} records to {name}")
+                del by_journal[name]
+        failed_appends = [(n, r) for n, records in by_journal.items() for r in records]
+
+        failed_jobs = []
+        rewritten = set()
+        for i, job in enumerate(jobs):
+            try:
+                job()
+            except RETRIED_ERRORS as e:
+                print(f"⚠️ Background write failed: {e}")
+                failed_jobs = jobs[i:]
+                break
+            except Exception:
+                _report_dropped("Background write")
+            else:
+                if getattr(job, "rewrites", None):
+                    rewritten.add(job.rewrites)
+        failed_appends = [(n, r) for n, r in failed_appends if n not in rewritten]
+
+        payloads = {}
+        with self.lock:
+            for name in dirty:
+                path, snapshot = self._documents[name]
+                try:
+                    payloads[name] = (path, json.dumps(snapshot()))
+                except Exception:
+                    _report_dropped(f"Serializing {name}")
+        failed_dirty = set()
+        for name, (path, text) in payloads.items():
+            try:
+                write_text_atomic(path, text)
+            except RETRIED_ERRORS as e:
+                print(f"⚠️ Failed to save {name}: {e}")
+                failed_dirty.add(name)
+
+        if failed_dirty or failed_appends or failed_jobs:
+            return failed_dirty, failed_appends, failed_jobs
+        return None
@@ -0,0 +1,216 @@
+"""Static HTML/PNG report of every hero trend and map pick table.
+
+``generate_report`` writes ``index.html`` into the report directory with a
+pick-trend chart per hero (``heroes/<hero>.png``) and a pick table per map.
+The charts are drawn with matplotlib's Agg backend in a process pool; each
+worker only receives the downsampled series of the chart it draws.  The
+inputs of every chart are hashed into ``manifest.json``, so regenerating the
+report after new matches only redraws the heroes whose series changed.
+The tables are plain HTML and are rewritten every time.
+
+From the command line::
+
+    python tracker_cli.py report --out ow2_report
+"""
+import hashlib
+import html
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from persistence import write_text_atomic
+from trends import as_datetimes, downsample
+
+REPORT_DIR = os.environ.get("OW2_REPORT_DIR", "ow2_report")
+REPORT_PROCESSES = int(os.environ.get("OW2_REPORT_PROCESSES", "0")) or os.cpu_count() or 1
+MANIFEST_FILE = "manifest.json"
+CHART_DIR = "heroes"
+MAP_TABLE_ROWS = 10
+
+CHART_BG = "#06141B"
+AXES_BG = "#253745"
+LINE_COLOR = "skyblue"
+
+
+def chart_name(hero):
+    return f"{CHART_DIR}/{re.sub(r'[^a-z0-9]+', '-', hero.lower()).strip('-') or 'hero'}.png"
+
+
+def chart_jobs(engine):
+    """``[(file name, title, times, counts), ...]`` for every hero that has played.
+
+    Reads the engine; hold the persistence lock while calling it from the UI.
+    """
+    jobs = []
+    for hero in engine.hero_names():
+        times, counts = engine.trends.series(hero)
+        if times:
+            times, counts = downsample(times, counts)
+            jobs.append((chart_name(hero), f"Trend of {hero} Picks Over Time", times, counts))
+    return jobs
+
+
+def job_digest(job):
+    return hashlib.sha1(repr(job).encode("utf-8")).hexdigest()
+
+
+def render_chart(out_dir, job):
+    """Draw one trend chart to ``out_dir``; runs in a worker process."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    from matplotlib.figure import Figure
+
+    name, title, times, counts = job
+    fig = Figure(figsize=(6, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(CHART_BG)
+    ax = fig.add_subplot()
+    ax.set_facecolor(AXES_BG)
+    ax.xaxis_date()
+    locator = AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    ax.tick_params(colors="white")
+    ax.set_xlabel("Timestamp", color="white")
+    ax.set_ylabel("Cumulative Picks", color="white")
+    ax.set_title(title, color="white")
+    ax.plot(as_datetimes(times), counts, marker="o", markersize=3, color=LINE_COLOR)
+    fig.tight_layout()
+    path = os.path.join(out_dir, name)
+    tmp = f"{path}.tmp.png"
+    fig.savefig(tmp, facecolor=fig.get_facecolor())
+    os.replace(tmp, path)
+    return name
+
+
+def map_tables(engine):
+    """``[(map, record, {side: rows}), ...]`` for every map with matches."""
+    win_stats = engine.win_stats
+    tables = []
+    for map_name in sorted(engine.maps):
+        record = engine.map_record(map_name)
+        if record is None:
+            continue
+        tables.append((map_name, record, {
+            side: [
+                (h.title(), c, str(win_stats.hero_on_map(h, map_name, side)))
+                for h, c in engine.map_pick_counts(map_name, side)[:MAP_TABLE_ROWS]
+            ]
+            for side in ("teammates", "enemies")
+        }))
+    return tables
+
+
+def hero_rows(engine):
+    """``[(hero, teammate games, enemy games, win rate), ...]`` for the index."""
+    teammates, enemies = engine.teammate_matches, engine.enemy_matches
+    return [
+        (hero, teammates.get(hero.lower(), 0), enemies.get(hero.lower(), 0),
+         str(engine.win_stats.hero(hero, "teammates")))
+        for hero in engine.hero_names()
+    ]
+
+
+def collect(engine):
+    """Everything the report needs from ``engine``, as plain data."""
+    return {
+        "matches": engine.match_count(),
+        "charts": chart_jobs(engine),
+        "heroes": hero_rows(engine),
+        "maps": map_tables(engine),
+    }
+
+
+def _table(headers, rows):
+    head = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in row) + "</tr>" for row in rows
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def render_html(data, charts):
+    """The report page; ``charts`` maps hero -> chart file name."""
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>OW2 Tracker Report</title>",
+        "<style>body{background:#06141B;color:#fff;font-family:sans-serif}"
+        "table{border-collapse:collapse;margin:4px 0}td,th{border:1px solid #253745;padding:2px 8px}"
+        ".maps{display:flex;gap:16px}</style></head><body>",
+        f"<h1>OW2 Tracker Report</h1><p>{data['matches']} matches; generated "
+        f"{datetime.now().isoformat(timespec='seconds')}</p>",
+        "<h2>Heroes</h2>",
+        _table(("Hero", "As Teammate", "As Enemy", "Win Rate With"), data["heroes"]),
+    ]
+    for hero, *_ in data["heroes"]:
+        name = charts.get(hero)
+        if name:
+            parts.append(f"<img src='{html.escape(name)}' alt='{html.escape(hero)}'>")
+    parts.append("<h2>Maps</h2>")
+    for map_name, (wins, total), sides in data["maps"]:
+        rate = (wins / total * 100) if total > 0 else 0
+        parts.append(f"<h3>{html.escape(map_name)}</h3><p>Win Rate: {rate:.2f}% ({wins}/{total})</p>")
+        parts.append("<div class='maps'>")
+        for side, rows in sides.items():
+            parts.append(f"<div><h4>{side.title()}</h4>"
+                         + _table(("Hero", "Pick Count", "Win Rate"), rows) + "</div>")
+        parts.append("</div>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("charts", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def write_report(data, out_dir=REPORT_DIR, processes=REPORT_PROCESSES, force=False):
+    """Write the report for ``collect()``-ed ``data``; returns ``(drawn, kept)``.
+
+    Charts whose inputs match the manifest and whose file still exists are
+    kept as they are.
+    """
+    os.makedirs(os.path.join(out_dir, CHART_DIR), exist_ok=True)
+    manifest = {} if force else load_manifest(out_dir)
+    digests = {job[0]: job_digest(job) for job in data["charts"]}
+    stale = [
+        job for job in data["charts"]
+        if manifest.get(job[0]) != digests[job[0]] or not os.path.exists(os.path.join(out_dir, job[0]))
+    ]
+    drawn = []
+    if stale and importlib.util.find_spec("matplotlib") is None:
+        print("⚠️ matplotlib is not installed; outdated charts are left out of the report.")
+        for job in stale:
+            del digests[job[0]]
+        stale = []
+    elif stale:
+        workers = max(1, min(processes, len(stale)))
+        if workers == 1:
+            drawn = [render_chart(out_dir, job) for job in stale]
+        else:
+            # "spawn" keeps the caller's threads (and Tk) out of the workers.
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                chunk = max(1, len(stale) // (workers * 4))
+                drawn = list(pool.map(render_chart, [out_dir] * len(stale), stale, chunksize=chunk))
+
+    # Heroes without matches any more, or outdated charts that were not redrawn.
+    for name in set(manifest) - set(digests):
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except OSError:
+            pass
+    write_text_atomic(os.path.join(out_dir, MANIFEST_FILE), json.dumps({"charts": digests}, indent=1))
+    charts = {hero: chart_name(hero) for hero, *_ in data["heroes"] if chart_name(hero) in digests}
+    write_text_atomic(os.path.join(out_dir, "index.html"), render_html(data, charts))
+    return len(drawn), len(digests) - len(drawn)
+
+
+def generate_report(engine, out_dir=REPORT_DIR, processes=REPORT_PROCESSES, force=False):
+    """``collect`` and ``write_report`` in one go."""
+    return write_report(collect(engine), out_dir, processes, force)
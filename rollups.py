@@ -0,0 +1,298 @@
+"""Daily and weekly rollups of pick and result counts.
+
+Every match is added to the bucket for its day and for its ISO week (keyed
+by the Monday).  A date-range query merges whole weeks where the range
+covers them and single days at the edges, so "last 30 days" costs a handful
+of bucket merges instead of a scan over the match log.
+
+A ``Rollup`` answers the same queries as ``TrackerEngine`` and
+``SqliteStatsStore`` (``match_count``, ``pick_counts``, ``map_record``,
+``map_pick_counts``), plus per-hero win records like ``WinRateStats``, so
+the stats tables can show a date range without special cases.  Like
+``WinRateStats`` the buckets are keyed by the ``MatchStore``'s hero and map
+ids, read straight from its columns; names only appear in query results.
+They count the same matches as the engine's counters: none logged before
+the last reset.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+from trends import parse_timestamp
+from winrates import OUTCOMES, Record
+
+SIDES = ("teammates", "enemies")
+
+# Date-range selector presets: label -> days back from today (None = all).
+RANGE_PRESETS = {
+    "All Time": None,
+    "Today": 1,
+    "Last 7 Days": 7,
+    "Last 30 Days": 30,
+    "Last 90 Days": 90,
+    "Last 365 Days": 365,
+}
+
+
+def preset_range(label, today=None):
+    """``(start, end)`` dates for a RANGE_PRESETS label, or None for all time."""
+    days = RANGE_PRESETS[label]
+    if days is None:
+        return None
+    today = today or date.today()
+    return today - timedelta(days=days - 1), today
+
+
+class Rollup:
+    """Additive pick and result counts for a set of matches."""
+
+    def __init__(self, hero_ids, map_ids):
+        # The store's interners; only used to translate names.
+        self.hero_ids, self.map_ids = hero_ids, map_ids
+        self.matches = 0
+        self.picks = {side: {} for side in SIDES}          # side -> hero id -> games
+        self.map_matches = {}                              # map id -> games
+        self.map_picks = {}                                # map id -> side -> hero id -> games
+        self.map_results = {}                              # map id -> Record
+        self.hero_results = {side: {} for side in SIDES}   # side -> hero id -> Record
+        self.hero_map_results = {side: {} for side in SIDES}   # side -> (hero id, map id) -> Record
+
+    def add(self, store, position, delta=1):
+        """Count match ``position`` of ``store``; ``delta=-1`` takes it back out."""
+        m = store.map_ids[position]
+        code = store.outcomes[position]
+        outcome = OUTCOMES[code] if code >= 0 else None
+        self.matches += delta
+        _count(self.map_matches, m, delta)
+        map_picks = self.map_picks.setdefault(m, {side: {} for side in SIDES})
+        if outcome:
+            _count_record(self.map_results, m, outcome, delta)
+        for side in SIDES:
+            picks, on_map = self.picks[side], map_picks[side]
+            for h in store.team_ids(position, side):
+                _count(picks, h, delta)
+                _count(on_map, h, delta)
+                if outcome:
+                    _count_record(self.hero_results[side], h, outcome, delta)
+                    _count_record(self.hero_map_results[side], (h, m), outcome, delta)
+
+    def merge(self, other):
+        """Add ``other``'s counts to this rollup."""
+        self.matches += other.matches
+        for m, games in other.map_matches.items():
+            self.map_matches[m] = self.map_matches.get(m, 0) + games
+        for m, sides in other.map_picks.items():
+            mine = self.map_picks.setdefault(m, {side: {} for side in SIDES})
+            for side in SIDES:
+                _merge_counts(mine[side], sides[side])
+        _merge_records(self.map_results, other.map_results)
+        for side in SIDES:
+            _merge_counts(self.picks[side], other.picks[side])
+            _merge_records(self.hero_results[side], other.hero_results[side])
+            _merge_records(self.hero_map_results[side], other.hero_map_results[side])
+        return self
+
+    def to_dict(self):
+        heroes, maps = self.hero_ids.keys, self.map_ids.names
+        return {
+            "matches": self.matches,
+            "picks": {side: {heroes[h]: n for h, n in picks.items()} for side, picks in self.picks.items()},
+            "map_matches": {maps[m]: n for m, n in self.map_matches.items()},
+            "map_picks": {maps[m]: {side: {heroes[h]: n for h, n in picks.items()} for side, picks in sides.items()}
+                          for m, sides in self.map_picks.items()},
+            "map_results": {maps[m]: r.to_list() for m, r in self.map_results.items()},
+            "hero_results": {side: {heroes[h]: r.to_list() for h, r in records.items()}
+                             for side, records in self.hero_results.items()},
+            "hero_map_results": {side: [[heroes[h], maps[m], *r.to_list()] for (h, m), r in records.items()]
+                                 for side, records in self.hero_map_results.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, hero_ids, map_ids):
+        """Read ``to_dict`` output, interning its names into ``hero_ids``/``map_ids``."""
+        rollup = cls(hero_ids, map_ids)
+        hero, map_id = hero_ids.intern, map_ids.intern
+        rollup.matches = data["matches"]
+        for m, games in data["map_matches"].items():
+            _count(rollup.map_matches, map_id(m), games)
+        for m, sides in data["map_picks"].items():
+            on_map = rollup.map_picks.setdefault(map_id(m), {side: {} for side in SIDES})
+            for side in SIDES:
+                for h, games in sides.get(side, {}).items():
+                    _count(on_map[side], hero(h), games)
+        rollup.map_results = {map_id(m): Record(*counts) for m, counts in data["map_results"].items()}
+        for side in SIDES:
+            for h, games in data["picks"].get(side, {}).items():
+                _count(rollup.picks[side], hero(h), games)
+            rollup.hero_results[side] = {
+                hero(h): Record(*counts) for h, counts in data["hero_results"].get(side, {}).items()}
+            rollup.hero_map_results[side] = {
+                (hero(h), map_id(m)): Record(*counts) for h, m, *counts in data["hero_map_results"].get(side, [])}
+        return rollup
+
+    # ------------------------------------------------------------------
+    # Queries, as on TrackerEngine
+
+    def match_count(self):
+        return self.matches
+
+    def _named(self, picks):
+        keys = self.hero_ids.keys
+        return sorted(((keys[h], games) for h, games in picks.items()), key=lambda x: -x[1])
+
+    def pick_counts(self, side):
+        return self._named(self.picks[side])
+
+    def map_record(self, map_name):
+        """``(wins, total)`` for a map, or None if it has no matches."""
+        map_id = self.map_ids.get(map_name)
+        if not self.map_matches.get(map_id):
+            return None
+        record = self.map_results.get(map_id) or Record()
+        return record.wins, record.total
+
+    def map_pick_counts(self, map_name, side):
+        return self._named(self.map_picks.get(self.map_ids.get(map_name), {}).get(side, {}))
+
+    # Win records, as on WinRateStats
+
+    def hero(self, hero, side="teammates"):
+        return self.hero_results[side].get(self.hero_ids.get(hero)) or Record()
+
+    def hero_on_map(self, hero, map_name, side="teammates"):
+        key = (self.hero_ids.get(hero), self.map_ids.get(map_name))
+        return self.hero_map_results[side].get(key) or Record()
+
+
+def _count(counts, key, delta):
+    count = counts.get(key, 0) + delta
+    if count > 0:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+
+
+def _count_record(records, key, outcome, delta):
+    record = records.get(key)
+    if record is None:
+        record = records[key] = Record()
+    record.add(outcome, delta)
+    if record.total <= 0:
+        del records[key]
+
+
+def _merge_counts(into, counts):
+    for key, count in counts.items():
+        into[key] = into.get(key, 0) + count
+
+
+def _merge_records(into, records):
+    for key, record in records.items():
+        mine = into.get(key)
+        if mine is None:
+            mine = into[key] = Record()
+        mine.merge(record)
+
+
+class TimeRollups:
+    """Day and week buckets over the matches of a ``MatchStore``.
+
+    Matches with an id up to ``counted_after`` (the engine's reset point)
+    are left out, as the engine's counters leave them out.
+    """
+
+    def __init__(self, store, counted_after=0, days=None):
+        self.store = store
+        self.counted_after = counted_after
+        self.days = {}       # date -> Rollup
+        self.weeks = {}      # Monday -> Rollup
+        self.day_keys = []   # sorted dates with matches
+        if days is None:
+            for position in store.live_positions():
+                self.add(position)
+            return
+        # Day buckets saved by ``to_dict``; the weeks are merged from them.
+        for day, bucket in days.items():
+            self.days[day] = bucket
+            monday = day - timedelta(days=day.weekday())
+            week = self.weeks.get(monday)
+            if week is None:
+                week = self.weeks[monday] = self._rollup()
+            week.merge(bucket)
+        self.day_keys = sorted(self.days)
+
+    @classmethod
+    def from_dict(cls, store, data, counted_after=0):
+        """Read ``to_dict`` output instead of counting ``store``."""
+        days = {date.fromisoformat(day): Rollup.from_dict(bucket, store.heroes, store.maps)
+                for day, bucket in data["days"].items()}
+        return cls(store, counted_after, days)
+
+    def to_dict(self):
+        return {"days": {day.isoformat(): bucket.to_dict() for day, bucket in self.days.items()}}
+
+    def reset(self, counted_after):
+        """Drop every bucket; matches with ids up to ``counted_after`` are not counted again."""
+        self.counted_after = counted_after
+        self.days, self.weeks, self.day_keys = {}, {}, []
+
+    def attach(self, store):
+        """Follow ``store`` (and its interners) from now on; it must hold the rows counted so far."""
+        self.store = store
+        for bucket in (*self.days.values(), *self.weeks.values()):
+            bucket.hero_ids, bucket.map_ids = store.heroes, store.maps
+
+    def _rollup(self):
+        return Rollup(self.store.heroes, self.store.maps)
+
+    def _day(self, position):
+        # The date as recorded: a timestamp with a UTC offset counts on its
+        # own calendar day, not the UTC one the column holds.
+        raw = self.store.raw_times.get(position)
+        when = parse_timestamp(raw) if raw is not None else self.store.time(position)
+        return None if when is None else when.date()
+
+    def add(self, position, delta=1):
+        """Count match ``position``; matches without a usable timestamp are skipped.
+
+        ``delta=-1`` removes a match counted earlier.
+        """
+        if self.store.ids[position] <= self.counted_after:
+            return
+        day = self._day(position)
+        if day is None:
+            return
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = self._rollup()
+            # Matches arrive in time order, so this is almost always an append.
+            if not self.day_keys or day > self.day_keys[-1]:
+                self.day_keys.append(day)
+            else:
+                insort(self.day_keys, day)
+        bucket.add(self.store, position, delta)
+        monday = day - timedelta(days=day.weekday())
+        week = self.weeks.get(monday)
+        if week is None:
+            week = self.weeks[monday] = self._rollup()
+        week.add(self.store, position, delta)
+
+    def query(self, start, end):
+        """A Rollup of every match from ``start`` to ``end`` (dates, inclusive)."""
+        result = self._rollup()
+        merged_weeks = set()
+        lo = bisect_left(self.day_keys, start)
+        hi = bisect_right(self.day_keys, end)
+        for day in self.day_keys[lo:hi]:
+            monday = day - timedelta(days=day.weekday())
+            if monday >= start and monday + timedelta(days=6) <= end:
+                if monday not in merged_weeks:
+                    merged_weeks.add(monday)
+                    result.merge(self.weeks[monday])
+            else:
+                result.merge(self.days[day])
+        return result
+
+    def preset(self, label, today=None):
+        """``query`` for a RANGE_PRESETS label; None means all time."""
+        bounds = preset_range(label, today)
+        return None if bounds is None else self.query(*bounds)
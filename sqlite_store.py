@@ -0,0 +1,322 @@
+"""Optional SQLite storage backend for the OW2 tracker.
+
+Instead of keeping every counter in nested dicts and re-serializing them to
+``ow2_stats.json`` after each match, the matches themselves are stored in
+normalized tables and the pick counts the UI shows are computed with indexed
+aggregate queries.  Enable it with ``OW2_STORAGE=sqlite``; the first start
+imports the existing JSON history automatically, or run::
+
+    python sqlite_store.py import
+
+to do the one-shot import by hand.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+DB_FILE = "ow2_stats.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS heroes (
+    id   INTEGER PRIMARY KEY,
+    key  TEXT NOT NULL UNIQUE,   -- lowercased name, as used by the JSON stats
+    name TEXT NOT NULL,
+    role TEXT
+);
+CREATE TABLE IF NOT EXISTS maps (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS matches (
+    id        INTEGER PRIMARY KEY,
+    map_id    INTEGER NOT NULL REFERENCES maps(id),
+    timestamp TEXT,   -- NULL for hand-edited entries without one
+    outcome   TEXT CHECK (outcome IN ('win', 'loss', 'draw'))
+);
+CREATE TABLE IF NOT EXISTS picks (
+    match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+    hero_id  INTEGER NOT NULL REFERENCES heroes(id),
+    side     TEXT NOT NULL CHECK (side IN ('teammates', 'enemies'))
+);
+CREATE INDEX IF NOT EXISTS picks_hero ON picks(hero_id, side);
+CREATE INDEX IF NOT EXISTS picks_match ON picks(match_id);
+CREATE INDEX IF NOT EXISTS matches_map ON matches(map_id);
+CREATE INDEX IF NOT EXISTS matches_timestamp ON matches(timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+# Matches up to the last reset stay in the tables but out of the counts.
+COUNTED = "m.id > COALESCE((SELECT value FROM meta WHERE key = 'counted_after'), 0)"
+
+SIDES = ("teammates", "enemies")
+
+
+class SqliteStatsStore:
+    """Match history and pick aggregates backed by a SQLite database."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL is still crash safe; it only skips the fsync on
+        # every commit.
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1]: row for row in self.conn.execute("PRAGMA table_info(matches)")}
+        if "outcome" not in columns:
+            # Databases created before outcomes were recorded.
+            self.conn.execute(
+                "ALTER TABLE matches ADD COLUMN outcome TEXT "
+                "CHECK (outcome IN ('win', 'loss', 'draw'))"
+            )
+        if columns["timestamp"][3]:
+            self._allow_null_timestamps()
+        self._hero_ids = {}
+        self._map_ids = {}
+
+    def _allow_null_timestamps(self):
+        """Drop the NOT NULL of ``matches.timestamp`` in databases created with it.
+
+        SQLite can't alter a column, so the rows are copied into a new table
+        that takes the old one's name; ``picks`` refers to it by that name.
+        """
+        self.conn.execute("PRAGMA foreign_keys=OFF")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE matches_new (id INTEGER PRIMARY KEY, "
+                "map_id INTEGER NOT NULL REFERENCES maps(id), timestamp TEXT, "
+                "outcome TEXT CHECK (outcome IN ('win', 'loss', 'draw')))"
+            )
+            self.conn.execute(
+                "INSERT INTO matches_new (id, map_id, timestamp, outcome) "
+                "SELECT id, map_id, timestamp, outcome FROM matches"
+            )
+            self.conn.execute("DROP TABLE matches")
+            self.conn.execute("ALTER TABLE matches_new RENAME TO matches")
+            self.conn.execute("CREATE INDEX matches_map ON matches(map_id)")
+            self.conn.execute("CREATE INDEX matches_timestamp ON matches(timestamp)")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM matches)").fetchone()[0] == 1
+
+    # ------------------------------------------------------------------
+    # Writing
+
+    def _hero_id(self, name, role=None):
+        key = name.lower()
+        hero_id = self._hero_ids.get(key)
+        if hero_id is None:
+            self.conn.execute(
+                "INSERT INTO heroes (key, name, role) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET role = COALESCE(excluded.role, heroes.role)",
+                (key, name, role),
+            )
+            hero_id = self.conn.execute("SELECT id FROM heroes WHERE key = ?", (key,)).fetchone()[0]
+            self._hero_ids[key] = hero_id
+        return hero_id
+
+    def _map_id(self, name):
+        map_id = self._map_ids.get(name)
+        if map_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO maps (name) VALUES (?)", (name,))
+            map_id = self.conn.execute("SELECT id FROM maps WHERE name = ?", (name,)).fetchone()[0]
+            self._map_ids[name] = map_id
+        return map_id
+
+    def _insert_match(self, entry):
+        # The journal's match id is kept when there is one, so edits and
+        # deletes can find the row again.  Hand-edited entries may lack a
+        # map or timestamp, like they may in the journal.
+        match_id = entry.get("id")
+        if match_id is not None and self.conn.execute(
+                "SELECT 1 FROM matches WHERE id = ?", (match_id,)).fetchone():
+            # Taken by a row numbered before ids were kept.
+            match_id = None
+        cur = self.conn.execute(
+            "INSERT INTO matches (id, map_id, timestamp, outcome) VALUES (?, ?, ?, ?)",
+            (match_id, self._map_id(entry.get("map") or ""), entry.get("timestamp"), entry.get("outcome")),
+        )
+        match_id = cur.lastrowid
+        self.conn.executemany(
+            "INSERT INTO picks (match_id, hero_id, side) VALUES (?, ?, ?)",
+            [(match_id, self._hero_id(h), side) for side in SIDES for h in entry.get(side, [])],
+        )
+        return match_id
+
+    def add_match(self, entry):
+        """Record one match log entry."""
+        with self.conn:
+            return self._insert_match(entry)
+
+    def _delete_match(self, entry):
+        # Rows imported before ids were kept may be numbered differently;
+        # the timestamp guards against deleting the wrong match.
+        deleted = self.conn.execute(
+            "DELETE FROM matches WHERE id = ? AND timestamp IS ?", (entry.get("id"), entry.get("timestamp"))
+        ).rowcount
+        if not deleted:
+            print(f"⚠️ Match {entry.get('id')} not found in {self.path}")
+        return deleted
+
+    def delete_match(self, entry):
+        """Remove the match ``entry`` (a log entry with its ``id``)."""
+        with self.conn:
+            return self._delete_match(entry)
+
+    def update_match(self, old, new):
+        """Replace match ``old`` with ``new`` (same id)."""
+        with self.conn:
+            if self._delete_match(old):
+                self._insert_match(new)
+
+    def add_heroes(self, heroes_by_role):
+        with self.conn:
+            for role, heroes in heroes_by_role.items():
+                for hero in heroes:
+                    self._hero_id(hero, role)
+
+    def _set_counted_after(self, counted_after):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) "
+            "VALUES ('counted_after', COALESCE(?, (SELECT MAX(id) FROM matches), 0))",
+            (counted_after,),
+        )
+
+    def reset(self, counted_after=None):
+        """Stop counting the matches recorded so far; they stay in the tables.
+
+        ``counted_after`` is the engine's reset point (the highest match id
+        it no longer counts); by default the highest id in the database.
+        """
+        with self.conn:
+            self._set_counted_after(counted_after)
+
+    def _import(self, match_log, heroes_by_role):
+        if heroes_by_role:
+            for role, heroes in heroes_by_role.items():
+                for hero in heroes:
+                    self._hero_id(hero, role)
+        for entry in match_log:
+            self._insert_match(entry)
+
+    def import_json(self, match_log, heroes_by_role=None):
+        """Bulk-load a list of match log entries in a single transaction."""
+        with self.conn:
+            self._import(match_log, heroes_by_role)
+        return len(match_log)
+
+    def rebuild(self, match_log, heroes_by_role=None, counted_after=0):
+        """Replace every match with the entries of ``match_log``.
+
+        For when the database no longer matches the journal; the reset point
+        is set to ``counted_after``, the engine's.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM picks")
+            self.conn.execute("DELETE FROM matches")
+            self._import(match_log, heroes_by_role)
+            self._set_counted_after(counted_after)
+        return len(match_log)
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def match_count(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM matches m WHERE {COUNTED}").fetchone()[0]
+
+    def pick_counts(self, side):
+        """``[(hero_key, games), ...]`` for one side, most picked first."""
+        return self.conn.execute(
+            "SELECT h.key, COUNT(*) AS games FROM picks p "
+            "JOIN matches m ON m.id = p.match_id JOIN heroes h ON h.id = p.hero_id "
+            f"WHERE p.side = ? AND {COUNTED} GROUP BY p.hero_id ORDER BY games DESC, h.key",
+            (side,),
+        ).fetchall()
+
+    def map_record(self, map_name):
+        """``(wins, total)`` for a map, or None if it has no matches.
+
+        ``total`` only counts matches with a recorded outcome.
+        """
+        matches, wins, decided = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(m.outcome = 'win'), 0), COUNT(m.outcome) "
+            f"FROM matches m JOIN maps ON maps.id = m.map_id WHERE maps.name = ? AND {COUNTED}",
+            (map_name,),
+        ).fetchone()
+        return (wins, decided) if matches else None
+
+    def map_pick_counts(self, map_name, side):
+        """Like ``pick_counts`` but restricted to matches on ``map_name``."""
+        return self.conn.execute(
+            "SELECT h.key, COUNT(*) AS games FROM maps "
+            "JOIN matches m ON m.map_id = maps.id "
+            "JOIN picks p ON p.match_id = m.id "
+            "JOIN heroes h ON h.id = p.hero_id "
+            f"WHERE maps.name = ? AND p.side = ? AND {COUNTED} GROUP BY p.hero_id ORDER BY games DESC, h.key",
+            (map_name, side),
+        ).fetchall()
+
+    def hero_timestamps(self, hero, start=0):
+        """Timestamps of the matches ``hero`` appeared in (either side), in order.
+
+        ``start`` skips the first appearances, like ``TrendIndex.series``.
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT m.id, m.timestamp FROM heroes h "
+            "JOIN picks p ON p.hero_id = h.id "
+            "JOIN matches m ON m.id = p.match_id "
+            "WHERE h.key = ? ORDER BY m.id LIMIT -1 OFFSET ?",
+            (hero.lower(), start),
+        ).fetchall()
+        return [ts for _, ts in rows]
+
+    def hero_match_count(self, hero):
+        """Number of matches ``hero`` appeared in, like ``TrendIndex.count``."""
+        return self.conn.execute(
+            "SELECT COUNT(DISTINCT p.match_id) FROM heroes h "
+            "JOIN picks p ON p.hero_id = h.id WHERE h.key = ?",
+            (hero.lower(),),
+        ).fetchone()[0]
+
+def import_from_json(store, journal, heroes_file=None):
+    """Fill ``store`` from the JSON match history (migrating it if needed)."""
+    heroes_by_role = None
+    if heroes_file and os.path.exists(heroes_file):
+        with open(heroes_file, "r") as f:
+            heroes_by_role = json.load(f)
+    return store.import_json(journal.load(), heroes_by_role)
+
+
+def main(argv=None):
+    from match_journal import JOURNAL_FILE, LEGACY_FILE, MatchJournal
+
+    parser = argparse.ArgumentParser(description="Import the OW2 tracker JSON history into SQLite.")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--legacy", default=LEGACY_FILE)
+    parser.add_argument("--heroes", default="heroes.json")
+    args = parser.parse_args(argv)
+
+    store = SqliteStatsStore(args.db)
+    if not store.is_empty():
+        print(f"{args.db} already contains matches; refusing to import twice.")
+        return 1
+    count = import_from_json(store, MatchJournal(args.journal, args.legacy), args.heroes)
+    store.close()
+    print(f"Imported {count} matches into {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""Read-only HTTP API with the tracker's stats, for stream overlays.
+
+``StatsApi`` runs an asyncio server on its own thread, bound to localhost.
+Endpoints (all GET, JSON)::
+
+    /picks?side=teammates     pick rates and win rates (the Match Entry tables)
+    /maps                     per-map picks and records (``map_stats``)
+    /trend?hero=Ana           a hero's cumulative pick series, downsampled
+    /version                  the current data version
+    /events                   server-sent events: one "update" per change
+
+Every change the UI saves calls ``notify()``, which bumps the data version.
+Responses are built once per version (reading the engine under the
+persistence lock on a worker thread), serialized, and served from the cache
+to every other client; the version is the ETag, so a client that already
+has it gets a 304.  The Tk thread never waits on the server: ``notify`` only
+schedules the bump on the server's loop.
+
+Enable it in the app with ``--api`` or ``OW2_API=1``; the port comes from
+``OW2_API_PORT`` (default 8765).  ``python stats_api.py`` serves the saved
+files without the window (the version then never changes).
+
+Browsers only let pages read the responses if their origin is listed in
+``OW2_API_ORIGINS`` (comma-separated, e.g. ``http://localhost:3000``); by
+default no CORS header is sent, so other websites can't read the stats.
+Requests whose Host is not this machine are refused, which keeps a
+DNS-rebinding page out as well.  OBS browser sources and other local
+clients work without either.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import parse_qs, urlsplit
+
+from tracker_core import SIDES, pick_rate_table
+from trends import as_datetimes, downsample
+
+API_ENABLED = os.environ.get("OW2_API", "") == "1"
+API_HOST = "127.0.0.1"
+API_PORT = int(os.environ.get("OW2_API_PORT", "8765"))
+# Web origins allowed to read the API from a browser (overlay pages).
+API_ORIGINS = tuple(o.strip() for o in os.environ.get("OW2_API_ORIGINS", "").split(",") if o.strip())
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+HEARTBEAT_SECONDS = 15
+MAX_REQUEST_BYTES = 8192
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ----------------------------------------------------------------------
+# Payloads; called with the persistence lock held.
+
+def picks_payload(engine, query):
+    side = query.get("side", "teammates")
+    if side not in SIDES:
+        raise ApiError(400, f"side must be one of {', '.join(SIDES)}")
+    win_stats = engine.win_stats
+    return {
+        "side": side,
+        "matches": engine.match_count(),
+        "heroes": [
+            {"hero": name, "rate": rate, "games": games, "win_rate": str(win_stats.hero(key, side))}
+            for key, (name, rate, games) in pick_rate_table(engine, side).items()
+        ],
+    }
+
+
+def maps_payload(engine, query):
+    return {"maps": engine.map_stats}
+
+
+def trend_payload(engine, query):
+    hero = engine.canonical_hero(query.get("hero", ""))
+    if hero is None:
+        raise ApiError(404, f"unknown hero {query.get('hero')!r}")
+    times, picks = downsample(*engine.trends.series(hero))
+    return {
+        "hero": hero,
+        "times": [t.isoformat() if t else None for t in as_datetimes(times)],
+        "picks": picks,
+    }
+
+
+ROUTES = {
+    "/picks": picks_payload,
+    "/maps": maps_payload,
+    "/trend": trend_payload,
+}
+# Engine indexes a route reads; built before the lock is taken.
+ROUTE_INDEXES = {
+    "/trend": ("trends",),
+}
+
+
+class StatsApi:
+    """The HTTP server and its per-version response cache."""
+
+    def __init__(self, engine, lock=None, host=API_HOST, port=API_PORT, origins=API_ORIGINS):
+        self.engine = engine
+        self.lock = lock if lock is not None else nullcontext()
+        self.host, self.port = host, port
+        self.origins = frozenset(origins)
+        # Part of every ETag, so a restart never matches a client's old copy.
+        self.boot = f"{int(time.time()):x}"
+        self.version = 1
+        self.requests = self.cache_hits = self.not_modified = 0
+        self._cache = {}       # (path, query) -> (status, body bytes, version)
+        self._building = {}    # (path, query) -> future shared by concurrent requests
+        self._listeners = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.listening = False
+
+    # ------------------------------------------------------------------
+    # Called from the Tk thread
+
+    def start(self):
+        """Start serving on a daemon thread; returns self once listening."""
+        self._thread = threading.Thread(target=self._run, name="ow2-stats-api", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def notify(self):
+        """The stats changed; never blocks."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._bump)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(2)
+
+    # ------------------------------------------------------------------
+    # Server thread
+
+    def _run(self):
+        self._loop = loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            print(f"⚠️ Stats API could not listen on {self.host}:{self.port}: {e}")
+            self._loop = None
+            self._ready.set()
+            loop.close()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.listening = True
+        print(f"Stats API on http://{self.host}:{self.port}/")
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+            self.listening = False
+
+    def _bump(self):
+        self.version += 1
+        self._cache.clear()
+        self._building.clear()
+        for queue in self._listeners:
+            queue.put_nowait(self.version)
+
+    def _cors(self, headers):
+        """The CORS header lines for a request, if its origin is allowed."""
+        origin = headers.get("origin")
+        if origin is None or origin not in self.origins:
+            return []
+        return [f"Access-Control-Allow-Origin: {origin}", "Vary: Origin"]
+
+    def _local(self, headers):
+        host = headers.get("host")
+        if not host:
+            # Not a browser; those always send Host.
+            return True
+        name = host if host.endswith("]") else host.rsplit(":", 1)[0]
+        return name in LOCAL_HOSTS
+
+    def _etag(self, version=None):
+        return f'"{self.boot}-{self.version if version is None else version}"'
+
+    async def _payload(self, path, query):
+        """``(status, body, version)`` for the current version, built at most once."""
+        key = (path, tuple(sorted(query.items())))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        future = self._building.get(key)
+        if future is None:
+            version = self.version
+            future = self._building[key] = self._loop.run_in_executor(
+                None, self._build, path, query, version)
+            result = await future
+            if version == self.version:
+                self._cache[key] = result
+                self._building.pop(key, None)
+            return result
+        return await future
+
+    def _build(self, path, query, version):
+        # Runs on the loop's executor; the lock is held only while reading.
+        # The data may already include a change whose bump is still queued,
+        # which only makes the response newer than its version.
+        try:
+            for name in ROUTE_INDEXES.get(path, ()):
+                self.engine.ensure_index(name, self.lock)
+            with self.lock:
+                data = ROUTES[path](self.engine, query)
+            return 200, json.dumps(data).encode("utf-8"), version
+        except ApiError as e:
+            return e.status, json.dumps({"error": str(e)}).encode("utf-8"), version
+        except Exception as e:
+            print(f"⚠️ Stats API failed to build a response: {e!r}")
+            return 500, b'{"error": "internal error"}', version
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                if len(head) > MAX_REQUEST_BYTES:
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, http_version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and http_version == "HTTP/1.1")
+                self.requests += 1
+                url = urlsplit(target)
+                if url.path == "/events" and method == "GET" and self._local(headers):
+                    await self._events(writer, headers)
+                    return
+                await self._respond(writer, method, url, headers, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method, url, headers, keep_alive):
+        etag = self._etag()
+        if not self._local(headers):
+            status, body = 403, b'{"error": "only served to this machine"}'
+        elif method not in ("GET", "HEAD"):
+            status, body = 405, b'{"error": "read-only"}'
+        elif url.path == "/version":
+            status, body = 200, json.dumps({"version": self.version}).encode("utf-8")
+        elif url.path not in ROUTES:
+            status, body = 404, b'{"error": "no such endpoint"}'
+        elif headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            status, body = 304, b""
+        else:
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            status, body, version = await self._payload(url.path, query)
+            etag = self._etag(version)
+        head = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Cache-Control: no-cache",
+            *self._cors(headers),
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status in (200, 304):
+            head.append(f"ETag: {etag}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD" and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def _events(self, writer, headers):
+        queue = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                    *self._cors(headers)]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            writer.write(f"event: update\ndata: {json.dumps({'version': self.version})}\n\n".encode())
+            await writer.drain()
+            while True:
+                try:
+                    version = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                else:
+                    # Several changes in a burst are sent as one update.
+                    while not queue.empty():
+                        version = queue.get_nowait()
+                    writer.write(f"event: update\ndata: {json.dumps({'version': version})}\n\n".encode())
+                await writer.drain()
+        finally:
+            self._listeners.discard(queue)
+
+
+def main(argv=None):
+    from match_binlog import open_match_log
+    from tracker_core import MATCH_JOURNAL_FILE, MATCH_LOG_FILE, SAVE_FILE, TrackerEngine
+
+    parser = argparse.ArgumentParser(description="Serve the saved OW2 tracker stats over HTTP.")
+    parser.add_argument("--journal", default=MATCH_JOURNAL_FILE)
+    parser.add_argument("--legacy", default=MATCH_LOG_FILE)
+    parser.add_argument("--stats", default=SAVE_FILE)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--origin", action="append", default=list(API_ORIGINS),
+                        help="web origin allowed to read the API from a browser (repeatable)")
+    args = parser.parse_args(argv)
+
+    try:
+        engine = TrackerEngine.load(open_match_log(args.journal, args.legacy, create=False), stats_file=args.stats)
+    except FileNotFoundError as e:
+        print(f"{e.filename} does not exist.", file=sys.stderr)
+        return 1
+    api = StatsApi(engine, port=args.port, origins=args.origin).start()
+    if not api.listening:
+        return 1
+    try:
+        while api.listening:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        api.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
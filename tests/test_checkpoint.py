@@ -0,0 +1,97 @@
+"""Startup from a checkpoint: the tail replay and the saved aggregates."""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from rollups import TimeRollups
+from tracker_core import CHECKPOINT_TAIL, TrackerEngine
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+START = datetime(2024, 5, 1, 20, 0)
+
+
+def record(engine, count, first=0):
+    for i in range(first, first + count):
+        engine.record_match(TEAM, ENEMIES, ("Ilios", "Oasis")[i % 2],
+                            (START + timedelta(hours=5 * i)).isoformat(), ("win", "loss")[i % 3 == 0])
+
+
+def saved(document):
+    return json.loads(json.dumps(document))
+
+
+def test_only_matches_after_the_checkpoint_are_replayed():
+    engine = TrackerEngine()
+    record(engine, 100)
+    stats = saved(engine.stats_snapshot())
+    record(engine, 5, first=100)
+
+    reloaded = TrackerEngine(match_log=list(engine.match_log), stats=stats)
+    assert reloaded.replayed == 5
+    assert reloaded.check() == []
+    assert reloaded.pick_counts("teammates") == engine.pick_counts("teammates")
+
+
+def test_a_changed_tail_recounts_everything():
+    engine = TrackerEngine()
+    record(engine, 100)
+    stats = saved(engine.stats_snapshot())
+    log = list(engine.match_log)
+    log[100 - CHECKPOINT_TAIL]["map"] = "Busan"
+
+    reloaded = TrackerEngine(match_log=log, stats=stats)
+    assert reloaded.replayed == 100
+    assert reloaded.map_record("Busan") == (0, 1)
+
+
+def test_rollups_are_restored_and_caught_up():
+    engine = TrackerEngine()
+    record(engine, 40)
+    engine.rollups
+    aggregates = saved(engine.aggregates_snapshot())
+    record(engine, 3, first=40)
+
+    reloaded = TrackerEngine(match_log=list(engine.match_log), stats=saved(engine.stats_snapshot()),
+                             aggregates=aggregates)
+    assert reloaded.index_built("rollups")
+    assert reloaded.aggregated == 40
+    start, end = date(2024, 5, 1), date(2024, 5, 31)
+    restored = reloaded.rollups.query(start, end)
+    counted = TimeRollups(reloaded.match_log).query(start, end)
+    assert restored.match_count() == counted.match_count() == 43
+    assert restored.pick_counts("enemies") == counted.pick_counts("enemies")
+    assert restored.map_record("Oasis") == counted.map_record("Oasis")
+    assert str(restored.hero_on_map("ana", "Ilios")) == str(counted.hero_on_map("ana", "Ilios"))
+
+
+def test_stale_aggregates_are_ignored():
+    engine = TrackerEngine()
+    record(engine, 10)
+    engine.rollups
+    aggregates = saved(engine.aggregates_snapshot())
+    engine.reset()
+
+    reloaded = TrackerEngine(match_log=list(engine.match_log), stats=saved(engine.stats_snapshot()),
+                             aggregates=aggregates)
+    assert not reloaded.index_built("rollups")
+    log = list(engine.match_log)
+    log[-1]["outcome"] = "draw"
+    edited = TrackerEngine(match_log=log, aggregates=aggregates)
+    assert not edited.index_built("rollups")
+
+
+def test_matchups_are_restored():
+    pytest.importorskip("numpy")
+    engine = TrackerEngine()
+    record(engine, 20)
+    engine.matchups
+    aggregates = saved(engine.aggregates_snapshot())
+    record(engine, 2, first=20)
+
+    reloaded = TrackerEngine(match_log=list(engine.match_log), aggregates=aggregates)
+    assert reloaded.index_built("matchups")
+    games, result = reloaded.matchups.pair(reloaded.matchups.synergy, "Ana", "Moira")
+    assert games == 22
+    assert result.total == 22
@@ -0,0 +1,19 @@
+"""The app module must import without a display, for its tests and tools."""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_creates_no_window(tmp_path):
+    # A fresh interpreter with no display, so an earlier import can't hide it,
+    # run elsewhere so an import that loads data can't touch the repo's files.
+    env = {k: v for k, v in os.environ.items() if k != "DISPLAY"}
+    env["PYTHONPATH"] = ROOT
+    code = ("import tkinter, ow2_tracker_final_hover_fixed as app\n"
+            "assert tkinter._default_root is None\n"
+            "assert app.engine is None and app.persistence is None\n")
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
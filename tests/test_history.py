@@ -0,0 +1,117 @@
+"""Edits, deletes and resets against a full recount; match log round-trips."""
+import random
+
+import pytest
+
+from match_binlog import BinaryMatchLog
+from match_journal import MatchJournal
+from tracker_core import TrackerEngine
+
+ODD_ENTRY = {
+    "teammates": ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"],
+    "enemies": ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"],
+    "map": "Ilios",
+    "timestamp": "2024-05-01T11:00:00+02:00",
+    "outcome": "Victory!",
+    "note": "scrim",
+}
+
+
+def load_engine(log, tmp_path):
+    # No roster, map or stats files: the defaults, with every match counted.
+    missing = str(tmp_path / "missing.json")
+    return TrackerEngine.load(log, heroes_file=missing, maps_file=missing, stats_file=missing)
+
+
+def random_engine(seed, matches=200):
+    rng = random.Random(seed)
+    engine = TrackerEngine()
+    heroes = engine.hero_names()
+    for i in range(matches):
+        engine.record_match(rng.sample(heroes, 5), rng.sample(heroes, 5), rng.choice(engine.maps),
+                            f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:00:00",
+                            rng.choice(["win", "loss", "draw", None]))
+    return engine, rng
+
+
+def edit_and_delete(engine, rng, times=60):
+    heroes = engine.hero_names()
+    ids = [entry["id"] for entry in engine.match_log]
+    for match_id in rng.sample(ids, times):
+        if rng.random() < 0.5:
+            engine.delete_match(match_id)
+        else:
+            engine.edit_match(match_id, rng.sample(heroes, 5), rng.sample(heroes, 5),
+                              rng.choice(engine.maps), rng.choice(["win", "loss", None]))
+
+
+def test_edits_and_deletes_match_a_full_recount():
+    engine, rng = random_engine(1)
+    engine.trends, engine.rollups  # indexes are kept up to date too
+    edit_and_delete(engine, rng)
+    assert engine.check() == []
+
+    # A checkpoint at position 0 counts the whole log from scratch.
+    fresh = TrackerEngine(match_log=list(engine.match_log), stats={"checkpoint": {"position": 0, "checksum": 0}})
+    assert engine.match_count() == fresh.match_count()
+    for side in ("teammates", "enemies"):
+        assert sorted(engine.pick_counts(side)) == sorted(fresh.pick_counts(side))
+    for map_name in engine.maps:
+        assert engine.map_record(map_name) == fresh.map_record(map_name)
+
+
+def test_reset_keeps_history_but_stops_counting_it():
+    engine, rng = random_engine(2, matches=50)
+    engine.reset()
+    assert engine.match_count() == 0
+    assert engine.match_log.live_count() == 50
+    for entry in random_engine(3, matches=20)[0].match_log:
+        engine.record_match(entry["teammates"], entry["enemies"], entry["map"],
+                            entry["timestamp"], entry.get("outcome"))
+    edit_and_delete(engine, rng, times=15)
+    assert engine.check() == []
+
+    # The watermark survives a save and reload.
+    reloaded = TrackerEngine(match_log=list(engine.match_log), stats=engine.stats_snapshot())
+    assert reloaded.match_count() == engine.match_count()
+    assert reloaded.check() == []
+
+
+def test_checkpoint_replays_the_tail_and_rebuilds_on_mismatch():
+    engine, rng = random_engine(4, matches=40)
+    stats = engine.stats_snapshot()
+    engine.record_match(["Ana"] * 5, ["Genji"] * 5, "Ilios", outcome="win")
+
+    resumed = TrackerEngine(match_log=list(engine.match_log), stats=stats)
+    assert resumed.replayed == 1
+    assert resumed.match_count() == engine.match_count()
+
+    # The first match no longer checksums the same: everything is recounted.
+    edited = list(engine.match_log)
+    edited[0] = dict(edited[0], map="Busan")
+    rebuilt = TrackerEngine(match_log=edited, stats=stats)
+    assert rebuilt.replayed == len(edited)
+    assert rebuilt.check() == []
+
+
+@pytest.mark.parametrize("make_log", [
+    lambda tmp_path: MatchJournal(str(tmp_path / "match_log.jsonl"), legacy_path=None),
+    lambda tmp_path: BinaryMatchLog(str(tmp_path / "match_log.bin")),
+], ids=["journal", "binlog"])
+def test_log_round_trip_keeps_extras_through_a_delete(tmp_path, make_log):
+    log = make_log(tmp_path)
+    plain = dict(ODD_ENTRY, outcome="loss", timestamp="2024-05-02T09:30:00")
+    del plain["note"]
+    log.append_many([ODD_ENTRY, plain, plain])
+
+    engine = load_engine(log, tmp_path)
+    first = engine.match_log[0]
+    for key in ("timestamp", "outcome", "note", "teammates", "map"):
+        assert first[key] == ODD_ENTRY[key]
+
+    engine.delete_match(engine.match_log[1]["id"])
+    log.rewrite(list(engine.match_log))
+    reloaded = load_engine(make_log(tmp_path), tmp_path)
+    assert list(reloaded.match_log) == list(engine.match_log)
+    assert reloaded.match_log[0]["note"] == "scrim"
+    assert reloaded.match_log[0]["timestamp"] == "2024-05-01T11:00:00+02:00"
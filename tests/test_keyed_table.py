@@ -0,0 +1,96 @@
+"""KeyedTable against a stand-in for the Treeview it drives."""
+from ow2_tracker_final_hover_fixed import KeyedTable
+from winrates import NO_RESULT
+
+
+class FakeTree:
+    """The part of ttk.Treeview KeyedTable uses, counting the row operations."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.children = []   # attached item ids, in order
+        self.values = {}
+        self.ops = 0
+
+    def __getitem__(self, option):
+        assert option == "columns"
+        return self.columns
+
+    def heading(self, column, text, command):
+        pass
+
+    def insert(self, parent, index, iid, values):
+        self.children.insert(index, iid)
+        self.values[iid] = values
+        self.ops += 1
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.children.remove(iid)
+            del self.values[iid]
+        self.ops += 1
+
+    def detach(self, *iids):
+        for iid in iids:
+            self.children.remove(iid)
+        self.ops += 1
+
+    def move(self, iid, parent, index):
+        if iid in self.children:
+            self.children.remove(iid)
+        self.children.insert(index, iid)
+        self.ops += 1
+
+    def item(self, iid, values):
+        self.values[iid] = values
+        self.ops += 1
+
+    def rows(self):
+        return [self.values[iid] for iid in self.children]
+
+
+ROWS = {"ana": ("Ana", 12, "55.0% (6-5-0)"), "mei": ("Mei", 3, NO_RESULT), "lucio": ("Lucio", 7, "40.0% (2-3-0)")}
+
+
+def table(**kwargs):
+    tree = FakeTree(["Hero", "Games", "Win Rate"])
+    return tree, KeyedTable(tree, "Games", **kwargs)
+
+
+def test_rows_are_kept_sorted_and_only_changes_touch_the_tree():
+    tree, keyed = table()
+    assert keyed.update(ROWS) == 3
+    assert [row[0] for row in tree.rows()] == ["Ana", "Lucio", "Mei"]
+
+    tree.ops = 0
+    assert keyed.update(ROWS) == 0
+    assert tree.ops == 0
+
+    rows = dict(ROWS, mei=("Mei", 20, NO_RESULT))
+    del rows["lucio"]
+    assert keyed.update(rows) == 2
+    assert tree.rows() == [("Mei", 20, NO_RESULT), ROWS["ana"]]
+
+
+def test_sorting_by_a_column():
+    tree, keyed = table()
+    keyed.update(ROWS)
+    keyed.sort_by("Hero")
+    assert [row[0] for row in tree.rows()] == ["Ana", "Lucio", "Mei"]
+    keyed.sort_by("Hero")
+    assert [row[0] for row in tree.rows()] == ["Mei", "Lucio", "Ana"]
+    # Percentages sort as numbers, with no result below all of them.
+    keyed.sort_by("Win Rate")
+    assert [row[0] for row in tree.rows()] == ["Ana", "Lucio", "Mei"]
+
+
+def test_limit_and_pages():
+    tree, keyed = table(limit=2)
+    keyed.update(ROWS)
+    assert [row[0] for row in tree.rows()] == ["Ana", "Lucio"]
+    keyed.set_page(1)
+    assert [row[0] for row in tree.rows()] == ["Mei"]
+    keyed.set_page(5)
+    assert keyed.page == 1
+    keyed.set_limit(None)
+    assert len(tree.rows()) == 3
@@ -0,0 +1,65 @@
+"""The binary match log's sidecar: appends that add names or extras."""
+import json
+import os
+import struct
+
+from match_binlog import HEADER_SIZE, PREAMBLE, RECORD_SIZE, BinaryMatchLog
+
+
+def match(i, team=("Ana",), **fields):
+    return {"teammates": list(team), "enemies": ["Genji"], "map": "Ilios",
+            "timestamp": f"2024-05-01T{i:02d}:00:00", **fields}
+
+
+def test_new_names_are_appended_without_rewriting_the_file(tmp_path):
+    path = str(tmp_path / "match_log.bin")
+    log = BinaryMatchLog(path)
+    log.rewrite([match(0)])
+    inode = os.stat(path).st_ino
+    log.append(match(1, ("Mei",)))
+    log.append_many([match(2, ("Lucio",), note="smurf"), match(3)])
+    assert os.stat(path).st_ino == inode
+    assert os.path.getsize(path) == HEADER_SIZE + 4 * RECORD_SIZE
+
+    reloaded = BinaryMatchLog(path)
+    assert reloaded.load() == [match(0), match(1, ("Mei",)), match(2, ("Lucio",), note="smurf"), match(3)]
+    reloaded.rewrite(reloaded.load())
+    assert not os.path.exists(tmp_path / "match_log.bin.1.names")
+    assert BinaryMatchLog(path).load()[2]["note"] == "smurf"
+
+
+def test_names_of_records_that_were_never_written(tmp_path):
+    path = str(tmp_path / "match_log.bin")
+    log = BinaryMatchLog(path)
+    log.rewrite([match(0)])
+    log.append(match(1, ("Mei",)))
+    # A crash between the sidecar line and the records: the line is there,
+    # the records are not.  Then a torn line from a second crash.
+    with open(tmp_path / log.sidecar, "a") as f:
+        f.write(json.dumps({"count": 2, "heroes": ["Kiriko"], "extras": {"2": {"note": "lost"}}}) + "\n")
+        f.write('{"count": 2, "her')
+
+    reloaded = BinaryMatchLog(path)
+    assert len(reloaded) == 2
+    reloaded.append(match(2))
+    assert BinaryMatchLog(path).load()[2] == match(2)
+
+
+def test_version_1_files_get_a_sidecar_on_first_use(tmp_path):
+    path = str(tmp_path / "match_log.bin")
+    BinaryMatchLog(path).rewrite([match(0)])
+    # Rewrite the header the way version 1 wrote it.
+    with open(path, "r+b") as f:
+        f.seek(PREAMBLE.size)
+        header = json.loads(f.read(HEADER_SIZE - PREAMBLE.size))
+        del header["generation"], header["sidecar"]
+        f.seek(0)
+        f.write(PREAMBLE.pack(b"OW2M", 1, RECORD_SIZE, HEADER_SIZE))
+        f.write(json.dumps(header).encode().ljust(HEADER_SIZE - PREAMBLE.size))
+
+    log = BinaryMatchLog(path)
+    log.append(match(1, ("Mei",)))
+    assert log.sidecar is not None
+    with open(path, "rb") as f:
+        assert struct.unpack("<H", f.read(6)[4:])[0] == 2
+    assert BinaryMatchLog(path).load() == [match(0), match(1, ("Mei",))]
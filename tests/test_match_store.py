@@ -0,0 +1,36 @@
+"""MatchStore as a sequence of the matches that are not deleted."""
+import pytest
+
+from match_store import MatchStore
+
+
+def entry(map_name, hour):
+    return {
+        "teammates": ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"],
+        "enemies": ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"],
+        "map": map_name,
+        "timestamp": f"2024-05-01T{hour:02d}:00:00",
+    }
+
+
+def test_sequence_protocol_skips_deleted_matches():
+    store = MatchStore(entries=[entry(m, i) for i, m in enumerate(["Ilios", "Oasis", "Busan", "Nepal"])])
+    store.delete(3)
+    store.delete(1)
+
+    assert len(store) == store.live_count() == 2
+    assert store.row_count() == 4
+    assert [e["map"] for e in store] == ["Ilios", "Busan"]
+    assert store[-1]["map"] == "Busan"
+    assert store[1]["map"] == "Busan"
+    assert [e["map"] for e in store[0:2]] == ["Ilios", "Busan"]
+    assert list(store.live_positions(skip=1)) == [2]
+
+
+def test_empty_after_deleting_everything():
+    store = MatchStore(entries=[entry("Ilios", 1)])
+    store.delete(0)
+    assert not store
+    assert len(store) == 0
+    with pytest.raises(IndexError):
+        store[0]
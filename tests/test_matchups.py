@@ -0,0 +1,70 @@
+"""Synergy and counter matrices, counted one match at a time and in bulk."""
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from match_store import Interner, MatchStore  # noqa: E402
+from matchups import MatchupMatrices  # noqa: E402
+
+HEROES = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper", "Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji", "Mei"]
+
+
+def random_log(count, seed=3):
+    rng = random.Random(seed)
+    log = []
+    for i in range(count):
+        teams = rng.sample(HEROES, 10)
+        log.append({"teammates": teams[:5], "enemies": teams[5:], "map": "Ilios",
+                    "timestamp": f"2024-05-01T{i % 24:02d}:00:00", "outcome": rng.choice(("win", "loss", None))})
+    # Short teams and a hero listed twice, as hand-edited logs have them.
+    log.append({"teammates": ["Ana", "Mei"], "enemies": ["Genji"], "map": "Oasis", "outcome": "win"})
+    log.append({"teammates": ["Ana", "Ana", "Mei"], "enemies": ["Genji", "Genji"], "map": "Oasis",
+                "outcome": "loss"})
+    return log
+
+
+def test_bulk_count_matches_adding_one_by_one():
+    log = random_log(200)
+    one_by_one = MatchupMatrices()
+    for entry in log:
+        one_by_one.add(entry)
+    bulk = MatchupMatrices.from_store(MatchStore(Interner(), Interner(), log))
+    for a in HEROES:
+        for b in HEROES:
+            assert one_by_one.pair(one_by_one.synergy, a, b)[0] == bulk.pair(bulk.synergy, a, b)[0]
+            assert (one_by_one.pair(one_by_one.counters, a, b)[1].to_list()
+                    == bulk.pair(bulk.counters, a, b)[1].to_list())
+
+
+def test_repeated_heroes_are_counted_per_pair():
+    matrices = MatchupMatrices()
+    matrices.add({"teammates": ["Ana", "Ana", "Mei"], "enemies": ["Genji", "Genji"], "outcome": "win"})
+    assert matrices.pair(matrices.synergy, "Ana", "Mei")[0] == 2
+    assert matrices.pair(matrices.synergy, "Ana", "Ana")[0] == 2
+    games, record = matrices.pair(matrices.counters, "Ana", "Genji")
+    assert (games, record.wins) == (4, 4)
+    matrices.add({"teammates": ["Ana", "Ana", "Mei"], "enemies": ["Genji", "Genji"], "outcome": "win"}, -1)
+    assert not matrices.synergy.any() and not matrices.counters.any()
+
+
+def test_top_partners():
+    matrices = MatchupMatrices()
+    for outcome in ("win", "win", "win", "loss"):
+        matrices.add({"teammates": ["Ana", "Mei"], "enemies": ["Genji"], "outcome": outcome})
+    for outcome in ("loss", "loss", "loss"):
+        matrices.add({"teammates": ["Ana", "Moira"], "enemies": ["Genji"], "outcome": outcome})
+    assert [name for name, _, _ in matrices.top_synergies("Ana")] == ["mei", "moira"]
+    assert [name for name, _, _ in matrices.top_synergies("Ana", by="winrate")] == ["mei", "moira"]
+    assert [name for name, _, _ in matrices.top_counters("Ana", by="lossrate")] == ["genji"]
+    assert matrices.top_synergies("Nobody") == []
+
+
+def test_saved_form_round_trips():
+    matrices = MatchupMatrices.from_store(MatchStore(Interner(), Interner(), random_log(50)))
+    loaded = MatchupMatrices.from_dict(matrices.to_dict())
+    n = len(matrices.names)
+    assert loaded.names == matrices.names
+    assert (loaded.synergy[:, :n, :n] == matrices.synergy[:, :n, :n]).all()
+    assert (loaded.counters[:, :n, :n] == matrices.counters[:, :n, :n]).all()
@@ -0,0 +1,86 @@
+"""PersistenceManager: documents, journals, and what happens when a write fails."""
+import json
+
+import pytest
+
+from persistence import PersistenceManager
+
+
+class Journal:
+    """Records appends in memory; fails the first ``failures`` of them with ``error``."""
+
+    def __init__(self, failures=0, error=OSError("disk full")):
+        self.records = []
+        self.failures = failures
+        self.error = error
+
+    def append_many(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.records.extend(records)
+
+    def rewrite(self, records):
+        self.records = list(records)
+
+
+@pytest.fixture
+def manager():
+    manager = PersistenceManager(delay=0.01)
+    manager.MAX_BACKOFF = 0.05
+    yield manager
+    manager.close(timeout=5)
+
+
+def test_documents_and_journals_are_written(manager, tmp_path):
+    path = tmp_path / "stats.json"
+    state = {"matches": 1}
+    journal = Journal()
+    manager.register("stats", str(path), lambda: state)
+    manager.register_journal("log", journal)
+    manager.append("log", {"id": 1})
+    manager.mark_dirty("stats")
+    assert manager.flush(timeout=5)
+    assert json.loads(path.read_text()) == {"matches": 1}
+    assert journal.records == [{"id": 1}]
+    with pytest.raises(KeyError):
+        manager.mark_dirty("unknown")
+
+
+def test_io_errors_are_retried_in_order(manager):
+    journal = Journal(failures=2)
+    manager.register_journal("log", journal)
+    manager.append("log", {"id": 1})
+    assert manager.flush(timeout=5)
+    manager.append("log", {"id": 2})
+    assert manager.flush(timeout=5)
+    assert journal.records == [{"id": 1}, {"id": 2}]
+
+
+def test_other_errors_are_dropped_and_the_queue_moves_on(manager, capsys):
+    journal = Journal(failures=1, error=ValueError("not serializable"))
+    ran = []
+
+    def broken():
+        raise KeyError("bug")
+
+    manager.register_journal("log", journal)
+    manager.append("log", {"id": 1})
+    manager.submit(broken)
+    manager.submit(lambda: ran.append(True))
+    assert manager.flush(timeout=5)
+    manager.append("log", {"id": 2})
+    assert manager.flush(timeout=5)
+    assert journal.records == [{"id": 2}]
+    assert ran == [True]
+    assert "failed and was dropped" in capsys.readouterr().out
+
+
+def test_a_rewrite_replaces_queued_appends(manager):
+    journal = Journal()
+    history = [{"id": 1}, {"id": 2}]
+    manager.register_journal("log", journal)
+    manager.append("log", {"id": 2})
+    manager.rewrite_journal("log", lambda: history)
+    assert manager.flush(timeout=5)
+    assert journal.records == history
@@ -0,0 +1,52 @@
+"""The static report: its data, the page, and which charts get redrawn."""
+import importlib.util
+import json
+
+import pytest
+
+from report import MANIFEST_FILE, chart_name, collect, write_report
+from tracker_core import TrackerEngine
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+
+
+def engine_with_matches():
+    engine = TrackerEngine()
+    engine.record_match(TEAM, ENEMIES, "King’s Row", "2024-05-01T20:00:00", "win")
+    engine.record_match(TEAM[:4] + ["Sojourn"], ENEMIES[:4] + ["Reaper"], "Ilios", "2024-05-02T20:00:00", "loss")
+    return engine
+
+
+def test_collect():
+    engine = engine_with_matches()
+    data = collect(engine)
+    assert data["matches"] == 2
+    assert ("Reaper", 1, 1, "100.0% (1-0-0)") in data["heroes"]
+    assert [name for name, _, _ in data["maps"]] == ["Ilios", "King’s Row"]
+    # One chart per roster hero that has played.
+    assert {job[0] for job in data["charts"]} == {chart_name(h) for h in engine.hero_names()}
+    assert chart_name("D.Va") == "heroes/d-va.png"
+
+
+def test_page_lists_every_map_and_hero(tmp_path):
+    data = collect(engine_with_matches())
+    data["maps"][0] = ("<Ilios>",) + data["maps"][0][1:]
+    write_report(data, str(tmp_path), processes=1)
+    page = (tmp_path / "index.html").read_text(encoding="utf-8")
+    assert "2 matches" in page
+    assert "&lt;Ilios&gt;" in page and "<Ilios>" not in page
+    assert "King’s Row" in page and "Win Rate: 100.00% (1/1)" in page
+    if importlib.util.find_spec("matplotlib") is None:
+        # No chart was drawn, so none may be recorded as up to date.
+        assert json.loads((tmp_path / MANIFEST_FILE).read_text()) == {"charts": {}}
+
+
+def test_only_changed_charts_are_redrawn(tmp_path):
+    pytest.importorskip("matplotlib")
+    engine = engine_with_matches()
+    assert write_report(collect(engine), str(tmp_path), processes=1) == (9, 0)
+    assert write_report(collect(engine), str(tmp_path), processes=1) == (0, 9)
+    engine.record_match(["Ana"], ["Genji"], "Ilios", "2024-05-03T20:00:00", "win")
+    assert write_report(collect(engine), str(tmp_path), processes=1) == (1, 8)
+    assert (tmp_path / "heroes" / "ana.png").exists()
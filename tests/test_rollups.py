@@ -0,0 +1,71 @@
+"""Date-range rollups against the engine's counters."""
+import random
+from datetime import date, datetime, timedelta
+
+from rollups import preset_range
+from tracker_core import TrackerEngine
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+
+
+def test_date_ranges_honour_the_reset_point():
+    engine = TrackerEngine()
+    now = datetime.now().replace(microsecond=0)
+    today = now.date()
+    for i in range(3):
+        engine.record_match(TEAM, ENEMIES, "Ilios", (now - timedelta(hours=i)).isoformat(), "win")
+    engine.rollups  # built before the reset
+    engine.reset()
+    for label in ("Today", "Last 7 Days"):
+        assert engine.rollups.preset(label, today).match_count() == 0
+
+    kept = engine.record_match(TEAM, ENEMIES, "Oasis", now.isoformat(), "loss")
+    old = engine.match_log[0]
+    engine.edit_match(old["id"], TEAM, ENEMIES, "Busan", "loss")
+    engine.delete_match(engine.match_log[1]["id"])
+    week = engine.rollups.preset("Last 7 Days", today)
+    assert week.match_count() == engine.match_count() == 1
+    assert week.map_record("Oasis") == (0, 1)
+    assert week.map_record("Busan") is None
+
+    # A rollup built after the reset (e.g. after a restart) agrees.
+    fresh = TrackerEngine(match_log=list(engine.match_log), stats=engine.stats_snapshot())
+    assert fresh.rollups.query(today - timedelta(days=6), today).match_count() == 1
+    assert kept["id"] > fresh.counted_after
+
+
+def test_ranges_match_a_scan_of_the_log():
+    rng = random.Random(7)
+    engine = TrackerEngine()
+    heroes, start = engine.hero_names(), datetime(2024, 1, 1, 12)
+    for i in range(300):
+        when = start + timedelta(hours=rng.randrange(24 * 90))
+        teams = rng.sample(heroes, 8)
+        engine.record_match(teams[:4], teams[4:], rng.choice(("Ilios", "Oasis", "Busan")),
+                            when.isoformat(), rng.choice(("win", "loss", "draw", None)))
+    # Some ranges line up with whole weeks (Mondays), some cut through them.
+    for first, last in ((date(2024, 1, 1), date(2024, 3, 31)), (date(2024, 1, 3), date(2024, 1, 17)),
+                        (date(2024, 2, 5), date(2024, 2, 11)), (date(2024, 3, 9), date(2024, 3, 9))):
+        rollup = engine.rollups.query(first, last)
+        matches = [m for m in engine.match_log
+                   if first <= datetime.fromisoformat(m["timestamp"]).date() <= last]
+        assert rollup.match_count() == len(matches)
+        picks = {}
+        for m in matches:
+            for hero in m["enemies"]:
+                picks[hero.lower()] = picks.get(hero.lower(), 0) + 1
+        assert dict(rollup.pick_counts("enemies")) == picks
+        on_oasis = [m for m in matches if m["map"] == "Oasis"]
+        decided = [m for m in on_oasis if m.get("outcome")]
+        assert rollup.map_record("Oasis") == (
+            (sum(m["outcome"] == "win" for m in decided), len(decided)) if on_oasis else None)
+        ana = [m["outcome"] for m in matches if "Ana" in m["teammates"] and m.get("outcome")]
+        assert rollup.hero("ana").to_list() == [ana.count(o) for o in ("win", "loss", "draw")]
+
+
+def test_presets():
+    today = date(2024, 5, 15)
+    assert preset_range("All Time", today) is None
+    assert preset_range("Today", today) == (today, today)
+    assert preset_range("Last 7 Days", today) == (date(2024, 5, 9), today)
@@ -0,0 +1,82 @@
+"""The SQLite backend: imports, counts and the reset point."""
+import sqlite3
+
+import pytest
+
+from sqlite_store import SqliteStatsStore
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+
+
+def entry(match_id, timestamp, outcome="win", map_name="Ilios"):
+    return {"id": match_id, "teammates": TEAM, "enemies": ENEMIES,
+            "map": map_name, "timestamp": timestamp, "outcome": outcome}
+
+
+def test_import_keeps_entries_without_a_timestamp(tmp_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    hand_edited = entry(2, None)
+    del hand_edited["map"]
+    log = [entry(1, "2024-05-01T20:00:00"), hand_edited, entry(3, "2024-05-02T20:00:00", "loss")]
+    assert store.import_json(log) == 3
+    assert store.match_count() == 3
+    assert store.map_record("Ilios") == (1, 2)
+    assert store.hero_timestamps("ana") == ["2024-05-01T20:00:00", None, "2024-05-02T20:00:00"]
+    assert store.hero_timestamps("ana", start=2) == ["2024-05-02T20:00:00"]
+    assert store.hero_match_count("ana") == 3
+
+    store.delete_match(hand_edited)
+    assert store.match_count() == 2
+
+
+def test_id_conflicts_get_a_new_id_and_other_errors_propagate(tmp_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    store.add_match(entry(1, "2024-05-01T20:00:00"))
+    assert store.add_match(entry(1, "2024-05-01T21:00:00")) == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        store.add_match(entry(3, "2024-05-01T22:00:00", outcome="abandoned"))
+    assert store.match_count() == 2
+
+
+def test_reset_point(tmp_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    store.import_json([entry(i, f"2024-05-0{i}T20:00:00") for i in (1, 2, 3)])
+    store.reset(counted_after=2)
+    assert store.match_count() == 1
+    assert dict(store.pick_counts("teammates"))["ana"] == 1
+    store.reset()
+    assert store.match_count() == 0
+
+
+def test_rebuild_replaces_the_matches(tmp_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    store.import_json([entry(i, f"2024-05-0{i}T20:00:00") for i in (1, 2, 3)])
+    store.reset()
+    store.rebuild([entry(2, "2024-05-02T20:00:00", "loss"), entry(4, None, map_name="Busan")],
+                  counted_after=2)
+    assert store.match_count() == 1
+    assert store.map_record("Busan") == (1, 1)
+    assert store.map_record("Ilios") is None
+    assert store.hero_match_count("ana") == 2
+
+
+def test_databases_with_required_timestamps_are_migrated(tmp_path):
+    path = str(tmp_path / "stats.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE maps (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE matches (id INTEGER PRIMARY KEY, map_id INTEGER NOT NULL REFERENCES maps(id),
+                              timestamp TEXT NOT NULL);
+        INSERT INTO maps VALUES (1, 'Ilios');
+        INSERT INTO matches VALUES (7, 1, '2024-05-01T20:00:00');
+    """)
+    conn.close()
+
+    store = SqliteStatsStore(path)
+    store.add_match(entry(8, None))
+    assert store.match_count() == 2
+    store.delete_match(entry(7, "2024-05-01T20:00:00"))
+    assert store.match_count() == 1
+    indexes = {row[1] for row in store.conn.execute("PRAGMA index_list(matches)")}
+    assert {"matches_map", "matches_timestamp"} <= indexes
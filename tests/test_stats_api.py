@@ -0,0 +1,89 @@
+"""The stats API over a real socket: caching, ETags, events and who may read it."""
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+from stats_api import StatsApi
+from tracker_core import TrackerEngine
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+OVERLAY = "http://localhost:3000"
+
+
+@pytest.fixture
+def api():
+    engine = TrackerEngine()
+    engine.record_match(TEAM, ENEMIES, "Ilios", "2024-05-01T20:00:00", "win")
+    api = StatsApi(engine, port=0, origins=[OVERLAY]).start()
+    assert api.listening
+    yield api
+    api.stop()
+
+
+def get(api, path, **headers):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port, timeout=5)
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, json.loads(body) if body else None
+
+
+def wait_for_version(api, version):
+    deadline = time.monotonic() + 5
+    while get(api, "/version")[1]["version"] != version:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_responses_are_cached_per_version(api):
+    response, data = get(api, "/picks")
+    assert response.status == 200
+    assert data["matches"] == 1
+    etag = response.getheader("ETag")
+    assert get(api, "/picks")[0].getheader("ETag") == etag
+    assert api.cache_hits == 1
+    assert get(api, "/picks", **{"If-None-Match": etag})[0].status == 304
+
+    api.engine.record_match(TEAM, ENEMIES, "Oasis", "2024-05-01T21:00:00", "loss")
+    api.notify()
+    wait_for_version(api, 2)
+    response, data = get(api, "/picks", **{"If-None-Match": etag})
+    assert response.status == 200
+    assert data["matches"] == 2
+    assert response.getheader("ETag") != etag
+
+
+def test_errors(api):
+    assert get(api, "/picks?side=spectators")[0].status == 400
+    assert get(api, "/trend?hero=nobody")[0].status == 404
+    assert get(api, "/nothing")[0].status == 404
+    response, data = get(api, "/trend?hero=ana")
+    assert (response.status, data["hero"], data["picks"]) == (200, "Ana", [1])
+
+
+def test_only_listed_origins_and_local_hosts(api):
+    assert get(api, "/picks")[0].getheader("Access-Control-Allow-Origin") is None
+    assert get(api, "/picks", Origin="http://example.com")[0].getheader("Access-Control-Allow-Origin") is None
+    assert get(api, "/picks", Origin=OVERLAY)[0].getheader("Access-Control-Allow-Origin") == OVERLAY
+    assert get(api, "/picks", Host="stats.example.com")[0].status == 403
+    assert get(api, "/picks", Host=f"localhost:{api.port}")[0].status == 200
+
+
+def test_events_announce_new_versions(api):
+    with socket.create_connection(("127.0.0.1", api.port), timeout=5) as sock:
+        sock.sendall(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        stream = sock.makefile("rb")
+        assert stream.readline().startswith(b"HTTP/1.1 200")
+        events = []
+        while len(events) < 2:
+            line = stream.readline()
+            if line.startswith(b"data: "):
+                events.append(json.loads(line[6:]))
+                if len(events) == 1:
+                    api.notify()
+        assert events == [{"version": 1}, {"version": 2}]
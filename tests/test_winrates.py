@@ -0,0 +1,57 @@
+"""Win records kept by the engine as matches are recorded, edited and deleted."""
+import json
+
+from match_store import Interner
+from tracker_core import TrackerEngine
+from winrates import NO_RESULT, Record, RollingRecord, WinRateStats
+
+TEAM = ["Ana", "D.Va", "Moira", "Cassidy", "Reaper"]
+ENEMIES = ["Orisa", "Kiriko", "Sojourn", "Doomfist", "Genji"]
+
+
+def play(engine, outcomes, map_name="Ilios"):
+    return [engine.record_match(TEAM, ENEMIES, map_name, f"2024-05-01T{i:02d}:00:00", outcome)
+            for i, outcome in enumerate(outcomes)]
+
+
+def test_records_per_map_hero_and_side():
+    engine = TrackerEngine()
+    play(engine, ["win", "win", "loss", "draw"])
+    engine.record_match(TEAM, ENEMIES, "Oasis", "2024-05-02T10:00:00", None)
+    stats = engine.win_stats
+    assert stats.map("Ilios").to_list() == [2, 1, 1]
+    assert stats.map("Oasis").total == 0
+    assert stats.hero("ana").to_list() == [2, 1, 1]
+    assert stats.hero("genji", "enemies").to_list() == [2, 1, 1]
+    assert stats.hero("genji").total == 0
+    assert str(stats.hero_on_map("ana", "Ilios")) == "50.0% (2-1-1)"
+    assert str(stats.hero_on_map("ana", "Oasis")) == NO_RESULT
+
+
+def test_edits_and_deletes_are_taken_back_out():
+    engine = TrackerEngine()
+    first, second = play(engine, ["win", "loss"])
+    engine.edit_match(first["id"], TEAM, ENEMIES, "Busan", "loss")
+    engine.delete_match(second["id"])
+    stats = engine.win_stats
+    assert stats.map("Ilios").total == 0
+    assert stats.map("Busan").to_list() == [0, 1, 0]
+    assert stats.hero("ana").to_list() == [0, 1, 0]
+    assert list(stats.recent.recent) == ["loss"]
+    assert engine.check() == []
+
+
+def test_rolling_window():
+    recent = RollingRecord(3, ["win", "win", "loss"])
+    recent.add("loss")
+    assert recent.to_list() == [1, 2, 0]
+    assert Record(1, 2, 1).rate == 25.0
+
+
+def test_saved_form_round_trips():
+    engine = TrackerEngine()
+    play(engine, ["win", "loss", "win"])
+    saved = json.loads(json.dumps(engine.win_stats.to_dict()))
+    loaded = WinRateStats.from_dict(saved, Interner(), Interner())
+    assert loaded.to_dict() == engine.win_stats.to_dict()
+    assert loaded.hero_on_map("moira", "Ilios").to_list() == [2, 1, 0]
@@ -0,0 +1,244 @@
+"""Command-line front end for the OW2 tracker core.
+
+Bulk-ingest matches from CSV or JSONL without opening the window::
+
+    python tracker_cli.py ingest matches.csv more.jsonl
+    python tracker_cli.py stats --side enemies --limit 10
+    python tracker_cli.py check --repair
+    python tracker_cli.py report --out ow2_report
+
+CSV files need a header with ``map``, ``teammate1``..``teammate5`` and
+``enemy1``..``enemy5`` columns (or ``teammates``/``enemies`` columns holding
+``;``-separated names), an optional ISO ``timestamp`` and an optional
+``outcome`` (win/loss/draw).  JSONL files use the
+same records as the match journal.  Every row is validated against the hero
+roster and map list; all accepted matches are written to storage once, at the
+end of the run.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from match_binlog import open_match_log
+from persistence import write_text_atomic
+from report import REPORT_DIR, REPORT_PROCESSES, generate_report
+from sqlite_store import SqliteStatsStore
+from tracker_core import (
+    MATCH_JOURNAL_FILE,
+    MATCH_LOG_FILE,
+    SAVE_FILE,
+    STATS_DB_FILE,
+    TEAM_SIZE,
+    TrackerEngine,
+    pick_rate_rows,
+)
+
+
+def _csv_side(row, side, column):
+    if row.get(side):
+        return [h.strip() for h in row[side].split(";")]
+    return [(row.get(f"{column}{i}") or "").strip() for i in range(1, TEAM_SIZE + 1)]
+
+
+def read_records(path, fmt=None):
+    """Yield ``(line number, record)`` pairs from a CSV or JSONL file.
+
+    Records have the journal layout: ``teammates``, ``enemies``, ``map`` and
+    an optional ``timestamp``.  Unparseable JSON lines yield ``None``.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {
+                    "teammates": _csv_side(row, "teammates", "teammate"),
+                    "enemies": _csv_side(row, "enemies", "enemy"),
+                    "map": (row.get("map") or "").strip(),
+                    "timestamp": (row.get("timestamp") or "").strip() or None,
+                    "outcome": (row.get("outcome") or row.get("result") or "").strip() or None,
+                }
+        else:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield lineno, json.loads(line)
+                except ValueError:
+                    yield lineno, None
+
+
+def normalize_record(engine, record):
+    """Validate ``record`` against the roster; return (match, error)."""
+    if not isinstance(record, dict):
+        return None, "not a match record"
+    teammates = [str(h).strip() for h in record.get("teammates") or []]
+    enemies = [str(h).strip() for h in record.get("enemies") or []]
+    map_name = str(record.get("map") or "").strip()
+    outcome = str(record.get("outcome") or "").strip().lower() or None
+    error = engine.validate(teammates, enemies, map_name, strict=True, outcome=outcome)
+    if error:
+        return None, error
+    timestamp = record.get("timestamp") or None
+    if timestamp is not None:
+        try:
+            timestamp = datetime.fromisoformat(timestamp).isoformat()
+        except (TypeError, ValueError):
+            return None, f"bad timestamp {timestamp!r}"
+    return (
+        [engine.canonical_hero(h) for h in teammates],
+        [engine.canonical_hero(h) for h in enemies],
+        engine.canonical_map(map_name),
+        timestamp,
+        outcome,
+    ), None
+
+
+def ingest(engine, paths, fmt=None, strict=False, max_errors=20):
+    """Count every valid record from ``paths`` into ``engine``.
+
+    Returns ``(entries, errors)``.  With ``strict`` nothing is recorded if
+    any row is invalid.
+    """
+    valid, errors = [], []
+    for path in paths:
+        for lineno, record in read_records(path, fmt):
+            match, error = normalize_record(engine, record)
+            if error:
+                errors.append(f"{path}:{lineno}: {error}")
+            else:
+                valid.append(match)
+    if strict and errors:
+        return [], errors
+    entries = [engine.record_match(*match) for match in valid]
+    return entries, errors
+
+
+def save(engine, journal, entries, db_path=STATS_DB_FILE, stats_file=SAVE_FILE):
+    """Write a batch of new matches to every storage backend in one go."""
+    journal.append_many(entries)
+    write_text_atomic(stats_file, json.dumps(engine.stats_snapshot()))
+    if os.path.exists(db_path):
+        store = SqliteStatsStore(db_path)
+        store.import_json(entries)
+        store.close()
+
+
+def cmd_ingest(args):
+    journal = open_match_log(args.journal, args.legacy)
+    engine = TrackerEngine.load(journal, stats_file=args.stats)
+    entries, errors = ingest(engine, args.files, args.format, args.strict)
+    for error in errors[:args.max_errors]:
+        print(f"⚠️ {error}", file=sys.stderr)
+    if len(errors) > args.max_errors:
+        print(f"⚠️ ... and {len(errors) - args.max_errors} more", file=sys.stderr)
+    if args.strict and errors:
+        print(f"Aborted: {len(errors)} invalid rows, nothing written.")
+        return 1
+    if entries and not args.dry_run:
+        save(engine, journal, entries, args.db, args.stats)
+    verb = "Validated" if args.dry_run else "Ingested"
+    print(f"{verb} {len(entries)} matches ({len(errors)} rejected); {engine.total_matches} counted in total")
+    return 0
+
+
+def load_engine(args):
+    """The engine for a command that only reads the match log; never creates one."""
+    return TrackerEngine.load(open_match_log(args.journal, args.legacy, create=False), stats_file=args.stats)
+
+
+def cmd_stats(args):
+    engine = load_engine(args)
+    source = engine
+    if args.days:
+        today = date.today()
+        source = engine.rollups.query(today - timedelta(days=args.days - 1), today)
+    if args.map:
+        record = source.map_record(args.map)
+        if record is None:
+            print("No matches recorded.")
+            return 0
+        rows = [(h.title(), c) for h, c in source.map_pick_counts(args.map, args.side)]
+    else:
+        rows = pick_rate_rows(source, args.side)
+    for row in rows[:args.limit]:
+        print("\t".join(str(v) for v in row))
+    return 0
+
+
+def cmd_check(args):
+    engine = load_engine(args)
+    problems = engine.check()
+    for problem in problems[:args.limit]:
+        print(problem)
+    if len(problems) > args.limit:
+        print(f"... and {len(problems) - args.limit} more")
+    if not problems:
+        print(f"{args.stats} matches the {engine.match_log.live_count()} logged matches.")
+        return 0
+    if args.repair:
+        engine.rebuild_counts()
+        write_text_atomic(args.stats, json.dumps(engine.stats_snapshot()))
+        print(f"Rebuilt {args.stats} from the match log.")
+        return 0
+    return 1
+
+
+def cmd_report(args):
+    engine = load_engine(args)
+    drawn, kept = generate_report(engine, args.out, args.processes, args.force)
+    print(f"Wrote {os.path.join(args.out, 'index.html')}: {drawn} charts drawn, {kept} unchanged")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="OW2 tracker command-line tools.")
+    parser.add_argument("--journal", default=MATCH_JOURNAL_FILE, help="a .bin path uses the binary match log")
+    parser.add_argument("--legacy", default=MATCH_LOG_FILE)
+    parser.add_argument("--stats", default=SAVE_FILE)
+    parser.add_argument("--db", default=STATS_DB_FILE, help="also updated if it exists")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="bulk-import matches from CSV/JSONL files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--format", choices=["csv", "jsonl"], help="default: by file extension")
+    p.add_argument("--strict", action="store_true", help="write nothing if any row is invalid")
+    p.add_argument("--dry-run", action="store_true", help="validate only")
+    p.add_argument("--max-errors", type=int, default=20, help="how many rejected rows to print")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("stats", help="print pick rates")
+    p.add_argument("--side", choices=["teammates", "enemies"], default="teammates")
+    p.add_argument("--map")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--days", type=int, help="only matches from the last N days")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("check", help="verify the saved stats against the match log")
+    p.add_argument("--repair", action="store_true", help="rewrite the stats from the log")
+    p.add_argument("--limit", type=int, default=20, help="how many problems to print")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("report", help="write an HTML/PNG report of every hero and map")
+    p.add_argument("--out", default=REPORT_DIR)
+    p.add_argument("--processes", type=int, default=REPORT_PROCESSES, help="chart-drawing processes")
+    p.add_argument("--force", action="store_true", help="redraw every chart")
+    p.set_defaults(func=cmd_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except FileNotFoundError as e:
+        print(f"{e.filename} does not exist.", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
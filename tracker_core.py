@@ -0,0 +1,717 @@
+"""Display-free analytics core of the OW2 tracker.
+
+``TrackerEngine`` owns the roster, map list, match history and the counters
+built from it.  It does no I/O beyond ``load``, so scripts, benchmarks and
+``tracker_cli`` can use it without a display.
+"""
+import json
+import os
+from array import array
+from datetime import datetime
+
+from match_store import ENTRY_KEYS, TEAM_SIZE, Interner, MatchStore
+from matchups import AVAILABLE as HAVE_NUMPY, MatchupMatrices
+from rollups import TimeRollups
+from trends import TrendIndex
+from winrates import OUTCOMES, WinRateStats
+
+SAVE_FILE = "ow2_stats.json"
+HEROES_FILE = "heroes.json"
+MAPS_FILE = "maps.json"
+MATCH_LOG_FILE = "match_log.json"
+# Append-only journal that replaced MATCH_LOG_FILE; the old file is migrated
+# into it automatically on first start.
+MATCH_JOURNAL_FILE = "match_log.jsonl"
+STATS_DB_FILE = "ow2_stats.db"
+# The date-range rollups and matchup matrices, saved every so often so a
+# restart only counts the matches logged since.
+AGGREGATES_FILE = "ow2_aggregates.json"
+
+DEFAULT_HEROES_BY_ROLE = {
+    "Tank": ["D.Va", "Doomfist", "Orisa"],
+    "Damage": ["Cassidy", "Sojourn", "Reaper"],
+    "Support": ["Ana", "Moira", "Kiriko"]
+}
+DEFAULT_MAPS = ['New Queen Street', 'Colosseo', 'Esperança', 'New Junk City', 'Circuit Royal', 'Dorado', 'Havana', 'Junkertown', 'Route 66', 'Shambali Monastery', 'Blizzard World', 'Eichenwalde', 'King’s Row', 'Midtown', 'Numbani', 'Paraíso', 'Ilios', 'Lijiang Tower', 'Nepal', 'Oasis', 'Antarctic Peninsula', 'Samoa', 'Suravasa']
+
+SIDES = ("teammates", "enemies")
+# Tries at building from a copy of the history before, with the history
+# edited under it every time, the work is done holding the lock instead.
+OFF_LOCK_ATTEMPTS = 3
+# Matches a checkpoint's checksum covers, counting back from its position.
+# Edits and resets rewrite the checkpoint right away, so only the end of the
+# log can disagree with it after a crash.
+CHECKPOINT_TAIL = 64
+
+
+def _bump(counts, index, amount=1):
+    """``counts[index] += amount`` for an id-indexed array, growing it."""
+    if index >= len(counts):
+        counts.extend([0] * (index + 1 - len(counts)))
+    if amount < 0 and counts[index] < -amount:
+        # Counters reset behind the log's back; ``check`` reports it.
+        counts[index] = 0
+    else:
+        counts[index] += amount
+
+
+def _diff(label, mine, theirs):
+    """Problems for two ``{key: count}`` dicts that should be equal."""
+    return [
+        f"{label}: {key} is {mine.get(key, 0)}, the log has {theirs.get(key, 0)}"
+        for key in sorted(set(mine) | set(theirs)) if mine.get(key, 0) != theirs.get(key, 0)
+    ]
+
+
+def _win_table(win_stats):
+    """``WinRateStats.to_dict`` with the order-dependent lists made comparable."""
+    data = win_stats.to_dict()
+    data["hero_maps"] = {
+        side: {(h, m): counts for h, m, *counts in rows} for side, rows in data["hero_maps"].items()
+    }
+    return data
+
+
+def load_json(path, default):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+
+def pick_rate_table(source, side):
+    """``{hero_key: (Hero, "12.34%", games)}`` for the pick rate tables.
+
+    ``source`` is a ``TrackerEngine`` or a ``SqliteStatsStore``.
+    """
+    total = source.match_count()
+    if not total:
+        return {}
+    return {h: (h.title(), f"{(c / total) * 100:.2f}%", c) for h, c in source.pick_counts(side)}
+
+
+def pick_rate_rows(source, side):
+    """Rows for the pick rate tables, most picked first."""
+    return list(pick_rate_table(source, side).values())
+
+
+class TrackerEngine:
+    """Pick counters and match history, updated one match at a time.
+
+    Heroes and maps are interned to integer ids; the history is a
+    ``MatchStore`` and the counters are arrays indexed by id.  The query
+    methods mirror ``SqliteStatsStore`` so the UI can read from either.
+    """
+
+    def __init__(self, heroes_by_role=None, maps=None, match_log=None, stats=None, aggregates=None):
+        self.heroes_by_role = heroes_by_role if heroes_by_role is not None else {
+            role: list(heroes) for role, heroes in DEFAULT_HEROES_BY_ROLE.items()
+        }
+        self.maps = maps if maps is not None else list(DEFAULT_MAPS)
+        if isinstance(match_log, MatchStore):
+            # Already columnar (``BinaryMatchLog.load_store``); adopt its ids.
+            self.match_log = match_log
+            self.hero_ids, self.map_ids = match_log.heroes, match_log.maps
+            for h in self.hero_names():
+                self.hero_ids.intern(h)
+            for m in self.maps:
+                self.map_ids.intern(m)
+        else:
+            # The roster and map list are interned first, so their ids are stable.
+            self.hero_ids, self.map_ids = self._interners(self.heroes_by_role, self.maps)
+            self.match_log = MatchStore(self.hero_ids, self.map_ids, match_log or ())
+        stats = stats or {}
+        checkpoint = stats.get("checkpoint")
+        self.total_matches = stats.get("matches", 0)
+        # Matches with ids up to this one were logged before the last reset.
+        self.counted_after = stats.get("counted_after", 0)
+        self.picks = {side: array("L") for side in SIDES}   # side -> games by hero id
+        self.map_picks = {}     # map id -> side -> games by hero id
+        self.map_results = {}   # map id -> [wins, matches with a result]
+        self._load_counts(stats)
+        if "win_stats" in stats:
+            self.win_stats = WinRateStats.from_dict(stats["win_stats"], self.hero_ids, self.map_ids)
+        else:
+            # Stats saved before outcomes were tracked.
+            self.win_stats = WinRateStats.from_store(
+                self.match_log, (p for p in self.match_log.live_positions() if self._counted(p)))
+        # Built on first use; they index the whole match history.
+        self._trends = None
+        self._matchups = None
+        self._rollups = None
+        # Bumped whenever past matches change, so copies of the history and
+        # series cached from the indexes can tell they are out of date.
+        self.history_edits = 0
+        # Lowercased name -> roster spelling, built on first use.
+        self._hero_lookup = None
+        self._map_lookup = None
+        # Live matches covered by the last saved checkpoint, and how many
+        # logged after it were counted at startup.
+        self.checkpointed = self.aggregated = self.match_log.live_count()
+        self.replayed = 0
+        if checkpoint is not None:
+            self._catch_up(checkpoint, "win_stats" in stats)
+        if aggregates:
+            self._restore_aggregates(aggregates)
+
+    @classmethod
+    def load(cls, journal, heroes_file=HEROES_FILE, maps_file=MAPS_FILE, stats_file=SAVE_FILE,
+             aggregates_file=AGGREGATES_FILE):
+        """Build an engine from the JSON files and ``journal``.
+
+        A journal with ``load_store`` (the binary match log) hands over its
+        columns directly instead of a list of dicts.
+        """
+        heroes_by_role = load_json(heroes_file, None)
+        maps = load_json(maps_file, None)
+        if hasattr(journal, "load_store"):
+            match_log = journal.load_store(*cls._interners(
+                heroes_by_role if heroes_by_role is not None else DEFAULT_HEROES_BY_ROLE,
+                maps if maps is not None else DEFAULT_MAPS,
+            ))
+        else:
+            match_log = journal.load()
+        # Without a stats file every logged match is counted.
+        stats = load_json(stats_file, None) or {"checkpoint": {"position": 0, "tail": 0}}
+        return cls(heroes_by_role, maps, match_log, stats, load_json(aggregates_file, None))
+
+    @staticmethod
+    def _interners(heroes_by_role, maps):
+        return Interner(h for heroes in heroes_by_role.values() for h in heroes), Interner(maps)
+
+    def _load_counts(self, stats):
+        """Intern the name-keyed counters of a saved ``ow2_stats.json``."""
+        hero, map_id = self.hero_ids.intern, self.map_ids.intern
+        for side in SIDES:
+            for h, count in stats.get(side, {}).items():
+                _bump(self.picks[side], hero(h), count)
+        for m, data in stats.get("map_stats", {}).items():
+            sides = self.map_picks.setdefault(map_id(m), {side: array("L") for side in SIDES})
+            for side in SIDES:
+                for h, count in data.get(side, {}).items():
+                    _bump(sides[side], hero(h), count)
+            if data.get("total"):
+                self.map_results[map_id(m)] = [data.get("wins", 0), data["total"]]
+
+    def _catch_up(self, checkpoint, replay_wins=True):
+        """Count the matches logged after ``checkpoint``.
+
+        ``ow2_stats.json`` records how many logged matches its counters
+        cover and a checksum of the last of them.  The counters are thrown
+        away and recounted if those matches no longer checksum the same (a
+        crash between the two writes, a hand-edited file).
+        """
+        store = self.match_log
+        position = checkpoint.get("position", 0)
+        if not self._matches_checkpoint(checkpoint):
+            print(f"⚠️ Saved stats don't match the match log; recounting {store.live_count()} matches.")
+            self.rebuild_counts()
+            self.replayed = store.live_count()
+            return
+        self.checkpointed = position
+        for p in store.live_positions(skip=position):
+            if not self._counted(p):
+                continue
+            self._count(p, 1)
+            if replay_wins:
+                self.win_stats.record(store, p)
+            self.replayed += 1
+
+    def _matches_checkpoint(self, checkpoint):
+        store = self.match_log
+        position = checkpoint.get("position", 0)
+        if position > store.live_count():
+            return False
+        if "tail" in checkpoint:
+            return store.checksum(position, CHECKPOINT_TAIL) == checkpoint["tail"]
+        # Saved before checkpoints covered only the tail.
+        return store.checksum(position) == checkpoint.get("checksum")
+
+    def checkpoint(self):
+        """``{"position", "tail"}``: the live matches so far and a checksum of the last ones."""
+        position = self.match_log.live_count()
+        return {"position": position, "tail": self.match_log.checksum(position, CHECKPOINT_TAIL)}
+
+    def _restore_aggregates(self, aggregates):
+        """Adopt the rollups and matchups of ``aggregates_snapshot`` and count the matches since.
+
+        They are left to be built on first use if the log no longer matches
+        the checkpoint saved with them.
+        """
+        checkpoint = aggregates["checkpoint"]
+        if not self._matches_checkpoint(checkpoint):
+            return
+        store, position = self.match_log, checkpoint["position"]
+        if "rollups" in aggregates and aggregates.get("counted_after") == self.counted_after:
+            self._rollups = TimeRollups.from_dict(store, aggregates["rollups"], self.counted_after)
+            for p in store.live_positions(skip=position):
+                self._rollups.add(p)
+        if "matchups" in aggregates and HAVE_NUMPY:
+            self._matchups = MatchupMatrices.from_dict(aggregates["matchups"])
+            for p in store.live_positions(skip=position):
+                self._matchups.add(store.entry(p))
+        self.aggregated = position
+
+    def aggregates_snapshot(self):
+        """The document saved as ``AGGREGATES_FILE``: the indexes built so far, with a checkpoint."""
+        checkpoint = self.checkpoint()
+        self.aggregated = checkpoint["position"]
+        data = {"checkpoint": checkpoint, "counted_after": self.counted_after}
+        if self._rollups is not None:
+            data["rollups"] = self._rollups.to_dict()
+        if self._matchups is not None:
+            data["matchups"] = self._matchups.to_dict()
+        return data
+
+    @property
+    def trends(self):
+        """Per-hero appearance index behind the trend queries."""
+        if self._trends is None:
+            self._trends = TrendIndex(self.match_log)
+        return self._trends
+
+    @property
+    def matchups(self):
+        """Hero synergy/counter matrices, or None without NumPy."""
+        if self._matchups is None and HAVE_NUMPY:
+            self._matchups = MatchupMatrices.from_store(self.match_log)
+        return self._matchups
+
+    def index_built(self, name):
+        """Whether index ``name`` ("trends", "rollups" or "matchups") exists yet."""
+        return getattr(self, f"_{name}") is not None
+
+    def _history_token(self):
+        # Changes whenever a copy of the history (or what counts of it) goes stale.
+        return self.match_log.row_count(), self.history_edits, self.counted_after
+
+    def history_snapshot(self):
+        """``(store copy, token)`` for building an index without the lock."""
+        return self.match_log.snapshot(), self._history_token()
+
+    @staticmethod
+    def build_index(name, store, counted_after=0):
+        """Index ``name`` over ``store``; touches nothing else."""
+        if name == "trends":
+            return TrendIndex(store)
+        if name == "rollups":
+            return TimeRollups(store, counted_after)
+        return MatchupMatrices.from_store(store)
+
+    def adopt_index(self, name, index, token):
+        """Install an index built from ``history_snapshot``.
+
+        Matches recorded since the snapshot are added; returns False (and
+        keeps nothing) if past matches were edited, or the stats reset, in
+        the meantime.
+        """
+        if self.index_built(name):
+            return True
+        length, edits, counted_after = token
+        if (edits, counted_after) != (self.history_edits, self.counted_after):
+            return False
+        store = self.match_log
+        if name != "matchups":
+            index.attach(store)
+        for position in range(length, store.row_count()):
+            if position not in store.deleted:
+                index.add(store.entry(position) if name == "matchups" else position)
+        setattr(self, f"_{name}", index)
+        return True
+
+    def ensure_index(self, name, lock):
+        """Build index ``name`` if needed, holding ``lock`` only to copy and to install.
+
+        Called from a worker thread; the lock is the one every mutation of
+        the engine holds (``PersistenceManager.lock``), so building a long
+        history's index while holding it would stall recording a match.
+        The index is built from ``history_snapshot`` instead and installed
+        by ``adopt_index``, which adds whatever was recorded meanwhile.
+        """
+        if name == "matchups" and not HAVE_NUMPY:
+            return
+        for _ in range(OFF_LOCK_ATTEMPTS):
+            with lock:
+                if self.index_built(name):
+                    return
+                store, token = self.history_snapshot()
+            index = self.build_index(name, store, token[2])
+            with lock:
+                if self.adopt_index(name, index, token):
+                    return
+        with lock:
+            getattr(self, name)
+
+    @property
+    def rollups(self):
+        """Daily/weekly buckets for date-range queries."""
+        if self._rollups is None:
+            self._rollups = TimeRollups(self.match_log, self.counted_after)
+        return self._rollups
+
+    def _named(self, counts):
+        keys = self.hero_ids.keys
+        return {keys[h]: count for h, count in enumerate(counts) if count}
+
+    @property
+    def teammate_matches(self):
+        """``{hero_key: games}`` as teammates."""
+        return self._named(self.picks["teammates"])
+
+    @property
+    def enemy_matches(self):
+        return self._named(self.picks["enemies"])
+
+    @property
+    def map_stats(self):
+        """``{map: {"teammates": {...}, "enemies": {...}, "wins", "total"}}``."""
+        names = self.map_ids.names
+        stats = {}
+        for map_id in set(self.map_picks) | set(self.map_results):
+            data = stats[names[map_id]] = {
+                side: self._named(counts) for side, counts in self.map_picks.get(map_id, {}).items()
+            }
+            if map_id in self.map_results:
+                data["wins"], data["total"] = self.map_results[map_id]
+        return stats
+
+    def stats_snapshot(self):
+        """The document saved as ``ow2_stats.json``, with its checkpoint."""
+        checkpoint = self.checkpoint()
+        self.checkpointed = checkpoint["position"]
+        return {
+            "teammates": self.teammate_matches,
+            "enemies": self.enemy_matches,
+            "matches": self.total_matches,
+            "map_stats": self.map_stats,
+            "win_stats": self.win_stats.to_dict(),
+            "counted_after": self.counted_after,
+            "checkpoint": checkpoint,
+        }
+
+    # ------------------------------------------------------------------
+    # Roster
+
+    def hero_names(self):
+        """Every hero, sorted, without duplicates."""
+        return sorted(set(h for heroes in self.heroes_by_role.values() for h in heroes))
+
+    def canonical_hero(self, name):
+        """Return the roster spelling of ``name`` (case-insensitive) or None."""
+        if self._hero_lookup is None:
+            self._hero_lookup = {
+                h.lower(): h for heroes in self.heroes_by_role.values() for h in heroes
+            }
+        return self._hero_lookup.get(name.strip().lower())
+
+    def canonical_map(self, name):
+        if self._map_lookup is None:
+            self._map_lookup = {m.lower(): m for m in self.maps}
+        return self._map_lookup.get(name.strip().lower())
+
+    def add_hero(self, name, role):
+        if role not in self.heroes_by_role:
+            raise KeyError(role)
+        self.heroes_by_role[role].append(name)
+        self.hero_ids.intern(name)
+        self._hero_lookup = None
+        if self._matchups is not None:
+            self._matchups.hero_id(name)
+
+    def add_map(self, name):
+        if name in self.maps:
+            return False
+        self.maps.append(name)
+        self.map_ids.intern(name)
+        self._map_lookup = None
+        return True
+
+    # ------------------------------------------------------------------
+    # Recording
+
+    def validate(self, teammates, enemies, map_name, strict=False, outcome=None, require_outcome=False):
+        """Return an error message for an invalid match, or None.
+
+        ``strict`` additionally requires every hero to be in the roster and
+        the map to be in the map list.
+        """
+        if (len(set(teammates)) != TEAM_SIZE or len(set(enemies)) != TEAM_SIZE
+                or "" in teammates + enemies or not map_name
+                or (require_outcome and not outcome)):
+            if require_outcome:
+                return "5 unique teammates, 5 enemies, a map and a result are required."
+            return "5 unique teammates, 5 enemies, and a map are required."
+        if outcome and outcome not in OUTCOMES:
+            return f"Unknown result: {outcome}"
+        if strict:
+            unknown = [h for h in teammates + enemies if self.canonical_hero(h) is None]
+            if unknown:
+                return f"Unknown heroes: {', '.join(unknown)}"
+            if self.canonical_map(map_name) is None:
+                return f"Unknown map: {map_name}"
+        return None
+
+    def record_match(self, teammates, enemies, map_name, timestamp=None, outcome=None, match_id=None):
+        """Count one match and append it to the history; returns the log entry.
+
+        ``outcome`` is "win", "loss", "draw" or None when unknown; ``match_id``
+        keeps an existing id instead of taking the next free one.
+        """
+        entry = {
+            "teammates": list(teammates),
+            "enemies": list(enemies),
+            "map": map_name,
+            "timestamp": timestamp or datetime.now().isoformat()
+        }
+        if outcome:
+            entry["outcome"] = outcome
+        if match_id is not None:
+            entry["id"] = match_id
+        # Interning happens once, here; the counters only see ids.
+        position = self.match_log.append(entry)
+        entry["id"] = self.match_log.ids[position]
+        if self._counted(position):
+            self._count(position, 1)
+            self.win_stats.record(self.match_log, position)
+        if self._trends is not None:
+            self._trends.add(position)
+        if self._matchups is not None:
+            self._matchups.add(entry)
+        if self._rollups is not None:
+            self._rollups.add(position)
+        return entry
+
+    def _counted(self, position):
+        """Whether match ``position`` belongs in the counters (logged after the last reset)."""
+        return self.match_log.ids[position] > self.counted_after
+
+    def _count(self, position, delta):
+        """Add (``delta=1``) or remove (-1) match ``position`` from the counters."""
+        store = self.match_log
+        map_id = store.map_ids[position]
+        sides = self.map_picks.get(map_id)
+        if sides is None:
+            sides = self.map_picks[map_id] = {side: array("L") for side in SIDES}
+        for side in SIDES:
+            totals, on_map = self.picks[side], sides[side]
+            for h in store.team_ids(position, side):
+                _bump(totals, h, delta)
+                _bump(on_map, h, delta)
+        self.total_matches = max(0, self.total_matches + delta)
+        outcome = store.outcome(position)
+        if outcome:
+            results = self.map_results.setdefault(map_id, [0, 0])
+            results[1] = max(0, results[1] + delta)
+            if outcome == "win":
+                results[0] = max(0, results[0] + delta)
+            if not results[1]:
+                del self.map_results[map_id]
+        if delta < 0 and not any(any(counts) for counts in sides.values()) and map_id not in self.map_results:
+            del self.map_picks[map_id]
+
+    # ------------------------------------------------------------------
+    # Editing history
+
+    def match_entry(self, match_id):
+        """The log entry of match ``match_id``; KeyError if there is none."""
+        return self.match_log.entry(self.match_log.position(match_id))
+
+    def _withdraw(self, position):
+        """Take match ``position`` out of every aggregate and index.
+
+        The exact inverse of counting it in ``record_match``; edits put the
+        new version back in the same way.
+        """
+        self.history_edits += 1
+        entry = self.match_log.entry(position)
+        if self._counted(position):
+            self._count(position, -1)
+            self.win_stats.record(self.match_log, position, -1)
+        if self._trends is not None:
+            self._trends.remove(position)
+        if self._matchups is not None:
+            self._matchups.add(entry, -1)
+        if self._rollups is not None:
+            self._rollups.add(position, -1)
+        return entry
+
+    def delete_match(self, match_id):
+        """Remove match ``match_id``; returns its old entry."""
+        position = self.match_log.position(match_id)
+        old = self._withdraw(position)
+        self.match_log.delete(position)
+        self._refresh_recent()
+        return old
+
+    def edit_match(self, match_id, teammates, enemies, map_name, outcome=None, timestamp=None):
+        """Replace match ``match_id``, keeping its id, extra fields and (by default) its time.
+
+        Returns ``(old entry, new entry)``.
+        """
+        store = self.match_log
+        position = store.position(match_id)
+        old = self._withdraw(position)
+        entry = {
+            "teammates": list(teammates),
+            "enemies": list(enemies),
+            "map": map_name,
+            "timestamp": timestamp or old["timestamp"],
+        }
+        if outcome:
+            entry["outcome"] = outcome
+        entry["id"] = match_id
+        # Keys the form doesn't edit, e.g. a hand-added note.
+        entry.update((k, v) for k, v in old.items() if k not in ENTRY_KEYS)
+        store.replace(position, entry)
+        if self._counted(position):
+            self._count(position, 1)
+            self.win_stats.record(store, position)
+        if self._trends is not None:
+            self._trends.insert(position)
+        if self._matchups is not None:
+            self._matchups.add(entry)
+        if self._rollups is not None:
+            self._rollups.add(position)
+        self._refresh_recent()
+        return old, entry
+
+    def _refresh_recent(self):
+        """Refill the rolling window an edit may have changed from the log.
+
+        ``record`` can't unwind a rolling window, so it is read back from the
+        newest matches instead.
+        """
+        store, window = self.match_log, self.win_stats.window
+        recent = []
+        for position in store.live_positions(reverse=True):
+            outcome = store.outcome(position) if self._counted(position) else None
+            if outcome:
+                recent.append(outcome)
+                if len(recent) == window:
+                    break
+        self.win_stats.set_recent(reversed(recent))
+
+    # ------------------------------------------------------------------
+    # Consistency
+
+    @staticmethod
+    def _recount(store, heroes_by_role, maps, counted_after, trends=False):
+        """A fresh engine counted from ``store``, with the reset point ``counted_after``."""
+        fresh = TrackerEngine(heroes_by_role, maps)
+        fresh.counted_after = counted_after
+        for position in store.live_positions():
+            entry = store.entry(position)
+            fresh.record_match(entry["teammates"], entry["enemies"], entry["map"],
+                               entry["timestamp"], entry.get("outcome"), entry["id"])
+        if trends:
+            fresh._trends = TrendIndex(fresh.match_log)
+        return fresh
+
+    def check(self, lock=None):
+        """Compare the aggregates with a full recount of the log.
+
+        Returns a list of problems; empty when everything agrees.  With
+        ``lock`` the recount runs on a copy of the history without holding
+        it; only the comparison does.  If the history changed in between it
+        starts over, and after a few tries holds the lock throughout.
+        """
+        if lock is None:
+            return self._compare(self._recount(self.match_log, self.heroes_by_role, self.maps,
+                                               self.counted_after, self._trends is not None))
+        for _ in range(OFF_LOCK_ATTEMPTS):
+            with lock:
+                store, token = self.history_snapshot()
+                settings = ({role: list(heroes) for role, heroes in self.heroes_by_role.items()},
+                            list(self.maps), self.counted_after, self._trends is not None)
+            fresh = self._recount(store, *settings)
+            with lock:
+                if token == self._history_token():
+                    return self._compare(fresh)
+        with lock:
+            return self.check()
+
+    def _compare(self, fresh):
+        problems = []
+        if self.total_matches != fresh.total_matches:
+            problems.append(f"match count is {self.total_matches}, the log has {fresh.total_matches}")
+        for side in SIDES:
+            problems += _diff(f"{side} picks", self._named(self.picks[side]), fresh._named(fresh.picks[side]))
+        mine, theirs = self.map_stats, fresh.map_stats
+        for m in sorted(set(mine) | set(theirs)):
+            a, b = mine.get(m, {}), theirs.get(m, {})
+            for side in SIDES:
+                problems += _diff(f"{m}: {side} picks", a.get(side, {}), b.get(side, {}))
+            if (a.get("wins", 0), a.get("total", 0)) != (b.get("wins", 0), b.get("total", 0)):
+                problems.append(f"{m}: record is {a.get('wins', 0)}/{a.get('total', 0)}, "
+                                f"the log has {b.get('wins', 0)}/{b.get('total', 0)}")
+        if _win_table(self.win_stats) != _win_table(fresh.win_stats):
+            problems.append("win rates differ from the log")
+        store = self.match_log
+        # The recount has no deleted rows: its position i is our i-th live one.
+        live = list(store.live_positions())
+        if fresh._trends is not None and self._trends is not None:
+            for hero in set(self.hero_ids.keys):
+                mine = self._trends.postings.get(self.hero_ids.get(hero), ())
+                theirs = fresh._trends.postings.get(fresh.hero_ids.get(hero), ())
+                if list(mine) != [live[p] for p in theirs]:
+                    problems.append(f"trend index for {hero} differs from the log")
+        seen = set()
+        for position in store.live_positions():
+            match_id = store.ids[position]
+            if match_id in seen:
+                problems.append(f"match id {match_id} is used more than once")
+            elif store.position(match_id) != position:
+                problems.append(f"id index points match {match_id} at the wrong row")
+            seen.add(match_id)
+        return problems
+
+    def rebuild_counts(self):
+        """Recount every aggregate from the log (after ``check`` found problems)."""
+        self.history_edits += 1
+        self.picks = {side: array("L") for side in SIDES}
+        self.map_picks, self.map_results = {}, {}
+        self.total_matches = 0
+        counted = [p for p in self.match_log.live_positions() if self._counted(p)]
+        for position in counted:
+            self._count(position, 1)
+        self.win_stats = WinRateStats.from_store(self.match_log, counted, self.win_stats.window)
+        if self._trends is not None:
+            self._trends.rebuild()
+        self._matchups = self._rollups = None
+
+    def reset(self):
+        """Clear the counters.  The match history itself is kept.
+
+        Matches logged so far stay out of the counters for good, so an
+        edit, a delete or a recount doesn't bring them back.
+        """
+        self.counted_after = max(self.counted_after, self.match_log.next_id - 1)
+        self.picks = {side: array("L") for side in SIDES}
+        self.map_picks, self.map_results = {}, {}
+        self.total_matches = 0
+        self.win_stats = WinRateStats(self.hero_ids, self.map_ids)
+        if self._rollups is not None:
+            self._rollups.reset(self.counted_after)
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def match_count(self):
+        return self.total_matches
+
+    def pick_counts(self, side):
+        """``[(hero_key, games), ...]`` for one side, most picked first."""
+        return sorted(self._named(self.picks[side]).items(), key=lambda x: -x[1])
+
+    def map_record(self, map_name):
+        """``(wins, total)`` for a map, or None if it has no matches."""
+        map_id = self.map_ids.get(map_name)
+        if map_id is None or (map_id not in self.map_picks and map_id not in self.map_results):
+            return None
+        wins, total = self.map_results.get(map_id, (0, 0))
+        return wins, total
+
+    def map_pick_counts(self, map_name, side):
+        map_id = self.map_ids.get(map_name)
+        counts = self.map_picks.get(map_id, {}).get(side, ())
+        return sorted(self._named(counts).items(), key=lambda x: -x[1])
@@ -0,0 +1,118 @@
+"""Per-hero posting index behind the Trend Stats page.
+
+``TrendIndex`` maps each hero id to the sorted positions of the matches it
+appeared in, so a hero's pick trend is a lookup instead of a scan over the
+whole match log.  Timestamps are read from the ``MatchStore`` columns.  New
+matches are added as they are recorded; ``series`` can return just the
+points after the ones a caller already has.  Edited and deleted matches are
+taken out and put back with ``remove``/``insert``; callers caching series
+watch ``TrackerEngine.history_edits`` to know when to start over.
+"""
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from match_store import NO_HERO, NO_TIME, SLOTS, from_micros
+
+MAX_POINTS = 400
+
+
+def parse_timestamp(value, fallback=None):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return fallback
+
+
+class TrendIndex:
+    """hero id -> positions of the matches the hero played in (either side)."""
+
+    def __init__(self, store):
+        self.store = store
+        self.postings = {}
+        self.rebuild()
+
+    def attach(self, store):
+        """Follow ``store`` from now on; it must hold the rows indexed so far."""
+        self.store = store
+
+    def rebuild(self):
+        self.postings = {}
+        postings = self.postings
+        slots = self.store.slots
+        for position in self.store.live_positions():
+            base = position * SLOTS
+            # A hero on both teams still counts once for the match.
+            for hero in set(slots[base:base + SLOTS]):
+                if hero != NO_HERO:
+                    hero_postings = postings.get(hero)
+                    if hero_postings is None:
+                        hero_postings = postings[hero] = array("l")
+                    hero_postings.append(position)
+
+    def add(self, position):
+        """Index the match at ``position``; positions must be added in order."""
+        for hero in set(self.store.hero_ids(position)):
+            postings = self.postings.get(hero)
+            if postings is None:
+                postings = self.postings[hero] = array("l")
+            postings.append(position)
+
+    def remove(self, position):
+        """Take the match at ``position`` out, before it is edited or deleted."""
+        for hero in set(self.store.hero_ids(position)):
+            postings = self.postings[hero]
+            del postings[bisect_left(postings, position)]
+
+    def insert(self, position):
+        """Index an edited match at ``position``, wherever it falls."""
+        for hero in set(self.store.hero_ids(position)):
+            postings = self.postings.get(hero)
+            if postings is None:
+                postings = self.postings[hero] = array("l")
+            postings.insert(bisect_left(postings, position), position)
+
+    def positions(self, hero):
+        hero_id = self.store.heroes.get(hero)
+        return self.postings.get(hero_id, ()) if hero_id is not None else ()
+
+    def count(self, hero):
+        """Number of matches ``hero`` appeared in; doubles as a per-hero version."""
+        return len(self.positions(hero))
+
+    def series(self, hero, start=0):
+        """``(times, cumulative picks)`` from the ``start``-th appearance on.
+
+        Times are epoch microseconds; ``as_datetimes`` converts the points
+        that are actually drawn.
+        """
+        store_times = self.store.times
+        return cumulative([store_times[p] for p in self.positions(hero)[start:]], start)
+
+
+def cumulative(times, start=0):
+    """``(times, cumulative picks)`` for appearances ``start`` onwards at ``times``."""
+    for i in range(1, len(times)):
+        if times[i] == NO_TIME:
+            # An unparseable timestamp reuses the previous point's time.
+            times[i] = times[i - 1]
+    return times, list(range(start + 1, start + len(times) + 1))
+
+
+def as_datetimes(times):
+    """Epoch microseconds -> datetimes (None where the time is unknown)."""
+    return [None if t == NO_TIME else from_micros(t) for t in times]
+
+
+def downsample(xs, ys, max_points=MAX_POINTS):
+    """Thin a series to about ``max_points`` evenly spaced points.
+
+    The first and last points are always kept so the curve still ends at the
+    current total.
+    """
+    n = len(xs)
+    if n <= max_points:
+        return xs, ys
+    step = n / (max_points - 1)
+    idx = [int(i * step) for i in range(max_points - 1)] + [n - 1]
+    return [xs[i] for i in idx], [ys[i] for i in idx]
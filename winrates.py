@@ -0,0 +1,182 @@
+"""Streaming win/loss/draw aggregates.
+
+Every counter is updated in constant time per recorded match, so the stats
+pages read win rates straight from here instead of rescanning the match log.
+Matches logged before outcomes were recorded carry no ``outcome`` and are
+ignored.  ``record(store, position, -1)`` takes a match back out of the
+totals; the rolling window cannot be unwound that way and is refilled with
+``set_recent``.
+
+The counters are keyed by the ``MatchStore``'s hero and map ids.  Queries
+take names, and ``to_dict`` writes names, so the saved format is unchanged.
+"""
+from collections import deque
+
+OUTCOMES = ("win", "loss", "draw")
+ROLLING_WINDOW = 20
+NO_RESULT = "–"
+
+
+class Record:
+    """Win/loss/draw tally."""
+
+    __slots__ = ("wins", "losses", "draws")
+
+    def __init__(self, wins=0, losses=0, draws=0):
+        self.wins, self.losses, self.draws = wins, losses, draws
+
+    @property
+    def total(self):
+        return self.wins + self.losses + self.draws
+
+    @property
+    def rate(self):
+        """Win percentage, or None before any result is known."""
+        return self.wins / self.total * 100 if self.total else None
+
+    def add(self, outcome, delta=1):
+        if outcome == "win":
+            self.wins += delta
+        elif outcome == "loss":
+            self.losses += delta
+        else:
+            self.draws += delta
+
+    def merge(self, other):
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+
+    def to_list(self):
+        return [self.wins, self.losses, self.draws]
+
+    def __str__(self):
+        if not self.total:
+            return NO_RESULT
+        return f"{self.rate:.1f}% ({self.wins}-{self.losses}-{self.draws})"
+
+
+class RollingRecord(Record):
+    """A Record over only the last ``size`` outcomes."""
+
+    __slots__ = ("recent",)
+
+    def __init__(self, size=ROLLING_WINDOW, recent=()):
+        super().__init__()
+        self.recent = deque(maxlen=size)
+        for outcome in recent:
+            self.add(outcome)
+
+    def add(self, outcome, delta=1):
+        if len(self.recent) == self.recent.maxlen:
+            super().add(self.recent[0], -1)
+        self.recent.append(outcome)
+        super().add(outcome)
+
+
+def _records(items, key):
+    """Name-keyed saved records -> id-keyed Records (names differing in case merge)."""
+    records = {}
+    for name, counts in items:
+        records.setdefault(key(name), Record()).merge(Record(*counts))
+    return records
+
+
+def _tally(records, key, outcome, delta):
+    record = records.get(key)
+    if record is None:
+        record = records[key] = Record()
+    record.add(outcome, delta)
+    if record.total <= 0:
+        # Keep the same keys a recount from the log would have.
+        del records[key]
+
+
+class WinRateStats:
+    """Win rates per map, per hero (each side), per hero on a map, and rolling."""
+
+    def __init__(self, hero_ids, map_ids, window=ROLLING_WINDOW):
+        # The store's interners; only used to translate names.
+        self.hero_ids, self.map_ids = hero_ids, map_ids
+        self.window = window
+        self.maps = {}   # map id -> Record
+        self.heroes = {"teammates": {}, "enemies": {}}      # side -> hero id -> Record
+        self.hero_maps = {"teammates": {}, "enemies": {}}   # side -> (hero id, map id) -> Record
+        self.recent = RollingRecord(window)
+
+    def record(self, store, position, delta=1):
+        """Count match ``position`` of ``store``; ``delta=-1`` removes it from every total but the rolling one."""
+        code = store.outcomes[position]
+        if code < 0:
+            return
+        outcome = OUTCOMES[code]
+        m = store.map_ids[position]
+        if delta != 1:
+            _tally(self.maps, m, outcome, delta)
+            for side in ("teammates", "enemies"):
+                for h in store.team_ids(position, side):
+                    _tally(self.heroes[side], h, outcome, delta)
+                    _tally(self.hero_maps[side], (h, m), outcome, delta)
+            return
+        self.maps.setdefault(m, Record()).add(outcome)
+        for side in ("teammates", "enemies"):
+            heroes = self.heroes[side]
+            hero_maps = self.hero_maps[side]
+            for h in store.team_ids(position, side):
+                heroes.setdefault(h, Record()).add(outcome)
+                hero_maps.setdefault((h, m), Record()).add(outcome)
+        self.recent.add(outcome)
+
+    def set_recent(self, outcomes):
+        """Refill the rolling window, oldest outcome first."""
+        self.recent = RollingRecord(self.window, outcomes)
+
+    @classmethod
+    def from_store(cls, store, positions, window=ROLLING_WINDOW):
+        """Count ``positions`` of ``store``, in order."""
+        stats = cls(store.heroes, store.maps, window)
+        for position in positions:
+            stats.record(store, position)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Queries; all O(1)
+
+    def map(self, map_name):
+        return self.maps.get(self.map_ids.get(map_name)) or Record()
+
+    def hero(self, hero, side="teammates"):
+        return self.heroes[side].get(self.hero_ids.get(hero)) or Record()
+
+    def hero_on_map(self, hero, map_name, side="teammates"):
+        return self.hero_maps[side].get((self.hero_ids.get(hero), self.map_ids.get(map_name))) or Record()
+
+    # ------------------------------------------------------------------
+    # Persistence (stored inside ow2_stats.json)
+
+    def to_dict(self):
+        heroes, maps = self.hero_ids.keys, self.map_ids.names
+        return {
+            "window": self.window,
+            "maps": {maps[m]: r.to_list() for m, r in self.maps.items()},
+            "heroes": {side: {heroes[h]: r.to_list() for h, r in records.items()}
+                       for side, records in self.heroes.items()},
+            "hero_maps": {side: [[heroes[h], maps[m], *r.to_list()] for (h, m), r in records.items()]
+                          for side, records in self.hero_maps.items()},
+            "recent": list(self.recent.recent),
+        }
+
+    @classmethod
+    def from_dict(cls, data, hero_ids, map_ids):
+        """Read ``to_dict`` output, interning its names into ``hero_ids``/``map_ids``."""
+        stats = cls(hero_ids, map_ids, data.get("window", ROLLING_WINDOW))
+        hero, map_id = hero_ids.intern, map_ids.intern
+        stats.maps = _records((data.get("maps") or {}).items(), map_id)
+        for side in ("teammates", "enemies"):
+            stats.heroes[side] = _records((data.get("heroes", {}).get(side) or {}).items(), hero)
+            stats.hero_maps[side] = _records(
+                (((h, m), counts) for h, m, *counts in data.get("hero_maps", {}).get(side, [])),
+                lambda pair: (hero(pair[0]), map_id(pair[1])),
+            )
+        stats.recent = RollingRecord(stats.window, data.get("recent", ()))
+        return stats
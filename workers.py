@@ -0,0 +1,230 @@
+"""Background analytics jobs for the Tk UI.
+
+``AnalyticsPool`` runs the expensive part of a page refresh (building rows,
+preparing trend series, counting matchups) off the Tk thread.  Jobs go to a
+thread pool, or to a process pool for heavy NumPy work whose inputs and
+results can be pickled.  Finished jobs put their result on a queue that the
+Tk thread drains with ``after()``, so every callback still runs on the Tk
+thread.
+
+Each job belongs to a *view* (e.g. ``"trend"``).  A new request for a view
+supersedes the previous one: a job that has not started yet is cancelled and
+a running one has its result dropped, so scrolling through a combobox only
+ever shows the last value.  ``delay_ms`` additionally waits for the input to
+settle before submitting.  A ``Spinner`` can be attached to a view and is
+shown while the view has work outstanding.
+
+The pool sizes come from ``OW2_WORKERS`` (threads, default 2) and
+``OW2_WORKER_PROCESSES`` (default 1; 0 runs process jobs on the threads).
+"""
+import multiprocessing
+import os
+import queue
+import time
+import tkinter as tk
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+
+THREADS = int(os.environ.get("OW2_WORKERS", "2"))
+PROCESSES = int(os.environ.get("OW2_WORKER_PROCESSES", "1"))
+POLL_MS = 15
+SPINNER_FRAMES = "◐◓◑◒"
+SPINNER_MS = 120
+
+
+class AnalyticsPool:
+    """Per-view background jobs whose results are delivered on the Tk thread."""
+
+    def __init__(self, widget, threads=THREADS, processes=PROCESSES):
+        self.widget = widget
+        self.threads = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="ow2-analytics")
+        self.process_count = processes
+        self._processes = None
+        self._results = queue.SimpleQueue()
+        self._generation = {}   # view -> id of the newest request
+        self._futures = {}      # view -> future of the newest request
+        self._delayed = {}      # view -> after id of a request still settling
+        self._spinners = {}     # view -> Spinner
+        self._pending = 0       # submitted jobs whose result is not back yet
+        self._poll_id = None
+        self._closed = False
+        self.completed = self.superseded = self.failed = 0
+        self.last_ms = {}       # view -> how long the last delivered job took
+
+    # ------------------------------------------------------------------
+    # Submitting (Tk thread)
+
+    def attach_spinner(self, view, spinner):
+        self._spinners[view] = spinner
+
+    def submit(self, view, fn, *args, callback=None, on_error=None, process=False, delay_ms=0):
+        """Run ``fn(*args)`` in the background; ``callback(result)`` runs on the Tk thread.
+
+        Supersedes any earlier request for ``view``.  ``process`` runs ``fn``
+        in the process pool (``fn`` and ``args`` must pickle).  Returns the
+        request id.
+        """
+        generation = self._generation.get(view, 0) + 1
+        self._generation[view] = generation
+        self._cancel(view)
+        spinner = self._spinners.get(view)
+        if spinner is not None:
+            spinner.start()
+        if delay_ms:
+            self._delayed[view] = self.widget.after(
+                delay_ms, lambda: self._start(view, generation, fn, args, callback, on_error, process))
+        else:
+            self._start(view, generation, fn, args, callback, on_error, process)
+        return generation
+
+    def cancel(self, view):
+        """Drop every outstanding request for ``view``."""
+        self._generation[view] = self._generation.get(view, 0) + 1
+        self._cancel(view)
+        self._idle(view)
+
+    def _cancel(self, view):
+        after_id = self._delayed.pop(view, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+        future = self._futures.pop(view, None)
+        if future is not None:
+            # Counted as superseded when its (cancelled) result comes back.
+            future.cancel()
+
+    def _executor(self, process):
+        if not process or self.process_count <= 0:
+            return self.threads
+        if self._processes is None:
+            # "spawn" keeps Tk and the app's threads out of the children.
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.process_count, mp_context=multiprocessing.get_context("spawn"))
+        return self._processes
+
+    def _start(self, view, generation, fn, args, callback, on_error, process):
+        self._delayed.pop(view, None)
+        if self._closed or generation != self._generation.get(view):
+            return
+        began = time.perf_counter()
+        try:
+            future = self._executor(process).submit(fn, *args)
+        except RuntimeError as e:   # shut down, or a broken process pool
+            print(f"⚠️ Could not start {view} job: {e}")
+            self._idle(view)
+            return
+        self._futures[view] = future
+        self._pending += 1
+        results = self._results
+
+        def done(f):
+            # Runs on the worker (or a pool management) thread: only queue.
+            results.put((view, generation, f, callback, on_error, began))
+
+        future.add_done_callback(done)
+        self._schedule_poll()
+
+    # ------------------------------------------------------------------
+    # Delivering (Tk thread)
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.widget.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                view, generation, future, callback, on_error, began = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if generation != self._generation.get(view):
+                self.superseded += 1
+                continue
+            self._futures.pop(view, None)
+            self._idle(view)
+            try:
+                result = future.result()
+            except CancelledError:
+                self.superseded += 1
+                continue
+            except Exception as e:
+                self.failed += 1
+                if on_error is not None:
+                    on_error(e)
+                else:
+                    print(f"⚠️ {view} job failed: {e!r}")
+                continue
+            self.completed += 1
+            self.last_ms[view] = (time.perf_counter() - began) * 1000
+            if callback is not None:
+                try:
+                    callback(result)
+                except tk.TclError:
+                    # The page was destroyed while the job ran.
+                    pass
+        if self._pending:
+            self._schedule_poll()
+
+    def _idle(self, view):
+        spinner = self._spinners.get(view)
+        if spinner is not None:
+            spinner.stop()
+
+    def busy(self, view=None):
+        """Whether ``view`` (or any view) has a request outstanding."""
+        if view is None:
+            return bool(self._pending or self._delayed)
+        return view in self._futures or view in self._delayed
+
+    def shutdown(self):
+        """Stop accepting work and drop whatever is queued."""
+        self._closed = True
+        for view in list(self._delayed):
+            self._cancel(view)
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+
+
+class Spinner(tk.Label):
+    """A small label that animates while a view is waiting on the pool."""
+
+    def __init__(self, parent, **options):
+        super().__init__(parent, text="", **options)
+        self._frame = 0
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._tick()
+
+    def stop(self):
+        try:
+            if self._after_id is not None:
+                self.after_cancel(self._after_id)
+            self.config(text="")
+        except tk.TclError:
+            pass   # destroyed with its page
+        self._after_id = None
+
+    def _tick(self):
+        self.config(text=f"{SPINNER_FRAMES[self._frame % len(SPINNER_FRAMES)]} working…")
+        self._frame += 1
+        self._after_id = self.after(SPINNER_MS, self._tick)
+
+
+def locked(lock, fn):
+    """``fn`` wrapped to hold ``lock`` while it reads shared state."""
+    def run(*args):
+        with lock:
+            return fn(*args)
+    run.__name__ = getattr(fn, "__name__", "job")
+    run.__qualname__ = getattr(fn, "__qualname__", run.__name__)
+    return run
+